@@ -10,8 +10,11 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
+from django.core.exceptions import ImproperlyConfigured
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -73,13 +76,117 @@ WSGI_APPLICATION = 'FinanceCoach.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+# COACH_DB_ENGINE selects the backend: 'sqlite' (default, single-node) or
+# 'postgresql' (configured from the POSTGRES_* variables below).
+COACH_DB_ENGINE = os.environ.get('COACH_DB_ENGINE', 'sqlite')
+
+# WAL lets readers run alongside the single writer; NORMAL sync is durable in WAL mode
+# apart from the last commits on power loss (the -wal/-shm side files are gitignored).
+# The lock wait is the connection's 'timeout' option below, not a busy_timeout pragma.
+SQLITE_INIT_COMMAND = (
+    'PRAGMA journal_mode=WAL;'
+    'PRAGMA synchronous=NORMAL;'
+    'PRAGMA cache_size=-20000;'
+    'PRAGMA temp_store=MEMORY;'
+    'PRAGMA mmap_size=134217728;'
+)
+
+if COACH_DB_ENGINE == 'postgresql':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('POSTGRES_DB', 'financecoach'),
+            'USER': os.environ.get('POSTGRES_USER', 'financecoach'),
+            'PASSWORD': os.environ.get('POSTGRES_PASSWORD', ''),
+            'HOST': os.environ.get('POSTGRES_HOST', 'localhost'),
+            'PORT': os.environ.get('POSTGRES_PORT', '5432'),
+            # Persistent connections, checked before reuse
+            'CONN_MAX_AGE': int(os.environ.get('COACH_DB_CONN_MAX_AGE', '60')),
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {},
+        }
+    }
+    # Optional psycopg connection pool (needs psycopg[pool]); replaces persistent connections.
+    if int(os.environ.get('COACH_DB_POOL_MAX_SIZE', '0')) > 0:
+        DATABASES['default']['CONN_MAX_AGE'] = 0
+        DATABASES['default']['OPTIONS']['pool'] = {
+            'min_size': int(os.environ.get('COACH_DB_POOL_MIN_SIZE', '2')),
+            'max_size': int(os.environ['COACH_DB_POOL_MAX_SIZE']),
+            'timeout': 10,
+        }
+elif COACH_DB_ENGINE == 'sqlite':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.environ.get('COACH_SQLITE_PATH', BASE_DIR / 'db.sqlite3'),
+            'OPTIONS': {
+                'init_command': SQLITE_INIT_COMMAND,
+                # Take the write lock when a transaction starts instead of failing to upgrade mid-way
+                'transaction_mode': 'IMMEDIATE',
+                # Seconds a writer waits for the lock (sqlite3's busy handler)
+                'timeout': 20,
+            },
+        }
     }
+else:
+    raise ImproperlyConfigured(f"Unknown COACH_DB_ENGINE {COACH_DB_ENGINE!r} (use 'sqlite' or 'postgresql')")
+
+
+# Cache
+# COACH_CACHE_BACKEND picks the shared cache: 'locmem' (default: per process, nothing
+# shared or kept across restarts), 'redis' (COACH_REDIS_URL, needs redis-py), 'file'
+# (COACH_CACHE_DIR) or 'db' (the coach_cache table; run `manage.py createcachetable`).
+# Shared backends get a small per-process LRU in front (coach.services.tiered_cache).
+COACH_CACHE_BACKEND = os.environ.get('COACH_CACHE_BACKEND', 'locmem')
+
+# Per-namespace (key prefix) caps on the shared lifetime and how long a worker may
+# serve its local copy. Counters and locks are never held locally.
+COACH_CACHE_NAMESPACES = {
+    'fx_usd_inr': {'timeout': 60 * 60, 'local_timeout': 60},
+    'yf_hist': {'timeout': 60 * 60 * 24, 'local_timeout': 30},
+    'yf_info': {'timeout': 60 * 60 * 24 * 7, 'local_timeout': 300},
+    'invest_ops': {'timeout': 60 * 60, 'local_timeout': 30},
+    'frag': {'timeout': 60 * 60 * 24, 'local_timeout': 60},
 }
 
+_SHARED_CACHES = {
+    'redis': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.environ.get('COACH_REDIS_URL', 'redis://127.0.0.1:6379/1'),
+    },
+    'file': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ.get('COACH_CACHE_DIR', str(BASE_DIR / '.cache')),
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    },
+    'db': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'coach_cache',
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    },
+}
+
+if COACH_CACHE_BACKEND == 'locmem':
+    CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+elif COACH_CACHE_BACKEND in _SHARED_CACHES:
+    CACHES = {
+        'default': {
+            'BACKEND': 'coach.services.tiered_cache.TieredCache',
+            'LOCATION': 'coach-local',
+            'OPTIONS': {
+                'SHARED': 'shared',
+                'LOCAL_MAX_ENTRIES': 1000,
+                'LOCAL_MAX_BYTES': 32 * 1024 * 1024,
+                'COMPRESS_MIN_BYTES': 1024,
+                'NAMESPACES': COACH_CACHE_NAMESPACES,
+            },
+        },
+        'shared': _SHARED_CACHES[COACH_CACHE_BACKEND],
+    }
+else:
+    raise ImproperlyConfigured(
+        f"Unknown COACH_CACHE_BACKEND {COACH_CACHE_BACKEND!r} (use 'locmem', 'redis', 'file' or 'db')")
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -124,3 +231,35 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # Media files settings
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
+
+# Market data (coach.services.market_data)
+# Provider class used for price history / ticker info; swap for a stub in tests.
+COACH_MARKET_DATA_PROVIDER = 'coach.services.market_data.YFinanceProvider'
+# Concurrent fetches per batch and overall time budget (seconds) per batch.
+COACH_MARKET_DATA_WORKERS = 8
+COACH_MARKET_DATA_TIMEOUT = 5.0
+# Seconds the dashboard waits for market insights before rendering a placeholder
+# (the page then loads them from /coach/api/investments).
+COACH_DASHBOARD_MARKET_BUDGET = 0.3
+
+# Monte Carlo paths per goal forecast (coach.services.forecasting). The cost is
+# linear in this; 2000 paths keep a goal at a few milliseconds.
+COACH_FORECAST_PATHS = 2000
+
+# Advice thresholds and messages (coach.services.rule_engine). Workers re-read the
+# file when it changes, checking at most every COACH_ADVICE_RULES_RELOAD_SECONDS.
+COACH_ADVICE_RULES = os.environ.get('COACH_ADVICE_RULES', str(BASE_DIR / 'coach' / 'advice_rules.json'))
+COACH_ADVICE_RULES_RELOAD_SECONDS = 5.0
+
+# Request profiling (coach.middleware.ProfilingMiddleware)
+# Fraction of requests (0..1) profiled and given a Server-Timing header; 0 disables it.
+COACH_PROFILING_SAMPLE_RATE = float(os.environ.get('COACH_PROFILING_SAMPLE_RATE', '0'))
+# Client addresses allowed to scrape /metrics/. Behind a reverse proxy on the same host
+# every request arrives from 127.0.0.1, so set COACH_METRICS_TOKEN there instead:
+# scrapers then send "Authorization: Bearer <token>" and addresses are not checked.
+COACH_METRICS_ALLOWED_IPS = ['127.0.0.1', '::1']
+COACH_METRICS_TOKEN = os.environ.get('COACH_METRICS_TOKEN', '')
+
+if COACH_PROFILING_SAMPLE_RATE > 0:
+    MIDDLEWARE.insert(0, 'coach.middleware.ProfilingMiddleware')
+    TEMPLATES[0]['BACKEND'] = 'coach.services.profiling.DjangoTemplates'
@@ -1,5 +1,6 @@
 from django.contrib import admin
-from .models import  Category, Transaction
+from .models import  Category, Transaction, RecurringRule
 # Register your models here.
 admin.site.register(Category)
-admin.site.register(Transaction)
\ No newline at end of file
+admin.site.register(Transaction)
+admin.site.register(RecurringRule)
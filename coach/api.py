@@ -0,0 +1,169 @@
+"""
+Read-only JSON API for the dashboard widgets.
+
+Every response carries an ETag built from the user's data version (see
+``services.data_version``), so a client revalidating unchanged data gets a
+304 before any aggregate runs. The version is read from the database once
+per request, so every worker agrees on it.
+"""
+import hashlib
+import json
+from decimal import Decimal
+from functools import wraps
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import JsonResponse
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition, require_GET
+from .recommendations import get_investment_opportunities, peek_risk_opportunities
+from django.utils import timezone
+from .services import dashboard_service, advice_service, ledger_service, data_version, fragment_cache, analytics, forecasting
+
+
+def api_login_required(view):
+    """Like login_required, but answers 401 instead of redirecting to the login page."""
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return JsonResponse({"error": "Authentication required"}, status=401)
+        return view(request, *args, **kwargs)
+    return wrapper
+
+
+def _money(value):
+    """Amounts are serialised as strings with exactly two decimals."""
+    return Decimal(value or 0).quantize(ledger_service.CENT)
+
+
+def _version(request):
+    """The user's data version, read once per request (the ETag and the fragment both need it)."""
+    if not hasattr(request, "_data_version"):
+        request._data_version = data_version.get_version(request.user.pk)
+    return request._data_version
+
+
+def _fragment(request, name, compute, variant=""):
+    return fragment_cache.get_fragment(request.user.pk, name, compute, variant=variant, version=_version(request))
+
+
+def _data_etag(request, *args, **kwargs):
+    return f"{request.user.pk}-{_version(request)}"
+
+
+def _dated_etag(request, *args, **kwargs):
+    # For rolling windows ("last 30 days") that move with the calendar, not just the data
+    return f"{_data_etag(request)}-{timezone.now().date().isoformat()}"
+
+
+def api_view(etag_func=_data_etag):
+    """Decorator stack shared by the endpoints: GET only, auth, conditional GET, always revalidate."""
+    def decorator(view):
+        view = condition(etag_func=etag_func)(view)
+        view = cache_control(private=True, no_cache=True)(view)
+        return require_GET(api_login_required(view))
+    return decorator
+
+
+def _summary(user):
+    totals = ledger_service.get_type_totals(user)
+    net_income = totals["income"] - (totals["expense"] + totals["savings"])
+    return {
+        "income": _money(totals["income"]),
+        "expenses": _money(totals["expense"]),
+        "savings": _money(totals["savings"]),
+        "net_income": _money(net_income),
+        "overbudget": net_income < 0,
+    }
+
+
+def _category_expenses(user):
+    rows = ledger_service.get_category_totals(user, "expense")
+    return {"categories": [{"category": r["category__name"], "total": _money(r["total"])} for r in rows]}
+
+
+def _expenses_30d(user):
+    days = dashboard_service.get_expenses_last_30_days(user)
+    return {"days": [{"date": d["date"], "total": _money(d["total"])} for d in days]}
+
+
+def _goals(user):
+    goals, progress = dashboard_service.get_goal_progress(user)
+    profile = dashboard_service.get_profile(user)
+    risk_level = profile.risk_tolerance if profile else "no_risk"
+    # Market volatility only if it's already cached: a forecast never waits on a fetch
+    forecasts = forecasting.forecast_goals(user, goals, risk_level, peek_risk_opportunities(risk_level))
+    for goal in progress:
+        goal["forecast"] = forecasts[goal["id"]]
+    return {"goals": progress}
+
+
+# Payloads are cached per data version, so a client without a matching ETag
+# still costs one cache lookup rather than the aggregates.
+@api_view()
+def summary(request):
+    return JsonResponse(_fragment(request, "summary", lambda: _summary(request.user)))
+
+
+@api_view()
+def category_expenses(request):
+    return JsonResponse(_fragment(request, "category_expenses", lambda: _category_expenses(request.user)))
+
+
+@api_view(etag_func=_dated_etag)
+def expenses_30d(request):
+    return JsonResponse(_fragment(
+        request, "expenses_30d", lambda: _expenses_30d(request.user), variant=timezone.now().date().isoformat()))
+
+
+# Forecasts count months from today
+@api_view(etag_func=_dated_etag)
+def goals(request):
+    return JsonResponse(_fragment(
+        request, "goals", lambda: _goals(request.user), variant=timezone.now().date().isoformat()))
+
+
+def _trends_etag(request, *args, **kwargs):
+    # Ranges end today by default, and each query string is its own representation
+    params = hashlib.sha1(request.GET.urlencode().encode()).hexdigest()[:12]
+    return f"{_dated_etag(request)}-{params}"
+
+
+@api_view(etag_func=_trends_etag)
+def spending_trends(request):
+    """
+    Monthly/weekly series with rolling averages and YoY deltas for a range:
+    ``?range=3m|6m|1y|3y|10y|all`` or ``?start=YYYY-MM-DD&end=YYYY-MM-DD``,
+    plus ``granularity=month|week``.
+    """
+    granularity = request.GET.get("granularity", "month")
+    bounds = analytics.resolve_range(request.GET.get("range"), request.GET.get("start"), request.GET.get("end"))
+    if bounds is None or granularity not in analytics.GRANULARITIES:
+        return JsonResponse({"error": "Invalid range or granularity"}, status=400)
+    start, end = bounds
+    return JsonResponse(_fragment(
+        request, "trends", lambda: analytics.get_analytics(request.user, start, end, granularity),
+        variant=f"{granularity}:{start}:{end}"))
+
+
+def _opportunities(request):
+    """The user's suggestions, fetched once per request (the ETag and the body both need them)."""
+    if not hasattr(request, "_opportunities"):
+        request._opportunities = get_investment_opportunities(request.user)
+    return request._opportunities
+
+
+def _investments_etag(request, *args, **kwargs):
+    # Suggestions also change with the shared market data, so hash them into the tag
+    # (they come from the per-risk-level cache, no aggregates involved).
+    investments = _opportunities(request)
+    digest = hashlib.sha1(json.dumps(investments, cls=DjangoJSONEncoder, sort_keys=True).encode()).hexdigest()[:12]
+    return f"{_data_etag(request)}-{digest}"
+
+
+@api_view(etag_func=_investments_etag)
+def investments(request):
+    opportunities = _opportunities(request)
+    advice = advice_service.get_advice(request.user)
+    return JsonResponse({
+        "adaptive_message": advice["adaptive_msg"] or advice_service.market_advice(opportunities),
+        "opportunities": opportunities,
+    })
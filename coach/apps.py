@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class CoachConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'coach'
+
+    def ready(self):
+        # Compile the advice rules at startup, so a broken rules file fails fast
+        from .services import rule_engine
+        rule_engine.get_rules()
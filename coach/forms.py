@@ -1,5 +1,5 @@
 from django import forms
-from .models import Transaction, Goal, UserProfile, Category
+from .models import Transaction, Goal, UserProfile, Category, RecurringRule
 from django.contrib.auth.models import User
 from django.contrib.auth.forms import UserCreationForm
 
@@ -29,6 +29,33 @@ class TransactionForm(forms.ModelForm):
         if user:
             self.fields['goal'].queryset = Goal.objects.filter(user=user)
             self.fields['goal'].required = False
+class RecurringRuleForm(forms.ModelForm):
+    class Meta:
+        model = RecurringRule
+        fields = ['type', 'category', 'amount', 'schedule', 'start_date', 'end_date', 'description', 'goal']
+        widgets = {
+            'start_date': forms.DateInput(attrs={'type': 'date'}),
+            'end_date': forms.DateInput(attrs={'type': 'date'}),
+            'description': forms.Textarea(attrs={'rows': 2, 'placeholder': 'e.g. Salary, Rent, SIP (optional)'}),
+            'amount': forms.NumberInput(attrs={'step': '0.01', 'placeholder': 'Enter amount'}),
+            'schedule': forms.TextInput(attrs={'placeholder': '1 * *'}),
+        }
+        labels = {
+            'type': 'Transaction Type',
+            'schedule': 'Schedule',
+            'start_date': 'Starts on',
+            'end_date': 'Ends on (optional)',
+            'description': 'Description (optional)',
+            'goal': 'Select Goal (if Savings)',
+        }
+
+    def __init__(self, *args, **kwargs):
+        user = kwargs.pop('user', None)
+        super().__init__(*args, **kwargs)
+        if user:
+            self.fields['goal'].queryset = Goal.objects.filter(user=user)
+        self.fields['goal'].required = False
+
 class GoalForm(forms.ModelForm):
     class Meta:
         model = Goal
@@ -0,0 +1,87 @@
+import time
+from datetime import date
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, setup_test_environment, teardown_test_environment
+from django.urls import reverse
+from coach.models import Transaction
+from coach.services import analytics
+from coach.services.benchmark import throwaway_database, isolated_cache, summarize, save_results, compare_results
+from coach.services.demo_data import seed_users
+
+
+class Command(BaseCommand):
+    help = ("Latency of the spending analytics for every preset range and granularity on users with "
+            "10 years of history (throwaway database); fails if a p95 exceeds the limit.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=5, help="Users to seed.")
+        parser.add_argument("--months", type=int, default=120, help="Months of history per user.")
+        parser.add_argument("--rounds", type=int, default=30)
+        parser.add_argument("--limit-ms", type=float, default=50.0, help="Maximum allowed p95 (cold, uncached).")
+        parser.add_argument("--save", metavar="FILE", help="Write the results as a JSON baseline.")
+        parser.add_argument("--compare", metavar="FILE", help="Fail if any p95 regressed against this baseline.")
+        parser.add_argument("--tolerance", type=float, default=1.5, help="Allowed slowdown factor for --compare.")
+
+    def _measure(self, call, rounds, setup=None):
+        call()  # warm-up
+        samples = []
+        for _ in range(rounds):
+            if setup:
+                setup()
+            started = time.perf_counter()
+            call()
+            samples.append(time.perf_counter() - started)
+        if setup:
+            setup()
+        with CaptureQueriesContext(connection) as ctx:
+            call()
+        return {**summarize(samples), "queries": len(ctx.captured_queries)}
+
+    def handle(self, *args, **options):
+        results = {}
+        setup_test_environment()
+        try:
+            with throwaway_database(), isolated_cache():
+                user = seed_users(options["users"], months=options["months"], prefix="trend")[0]
+                rows = Transaction.objects.filter(user=user).count()
+                self.stdout.write(f"{rows} transactions over {options['months']} months for {user.username}")
+
+                today = date.today()
+                for granularity in analytics.GRANULARITIES:
+                    for range_key in analytics.RANGES:
+                        start, end = analytics.resolve_range(range_key, today=today)
+                        results[f"{granularity} {range_key}"] = self._measure(
+                            lambda: analytics.get_analytics(user, start, end, granularity), options["rounds"])
+
+                # Whole request through the API, with the fragment cache cleared every time
+                client = Client()
+                client.force_login(user)
+                for granularity, range_key in (("month", "all"), ("week", "1y")):
+                    url = f"{reverse('api_trends')}?range={range_key}&granularity={granularity}"
+                    results[f"GET {granularity} {range_key} (uncached)"] = self._measure(
+                        lambda: client.get(url), options["rounds"], setup=cache.clear)
+                    results[f"GET {granularity} {range_key} (cached)"] = self._measure(
+                        lambda: client.get(url), options["rounds"])
+        finally:
+            teardown_test_environment()
+
+        self.stdout.write(f"{'case':<32} {'mean ms':>8} {'p50 ms':>8} {'p95 ms':>8} {'queries':>7}")
+        for name, r in results.items():
+            self.stdout.write(f"{name:<32} {r['mean_ms']:>8.2f} {r['p50_ms']:>8.2f} {r['p95_ms']:>8.2f} "
+                              f"{r['queries']:>7}")
+
+        if options["save"]:
+            save_results(options["save"], results)
+        if options["compare"]:
+            regressions = compare_results(options["compare"], results, "p95_ms", options["tolerance"])
+            for name, old, new in regressions:
+                self.stdout.write(self.style.ERROR(f"{name}: p95 {old:.2f} ms → {new:.2f} ms"))
+            if regressions:
+                raise CommandError(f"{len(regressions)} case(s) regressed beyond {options['tolerance']}x.")
+        too_slow = [name for name, r in results.items() if r["p95_ms"] > options["limit_ms"]]
+        if too_slow:
+            raise CommandError(f"p95 above {options['limit_ms']:.0f} ms: {', '.join(too_slow)}")
+        self.stdout.write(self.style.SUCCESS(f"Every p95 is under {options['limit_ms']:.0f} ms."))
@@ -0,0 +1,170 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test import AsyncClient, Client
+from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+from django.urls import reverse
+from coach import views
+from coach.recommendations import get_investment_opportunities
+from coach.services import market_data
+from coach.services.benchmark import throwaway_database, isolated_cache, summarize, save_results, compare_results
+from coach.services.demo_data import seed_users
+
+SERVERS = ("wsgi", "asgi")
+
+
+def _inlined(response):
+    """True if the market insights made it into the page within the budget."""
+    return response.context is not None and response.context.get("investments") is not None
+
+
+@contextmanager
+def market_pool():
+    """Run with a private pool for the dashboard's market lookups, drained before the database goes away."""
+    pool, saved = ThreadPoolExecutor(max_workers=4, thread_name_prefix="dashboard-market"), views._market_executor
+    views._market_executor = pool
+    try:
+        yield
+    finally:
+        views._market_executor = saved
+        pool.shutdown(wait=True)
+
+
+def run_wsgi(users, rounds, before_round, record):
+    """Each user on its own thread through the WSGI handler (the async view runs via async_to_sync)."""
+    clients = []
+    for user in users:
+        client = Client()
+        client.force_login(user)
+        clients.append(client)
+    url = reverse("dashboard")
+
+    def one(client):
+        try:
+            started = time.perf_counter()
+            response = client.get(url)
+            record(time.perf_counter() - started, response.status_code == 200, _inlined(response))
+        finally:
+            connections.close_all()
+
+    for _ in range(rounds):
+        before_round()
+        threads = [threading.Thread(target=one, args=(c,)) for c in clients]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+
+async def run_asgi(users, rounds, before_round, record):
+    """All users as concurrent coroutines on one event loop through the ASGI handler."""
+    clients = []
+    for user in users:
+        client = AsyncClient()
+        await client.aforce_login(user)
+        clients.append(client)
+    url = reverse("dashboard")
+
+    async def one(client):
+        started = time.perf_counter()
+        response = await client.get(url)
+        record(time.perf_counter() - started, response.status_code == 200, _inlined(response))
+
+    for _ in range(rounds):
+        before_round()
+        await asyncio.gather(*(one(c) for c in clients))
+    await sync_to_async(connections.close_all)()
+
+
+class Command(BaseCommand):
+    help = ("Dashboard latency under the WSGI and ASGI handlers with concurrent users and simulated "
+            "market-data latency, on a seeded throwaway database.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--concurrency", type=int, default=8, help="Users requesting the dashboard at once.")
+        parser.add_argument("--rounds", type=int, default=10, help="Concurrent batches per server.")
+        parser.add_argument("--months", type=int, default=12, help="Months of seeded history per user.")
+        parser.add_argument("--market-latency", type=float, default=0.5,
+                            help="Simulated seconds per market-data call.")
+        parser.add_argument("--budget", type=float, help="Override COACH_DASHBOARD_MARKET_BUDGET (seconds).")
+        parser.add_argument("--cold", action="store_true",
+                            help="Clear the cache before every round, so each one pays for the aggregates "
+                                 "and the market data again.")
+        parser.add_argument("--servers", default=",".join(SERVERS), help="Comma-separated subset of: wsgi, asgi.")
+        parser.add_argument("--save", metavar="FILE", help="Write the results as a JSON baseline.")
+        parser.add_argument("--compare", metavar="FILE", help="Fail if any p95 regressed against this baseline.")
+        parser.add_argument("--tolerance", type=float, default=1.5, help="Allowed slowdown factor for --compare.")
+
+    def handle(self, *args, **options):
+        servers = [s.strip() for s in options["servers"].split(",") if s.strip()]
+        unknown = set(servers) - set(SERVERS)
+        if unknown:
+            raise CommandError(f"Unknown server(s): {', '.join(sorted(unknown))}")
+        overrides = {}
+        if options["budget"] is not None:
+            overrides["COACH_DASHBOARD_MARKET_BUDGET"] = options["budget"]
+
+        results = {}
+        setup_test_environment()  # allows the test client's "testserver" host and captures contexts
+        try:
+            with throwaway_database(on_disk=True), isolated_cache(), override_settings(**overrides):
+                market_data.set_provider(market_data.SyntheticProvider(latency=options["market_latency"]))
+                try:
+                    users = seed_users(options["concurrency"], months=options["months"], prefix="dash")
+                    for server in servers:
+                        results[server] = self._run(server, users, options)
+                finally:
+                    market_data.set_provider(None)
+        finally:
+            teardown_test_environment()
+
+        self.stdout.write(f"{'server':<6} {'requests':>8} {'errors':>6} {'inlined':>7} {'p50 ms':>8} "
+                          f"{'p95 ms':>8} {'p99 ms':>8} {'req/s':>7}")
+        for server, r in results.items():
+            self.stdout.write(f"{server:<6} {r['count']:>8} {r['errors']:>6} {r['inlined']:>7} {r['p50_ms']:>8.1f} "
+                              f"{r['p95_ms']:>8.1f} {r['p99_ms']:>8.1f} {r['requests_per_second']:>7.1f}")
+
+        if options["save"]:
+            save_results(options["save"], results)
+        if options["compare"]:
+            regressions = compare_results(options["compare"], results, "p95_ms", options["tolerance"])
+            for name, old, new in regressions:
+                self.stdout.write(self.style.ERROR(f"{name}: p95 {old:.1f} ms → {new:.1f} ms"))
+            if regressions:
+                raise CommandError(f"{len(regressions)} server(s) regressed beyond {options['tolerance']}x.")
+            self.stdout.write(self.style.SUCCESS("No regressions against the baseline."))
+        if any(r["errors"] for r in results.values()):
+            raise CommandError("Some requests failed; see the errors column.")
+
+    def _run(self, server, users, options):
+        times, lock = [], threading.Lock()
+        counts = {"errors": 0, "inlined": 0}
+
+        def record(elapsed, ok, inlined):
+            with lock:
+                times.append(elapsed)
+                counts["errors"] += not ok
+                counts["inlined"] += inlined
+
+        def before_round():
+            if options["cold"]:
+                cache.clear()
+
+        cache.clear()
+        if not options["cold"]:
+            for user in users:  # warm the shared market-data cache outside the timed runs
+                get_investment_opportunities(user)
+        with market_pool():
+            started = time.perf_counter()
+            if server == "wsgi":
+                run_wsgi(users, options["rounds"], before_round, record)
+            else:
+                asyncio.run(run_asgi(users, options["rounds"], before_round, record))
+            elapsed = time.perf_counter() - started
+        return {**summarize(times), **counts, "requests_per_second": len(times) / elapsed}
@@ -0,0 +1,57 @@
+import random
+import time
+import tracemalloc
+from datetime import date, timedelta
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from coach.models import Transaction, Category, Goal
+from coach.services.benchmark import throwaway_database
+from coach.services.exporter import stream_export, available_formats
+
+INSERT_BATCH = 5000
+
+
+def _add_rows(user, categories, goal, count, seed):
+    rng = random.Random(seed)
+    start = date.today() - timedelta(days=5 * 365)
+    for offset in range(0, count, INSERT_BATCH):
+        batch = []
+        for _ in range(min(INSERT_BATCH, count - offset)):
+            tx_type = rng.choices(("expense", "income", "savings"), weights=(8, 1, 1))[0]
+            batch.append(Transaction(
+                user_id=user.pk, type=tx_type, category_id=rng.choice(categories),
+                goal_id=goal.pk if tx_type == "savings" else None, amount=round(rng.uniform(10, 5000), 2),
+                date=start + timedelta(days=rng.randrange(5 * 365)), description="benchmark row",
+            ))
+        Transaction.objects.bulk_create(batch)
+
+
+class Command(BaseCommand):
+    help = "Measure peak Python memory of the streaming export at growing history sizes (throwaway test database)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+        parser.add_argument("--formats", nargs="+", default=None, help="Default: every available format.")
+
+    def handle(self, *args, **options):
+        formats = options["formats"] or available_formats()
+        with throwaway_database():
+            user = User.objects.create_user("bench-export", password="x")
+            categories = [Category.objects.create(name=n).pk for n in ("Food", "Rent", "Travel", "Salary")]
+            goal = Goal.objects.create(user=user, name="House", target_amount=10 ** 7,
+                                       target_date=date.today() + timedelta(days=365))
+
+            self.stdout.write(f"{'rows':>10} {'format':>8} {'MB out':>9} {'seconds':>8} {'rows/s':>10} {'peak KiB':>9}")
+            stored = 0
+            for size in sorted(options["sizes"]):
+                _add_rows(user, categories, goal, size - stored, seed=size)
+                stored = size
+                for fmt in formats:
+                    tracemalloc.start()
+                    started = time.perf_counter()
+                    written = sum(len(chunk) for chunk in stream_export(user, fmt))
+                    elapsed = time.perf_counter() - started
+                    _, peak = tracemalloc.get_traced_memory()
+                    tracemalloc.stop()
+                    self.stdout.write(f"{size:>10,} {fmt:>8} {written / 1e6:>9.1f} {elapsed:>8.2f} "
+                                      f"{size / elapsed:>10,.0f} {peak / 1024:>9,.0f}")
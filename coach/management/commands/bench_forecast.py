@@ -0,0 +1,92 @@
+import random
+import time
+from datetime import date
+from decimal import Decimal
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+from django.urls import reverse
+from coach.models import Goal
+from coach.services import forecasting
+from coach.services.benchmark import throwaway_database, isolated_cache, summarize, save_results, compare_results
+from coach.services.demo_data import seed_users
+
+
+class Command(BaseCommand):
+    help = ("Latency of the Monte Carlo goal forecasts, per goal and through /coach/api/goals, on seeded "
+            "users (throwaway database); fails if the per-goal p95 exceeds the limit.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=20, help="Users to seed (1-3 goals each).")
+        parser.add_argument("--months", type=int, default=24, help="Months of history per user.")
+        parser.add_argument("--paths", type=int, help="Override COACH_FORECAST_PATHS.")
+        parser.add_argument("--rounds", type=int, default=5, help="Passes over every user.")
+        parser.add_argument("--limit-ms", type=float, default=10.0, help="Maximum allowed p95 per goal.")
+        parser.add_argument("--save", metavar="FILE", help="Write the results as a JSON baseline.")
+        parser.add_argument("--compare", metavar="FILE", help="Fail if any p95 regressed against this baseline.")
+        parser.add_argument("--tolerance", type=float, default=1.5, help="Allowed slowdown factor for --compare.")
+
+    def handle(self, *args, **options):
+        overrides = {}
+        if options["paths"]:
+            overrides["COACH_FORECAST_PATHS"] = options["paths"]
+        results = {}
+        setup_test_environment()
+        try:
+            with throwaway_database(), isolated_cache(), override_settings(**overrides):
+                users = seed_users(options["users"], months=options["months"], prefix="goal")
+                # The seeded targets are out of reach on purpose; make half of them reachable
+                rng = random.Random(7)
+                goals = list(Goal.objects.filter(user__in=users))
+                for goal in goals[::2]:
+                    goal.target_amount = (goal.current_amount * Decimal(rng.uniform(1.2, 3))).quantize(Decimal("1"))
+                Goal.objects.bulk_update(goals[::2], ["target_amount"])
+                results.update(self._run(users, options["rounds"]))
+        finally:
+            teardown_test_environment()
+
+        self.stdout.write(f"{'case':<24} {'count':>6} {'mean ms':>8} {'p50 ms':>8} {'p95 ms':>8}")
+        for name, r in results.items():
+            self.stdout.write(f"{name:<24} {r['count']:>6} {r['mean_ms']:>8.2f} {r['p50_ms']:>8.2f} {r['p95_ms']:>8.2f}")
+
+        if options["save"]:
+            save_results(options["save"], results)
+        if options["compare"]:
+            regressions = compare_results(options["compare"], results, "p95_ms", options["tolerance"])
+            for name, old, new in regressions:
+                self.stdout.write(self.style.ERROR(f"{name}: p95 {old:.2f} ms → {new:.2f} ms"))
+            if regressions:
+                raise CommandError(f"{len(regressions)} case(s) regressed beyond {options['tolerance']}x.")
+        if results["per goal"]["p95_ms"] > options["limit_ms"]:
+            raise CommandError(f"Per-goal p95 above {options['limit_ms']:.0f} ms.")
+        self.stdout.write(self.style.SUCCESS(f"Per-goal p95 is under {options['limit_ms']:.0f} ms."))
+
+    def _run(self, users, rounds):
+        today = date.today()
+        per_goal, requests = [], []
+        for user in users:
+            goals = list(Goal.objects.filter(user=user))
+            risk_level = user.userprofile.risk_tolerance
+            forecasting.forecast_goals(user, goals, risk_level, today=today)  # warm-up
+            for _ in range(rounds):
+                started = time.perf_counter()
+                forecasting.forecast_goals(user, goals, risk_level, today=today)
+                per_goal.append((time.perf_counter() - started) / len(goals))
+
+            # The whole endpoint, uncached (fragment cache cleared) and cached
+            client = Client()
+            client.force_login(user)
+            url = reverse("api_goals")
+            for _ in range(rounds):
+                cache.clear()
+                started = time.perf_counter()
+                client.get(url)
+                requests.append(time.perf_counter() - started)
+        cached = []
+        for _ in range(rounds):
+            started = time.perf_counter()
+            client.get(url)
+            cached.append(time.perf_counter() - started)
+        return {"per goal": summarize(per_goal), "GET goals (uncached)": summarize(requests),
+                "GET goals (cached)": summarize(cached)}
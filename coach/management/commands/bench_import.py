@@ -0,0 +1,58 @@
+import os
+import random
+import tempfile
+from datetime import date, timedelta
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from coach.models import Goal
+from coach.services.benchmark import throwaway_database
+from coach.services.importer import import_transactions, BATCH_SIZE
+from coach.services.ledger_service import check_ledger_summaries
+
+CATEGORIES = ["Food", "Rent", "Travel", "Utilities", "Shopping", "Health", "Salary", "Investments"]
+
+
+def _write_csv(path, rows, seed=0):
+    rng = random.Random(seed)
+    start = date.today() - timedelta(days=5 * 365)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("date,amount,type,category,description,goal\n")
+        for i in range(rows):
+            tx_type = rng.choices(("expense", "income", "savings"), weights=(8, 1, 1))[0]
+            goal = "Emergency fund" if tx_type == "savings" else ""
+            amount = rng.uniform(10, 500 if goal else 5000)  # keep the goal under its max_digits
+            day = start + timedelta(days=rng.randrange(5 * 365))
+            f.write(f"{day.isoformat()},{amount:.2f},{tx_type},"
+                    f"{rng.choice(CATEGORIES)},row {i},{goal}\n")
+
+
+class Command(BaseCommand):
+    help = "Benchmark the bulk importer on a generated CSV, against a throwaway test database."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=1_000_000)
+        parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        rows = options["rows"]
+        fd, path = tempfile.mkstemp(suffix=".csv")
+        os.close(fd)
+        try:
+            self.stdout.write(f"Generating {rows:,} rows…")
+            _write_csv(path, rows)
+            with throwaway_database():
+                user = User.objects.create_user("bench-import", password="x")
+                Goal.objects.create(user=user, name="Emergency fund", target_amount=99_999_999,
+                                    target_date=date.today() + timedelta(days=365))
+
+                with open(path, encoding="utf-8-sig", newline="") as stream:
+                    stats = import_transactions(user, stream, batch_size=options["batch_size"])
+                consistent = not check_ledger_summaries([user.pk])
+        finally:
+            os.unlink(path)
+
+        self.stdout.write(
+            f"Imported {stats['imported']:,} rows in {stats['seconds']:.2f}s "
+            f"({stats['rows'] / stats['seconds']:,.0f} rows/s, batch size {options['batch_size']}); "
+            f"ledger {'consistent' if consistent else 'DRIFTED'}."
+        )
@@ -0,0 +1,51 @@
+import time
+from datetime import date
+import numpy as np
+from django.core.management.base import BaseCommand
+from coach.services.metrics_engine import PriceMatrix, compute_metrics, metrics_to_dicts, compute_ticker_metrics
+from coach.services.price_store import PriceSeries
+
+
+def _random_universe(n, days, seed=0):
+    rng = np.random.default_rng(seed)
+    timestamps = np.busday_offset(date.today(), np.arange(-days + 1, 1), roll="backward").astype("datetime64[s]")
+    returns = rng.normal(0.0004, 0.02, size=(n, days))
+    closes = 100.0 * np.exp(np.cumsum(returns, axis=1))
+    return [f"T{i:05d}" for i in range(n)], [PriceSeries(f"T{i:05d}", timestamps, closes[i]) for i in range(n)]
+
+
+class Command(BaseCommand):
+    help = "Benchmark the vectorized metrics engine against one-ticker-at-a-time evaluation."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", type=int, nargs="+", default=[5, 500, 5000])
+        parser.add_argument("--days", type=int, default=252, help="Trading days of history per ticker.")
+        parser.add_argument("--repeat", type=int, default=3, help="Best-of-N timing.")
+
+    def _best(self, fn, repeat):
+        best = float("inf")
+        for _ in range(repeat):
+            started = time.perf_counter()
+            fn()
+            best = min(best, time.perf_counter() - started)
+        return best
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"{'tickers':>8} {'batch ms':>10} {'µs/ticker':>10} {'serial ms':>10} {'µs/ticker':>10} {'speedup':>8}")
+        for n in options["sizes"]:
+            tickers, series = _random_universe(n, options["days"])
+
+            def batch():
+                matrix = PriceMatrix.from_series(tickers, series)
+                metrics_to_dicts(matrix, compute_metrics(matrix), 83.0)
+
+            def serial():
+                for ticker, s in zip(tickers, series):
+                    compute_ticker_metrics([ticker], [s], 83.0)
+
+            batch_s = self._best(batch, options["repeat"])
+            serial_s = self._best(serial, options["repeat"])
+            self.stdout.write(
+                f"{n:>8} {batch_s * 1e3:>10.2f} {batch_s / n * 1e6:>10.1f} "
+                f"{serial_s * 1e3:>10.2f} {serial_s / n * 1e6:>10.1f} {serial_s / batch_s:>7.1f}x"
+            )
@@ -0,0 +1,94 @@
+import calendar
+import time
+from datetime import date
+from decimal import Decimal
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from coach.models import Category, RecurringRule, Transaction
+from coach.services import recurring, schedule
+from coach.services.benchmark import throwaway_database, isolated_cache, save_results, compare_results
+from coach.services.ledger_service import check_ledger_summaries
+
+# (type, category, amount, schedule) of the rules every seeded user gets
+RULES = [
+    ("income", "Salary", Decimal("85000"), "L * *"),
+    ("expense", "Rent", Decimal("22000"), "5 * *"),
+    ("savings", "SIP", Decimal("10000"), "10 * *"),
+    ("expense", "Subscriptions", Decimal("649"), "15 * *"),
+]
+
+
+class Command(BaseCommand):
+    help = ("Time the recurring-transaction scheduler on a throwaway database: many users with monthly "
+            "rules, a full run, then a re-run that must create nothing.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=100_000)
+        parser.add_argument("--rules-per-user", type=int, default=2, choices=range(1, len(RULES) + 1))
+        parser.add_argument("--months", type=int, default=1, help="Months of occurrences due per rule.")
+        parser.add_argument("--batch-size", type=int, default=recurring.BATCH_SIZE)
+        parser.add_argument("--save", metavar="FILE", help="Write the results as a JSON baseline.")
+        parser.add_argument("--compare", metavar="FILE", help="Fail if a run got slower than this baseline.")
+        parser.add_argument("--tolerance", type=float, default=1.5, help="Allowed slowdown factor for --compare.")
+
+    def handle(self, *args, **options):
+        # Run "as of" the end of this month, so every monthly rule is due once per month
+        today = date.today()
+        today = today.replace(day=calendar.monthrange(today.year, today.month)[1])
+        year, month = divmod(today.year * 12 + today.month - 1 - (options["months"] - 1), 12)
+        start = date(year, month + 1, 1)
+        templates = RULES[:options["rules_per_user"]]
+
+        with throwaway_database(on_disk=True), isolated_cache():
+            started = time.perf_counter()
+            self._seed(options["users"], templates, start)
+            self.stdout.write(f"Seeded {options['users']:,} users × {len(templates)} rule(s) "
+                              f"in {time.perf_counter() - started:.1f}s")
+
+            results = {}
+            for name in ("first run", "re-run"):
+                stats = recurring.materialize_due(today, batch_size=options["batch_size"])
+                results[name] = {"seconds": stats["seconds"], "created": stats["created"],
+                                 "rules": stats["rules"], "batches": stats["batches"],
+                                 "rows_per_second": stats["created"] / stats["seconds"] if stats["seconds"] else 0}
+                self.stdout.write(f"{name:<10} {stats['created']:>9,} rows  {stats['rules']:>8,} rules  "
+                                  f"{stats['batches']:>5} batches  {stats['seconds']:>7.2f}s  "
+                                  f"{results[name]['rows_per_second']:>9,.0f} rows/s")
+
+            expected = sum(len(schedule.parse(expr).between(start, today)) for *_, expr in templates) * options["users"]
+            created = Transaction.objects.count()
+            drift = check_ledger_summaries()
+
+        if created != expected or results["re-run"]["created"]:
+            raise CommandError(f"Expected {expected} transactions once, found {created} "
+                               f"({results['re-run']['created']} on the re-run)")
+        if drift:
+            raise CommandError(f"{len(drift)} ledger bucket(s) disagree with the transactions")
+
+        if options["save"]:
+            save_results(options["save"], results)
+        if options["compare"]:
+            regressions = compare_results(options["compare"], results, "seconds", options["tolerance"])
+            for name, old, new in regressions:
+                self.stdout.write(self.style.ERROR(f"{name}: {old:.2f}s → {new:.2f}s"))
+            if regressions:
+                raise CommandError(f"{len(regressions)} run(s) regressed beyond {options['tolerance']}x.")
+        self.stdout.write(self.style.SUCCESS("Every occurrence was created exactly once; ledger summaries match."))
+
+    def _seed(self, count, templates, start, batch_size=5000):
+        password = make_password("bench")
+        with transaction.atomic():
+            categories = {name: Category.objects.create(name=name).pk for _, name, _, _ in templates}
+            User.objects.bulk_create([User(username=f"rec{i:06d}", password=password) for i in range(count)],
+                                     batch_size=batch_size)
+            user_ids = User.objects.filter(username__startswith="rec").values_list("pk", flat=True)
+            first = {expr: schedule.parse(expr).next_on_or_after(start) for *_, expr in templates}
+            # bulk_create skips save(), so next_run is set here
+            RecurringRule.objects.bulk_create((
+                RecurringRule(user_id=user_id, type=type_, category_id=categories[name], amount=amount,
+                              schedule=expr, start_date=start, next_run=first[expr])
+                for user_id in user_ids.iterator(chunk_size=batch_size)
+                for type_, name, amount, expr in templates
+            ), batch_size=batch_size)
@@ -0,0 +1,81 @@
+import time
+from decimal import Decimal
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+from coach.services import rule_engine
+from coach.services.advice_service import RULE_OUTPUTS
+from coach.services.benchmark import save_results, compare_results
+
+CATEGORIES = ["Rent", "Food", "Travel", "Utilities", "Shopping", "Health", "Education", "Fuel"]
+
+
+class Command(BaseCommand):
+    help = ("Throughput of the compiled advice rules on a synthetic population: rules evaluated per second, "
+            "batched (one call for all users) and one call per user.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=10_000)
+        parser.add_argument("--categories", type=int, default=5, choices=range(0, len(CATEGORIES) + 1),
+                            help="Expense categories per user.")
+        parser.add_argument("--single-users", type=int, default=500, help="Users evaluated one call each.")
+        parser.add_argument("--rounds", type=int, default=5)
+        parser.add_argument("--save", metavar="FILE", help="Write the results as a JSON baseline.")
+        parser.add_argument("--compare", metavar="FILE", help="Fail if a case got slower than this baseline.")
+        parser.add_argument("--tolerance", type=float, default=1.5, help="Allowed slowdown factor for --compare.")
+
+    def handle(self, *args, **options):
+        rules = rule_engine.get_rules()
+        population = self._population(options["users"], options["categories"])
+        # Conditions checked per user: every case of the per-user outputs and the guards,
+        # plus every case of the per-category output for each category row
+        per_user = sum(len(o.guard) + (0 if o.for_each else len(o.cases))
+                       for name, o in rules.outputs.items() if name in RULE_OUTPUTS)
+        per_row = sum(len(o.cases) for name, o in rules.outputs.items() if name in RULE_OUTPUTS and o.for_each)
+        rules_per_user = per_user + per_row * options["categories"]
+
+        def batch():
+            rules.evaluate(*rule_engine.user_metrics(population), outputs=RULE_OUTPUTS)
+
+        sample = population[:options["single_users"]]
+
+        def single():
+            for user in sample:
+                rules.evaluate(*rule_engine.user_metrics([user]), outputs=RULE_OUTPUTS)
+
+        results = {}
+        for name, run, users in (("batch", batch, len(population)), ("one call per user", single, len(sample))):
+            run()  # warm-up
+            samples = []
+            for _ in range(options["rounds"]):
+                started = time.perf_counter()
+                run()
+                samples.append(time.perf_counter() - started)
+            seconds = min(samples)
+            results[name] = {"users": users, "seconds": seconds, "users_per_second": users / seconds,
+                             "rules_per_second": users * rules_per_user / seconds}
+
+        self.stdout.write(f"Rules version {rules.digest}: {rules_per_user} rules per user "
+                          f"({options['categories']} categories)")
+        self.stdout.write(f"{'case':<20} {'users':>8} {'seconds':>9} {'users/s':>11} {'rules/s':>13}")
+        for name, r in results.items():
+            self.stdout.write(f"{name:<20} {r['users']:>8,} {r['seconds']:>9.3f} {r['users_per_second']:>11,.0f} "
+                              f"{r['rules_per_second']:>13,.0f}")
+
+        if options["save"]:
+            save_results(options["save"], results)
+        if options["compare"]:
+            regressions = compare_results(options["compare"], results, "seconds", options["tolerance"])
+            for name, old, new in regressions:
+                self.stdout.write(self.style.ERROR(f"{name}: {old:.3f}s → {new:.3f}s"))
+            if regressions:
+                raise CommandError(f"{len(regressions)} case(s) regressed beyond {options['tolerance']}x.")
+
+    def _population(self, count, categories):
+        """Incomes, expenses and savings spread over every band, with zero-income users mixed in."""
+        rng = np.random.default_rng(11)
+        income = rng.integers(0, 200_000, count) * (rng.random(count) > 0.05)
+        spend = rng.uniform(0, 1.2, (count, max(categories, 1))) * income[:, None] / max(categories, 1)
+        savings = rng.uniform(0, 0.4, count) * income
+        return [(Decimal(int(income[i])), Decimal(f"{spend[i].sum():.2f}"), Decimal(f"{savings[i]:.2f}"),
+                 [(CATEGORIES[c], Decimal(f"{spend[i, c]:.2f}")) for c in range(categories)])
+                for i in range(count)]
@@ -0,0 +1,88 @@
+import time
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from coach import recommendations
+from coach.services import dashboard_service, market_data
+from coach.services.benchmark import throwaway_database, isolated_cache, summarize, save_results, compare_results
+from coach.services.demo_data import seed_users
+
+
+def _cases(user):
+    """(name, call, setup) for every dashboard_service / recommendations entry point."""
+    snapshot = dashboard_service.get_financial_snapshot(user)
+    risk = user.userprofile.risk_tolerance
+    return [
+        ("dashboard_service.get_financial_snapshot", lambda: dashboard_service.get_financial_snapshot(user), None),
+        ("dashboard_service.get_income_expenses_savings", lambda: dashboard_service.get_income_expenses_savings(user), None),
+        ("dashboard_service.get_category_expenses", lambda: list(dashboard_service.get_category_expenses(user)), None),
+        ("dashboard_service.get_goal_progress", lambda: dashboard_service.get_goal_progress(user), None),
+        ("dashboard_service.get_expenses_last_30_days", lambda: dashboard_service.get_expenses_last_30_days(user), None),
+        ("dashboard_service.get_profile", lambda: dashboard_service.get_profile(user), None),
+        ("recommendations.generate_savings_recommendation", lambda: recommendations.generate_savings_recommendation(snapshot), None),
+        ("recommendations.generate_expense_recommendation", lambda: recommendations.generate_expense_recommendation(snapshot), None),
+        ("recommendations.calculate_tax_recommendation", lambda: recommendations.calculate_tax_recommendation(snapshot), None),
+        ("recommendations.generate_category_expense_recommendation",
+         lambda: recommendations.generate_category_expense_recommendation(snapshot), None),
+        ("recommendations.get_usd_to_inr", recommendations.get_usd_to_inr, None),
+        ("recommendations.get_risk_opportunities (warm)", lambda: recommendations.get_risk_opportunities(risk), None),
+        ("recommendations.get_risk_opportunities (cold cache)", lambda: recommendations.get_risk_opportunities(risk), cache.clear),
+        ("recommendations.get_investment_opportunities", lambda: recommendations.get_investment_opportunities(user), None),
+    ]
+
+
+class Command(BaseCommand):
+    help = ("Microbenchmark every dashboard_service and recommendations entry point on seeded data "
+            "(throwaway database, offline market data).")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=20, help="Users to seed.")
+        parser.add_argument("--months", type=int, default=24, help="Months of history per user.")
+        parser.add_argument("--rounds", type=int, default=50)
+        parser.add_argument("--filter", default="", help="Only run benchmarks whose name contains this.")
+        parser.add_argument("--save", metavar="FILE", help="Write the results as a JSON baseline.")
+        parser.add_argument("--compare", metavar="FILE", help="Fail if any p50 regressed against this baseline.")
+        parser.add_argument("--tolerance", type=float, default=1.5, help="Allowed slowdown factor for --compare.")
+
+    def handle(self, *args, **options):
+        results = {}
+        # On disk: background market-data refreshes write from other threads
+        with throwaway_database(on_disk=True), isolated_cache():
+            market_data.set_provider(market_data.SyntheticProvider())
+            try:
+                user = seed_users(options["users"], months=options["months"], prefix="bench")[0]
+                self.stdout.write(f"{'benchmark':<58} {'mean ms':>8} {'p50 ms':>8} {'p95 ms':>8} {'queries':>7}")
+                for name, call, setup in _cases(user):
+                    if options["filter"] not in name:
+                        continue
+                    if setup:
+                        setup()
+                    call()  # warm-up
+                    samples = []
+                    for _ in range(options["rounds"]):
+                        if setup:
+                            setup()
+                        started = time.perf_counter()
+                        call()
+                        samples.append(time.perf_counter() - started)
+                    if setup:
+                        setup()
+                    with CaptureQueriesContext(connection) as ctx:
+                        call()
+                    results[name] = {**summarize(samples), "queries": len(ctx.captured_queries)}
+                    r = results[name]
+                    self.stdout.write(f"{name:<58} {r['mean_ms']:>8.3f} {r['p50_ms']:>8.3f} "
+                                      f"{r['p95_ms']:>8.3f} {r['queries']:>7}")
+            finally:
+                market_data.set_provider(None)
+
+        if options["save"]:
+            save_results(options["save"], results)
+        if options["compare"]:
+            regressions = compare_results(options["compare"], results, "p50_ms", options["tolerance"])
+            for name, old, new in regressions:
+                self.stdout.write(self.style.ERROR(f"{name}: p50 {old:.3f} ms → {new:.3f} ms"))
+            if regressions:
+                raise CommandError(f"{len(regressions)} benchmark(s) regressed beyond {options['tolerance']}x.")
+            self.stdout.write(self.style.SUCCESS("No regressions against the baseline."))
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+from coach.recommendations import get_invest_ops_stats
+from coach.services.fragment_cache import get_fragment_stats
+
+
+class Command(BaseCommand):
+    help = "Show hit rates of the shared investment-opportunity store and the per-user dashboard fragments."
+
+    def handle(self, *args, **options):
+        stats = get_invest_ops_stats()
+        hit_rate = f"{stats['hit_rate']:.1%}" if stats["hit_rate"] is not None else "n/a"
+        self.stdout.write(f"invest_ops: {stats['hits']} hits, {stats['misses']} misses, hit rate {hit_rate}")
+        for risk_level, size in sorted(stats["entries"].items()):
+            self.stdout.write(f"  {risk_level:<10} {size:>8} bytes")
+        self.stdout.write(f"  {'total':<10} {stats['total_bytes']:>8} bytes")
+
+        for name, counts in sorted(get_fragment_stats().items()):
+            total = counts["hits"] + counts["misses"]
+            hit_rate = f"{counts['hits'] / total:.1%}" if total else "n/a"
+            self.stdout.write(f"fragment {name}: {counts['hits']} hits, {counts['misses']} misses, hit rate {hit_rate}")
@@ -0,0 +1,37 @@
+import sys
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from coach.services.exporter import stream_export, ExportUnavailable, CONTENT_TYPES
+
+
+class Command(BaseCommand):
+    help = "Stream a user's transactions to a CSV, JSON Lines or Parquet file."
+
+    def add_arguments(self, parser):
+        parser.add_argument("username")
+        parser.add_argument("--format", choices=sorted(CONTENT_TYPES), default="csv")
+        parser.add_argument("--output", "-o", help="Output file (default: stdout).")
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options["username"])
+        except User.DoesNotExist:
+            raise CommandError(f"No user named '{options['username']}'")
+        try:
+            chunks = stream_export(user, options["format"])
+        except ExportUnavailable as e:
+            raise CommandError(f"{e} (Parquet needs pyarrow installed)")
+
+        out = open(options["output"], "wb") if options["output"] else sys.stdout.buffer
+        try:
+            written = 0
+            for chunk in chunks:
+                out.write(chunk)
+                written += len(chunk)
+        finally:
+            if options["output"]:
+                out.close()
+            else:
+                out.flush()
+        if options["output"]:
+            self.stdout.write(self.style.SUCCESS(f"Wrote {written:,} bytes to {options['output']}."))
@@ -0,0 +1,37 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from coach.services.importer import import_transactions, ImportFailed, PARSERS, BATCH_SIZE
+
+
+class Command(BaseCommand):
+    help = "Bulk-import a CSV or OFX bank statement into a user's transactions."
+
+    def add_arguments(self, parser):
+        parser.add_argument("username")
+        parser.add_argument("path")
+        parser.add_argument("--format", choices=sorted(PARSERS), default=None,
+                            help="File format (default: guessed from the extension).")
+        parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options["username"])
+        except User.DoesNotExist:
+            raise CommandError(f"No user named '{options['username']}'")
+
+        fmt = options["format"] or ("ofx" if options["path"].lower().endswith((".ofx", ".qfx")) else "csv")
+        try:
+            with open(options["path"], encoding="utf-8-sig", newline="") as stream:
+                stats = import_transactions(user, stream, fmt=fmt, batch_size=options["batch_size"])
+        except OSError as e:
+            raise CommandError(str(e))
+        except ImportFailed as e:
+            raise CommandError(f"Import rolled back: {e}")
+
+        for error in stats["errors"]:
+            self.stdout.write(self.style.WARNING(error))
+        rate = stats["rows"] / stats["seconds"] if stats["seconds"] else 0
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {stats['imported']} of {stats['rows']} row(s), skipped {stats['skipped']} "
+            f"in {stats['seconds']:.2f}s ({rate:,.0f} rows/s)."
+        ))
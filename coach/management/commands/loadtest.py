@@ -0,0 +1,124 @@
+import threading
+import time
+from datetime import date
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, setup_test_environment, teardown_test_environment
+from django.urls import reverse
+from coach.models import Category
+from coach.services import market_data
+from coach.services.benchmark import throwaway_database, isolated_cache, summarize, save_results, compare_results
+from coach.services.demo_data import seed_users, DEMO_PASSWORD
+
+DASHBOARD_WIDGETS = ("api_summary", "api_category_expenses", "api_expenses_30d", "api_goals", "api_investments")
+
+
+class VirtualUser:
+    """Runs login → dashboard (+ its API widgets) → view_transactions → add_transaction in a loop."""
+
+    def __init__(self, username, category_id, iterations, record):
+        self.username = username
+        self.category_id = category_id
+        self.iterations = iterations
+        self.record = record
+        self.client = Client()
+
+    def request(self, step, method, url, expected, data=None):
+        with CaptureQueriesContext(connection) as ctx:
+            started = time.perf_counter()
+            try:
+                response = getattr(self.client, method)(url, data)
+                ok = response.status_code == expected
+            except Exception:
+                ok = False
+            elapsed = time.perf_counter() - started
+        self.record(step, elapsed, len(ctx.captured_queries), ok)
+
+    def run(self):
+        try:
+            self.request("login", "post", reverse("login"), 302,
+                         {"username": self.username, "password": DEMO_PASSWORD})
+            for i in range(self.iterations):
+                self.request("dashboard", "get", reverse("dashboard"), 200)
+                for name in DASHBOARD_WIDGETS:
+                    self.request(name, "get", reverse(name), 200)
+                self.request("view_transactions", "get", reverse("view_transactions"), 200)
+                self.request("add_transaction", "post", reverse("add_transaction"), 302, {
+                    "type": "expense", "category": self.category_id, "amount": "125.50",
+                    "date": date.today().isoformat(), "description": f"load test #{i}",
+                })
+        finally:
+            connection.close()
+
+
+class Command(BaseCommand):
+    help = ("HTTP load test of the main user journey against a seeded throwaway database with offline "
+            "market data; reports p50/p95/p99 latency and queries per request.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--concurrency", type=int, default=8, help="Virtual users running in parallel.")
+        parser.add_argument("--iterations", type=int, default=10, help="Journeys per virtual user.")
+        parser.add_argument("--months", type=int, default=24, help="Months of seeded history per user.")
+        parser.add_argument("--market-latency", type=float, default=0.05,
+                            help="Simulated seconds per market-data call.")
+        parser.add_argument("--save", metavar="FILE", help="Write the results as a JSON baseline.")
+        parser.add_argument("--compare", metavar="FILE", help="Fail if any p95 regressed against this baseline.")
+        parser.add_argument("--tolerance", type=float, default=1.5, help="Allowed slowdown factor for --compare.")
+
+    def handle(self, *args, **options):
+        samples, lock = {}, threading.Lock()
+
+        def record(step, elapsed, queries, ok):
+            with lock:
+                entry = samples.setdefault(step, {"times": [], "queries": [], "errors": 0})
+                entry["times"].append(elapsed)
+                entry["queries"].append(queries)
+                entry["errors"] += not ok
+
+        setup_test_environment()  # allows the test client's "testserver" host
+        try:
+            with throwaway_database(on_disk=True), isolated_cache():
+                market_data.set_provider(market_data.SyntheticProvider(latency=options["market_latency"]))
+                try:
+                    users = seed_users(options["concurrency"], months=options["months"], prefix="load")
+                    category_id = Category.objects.order_by("id").values_list("id", flat=True).first()
+                    workers = [VirtualUser(u.username, category_id, options["iterations"], record) for u in users]
+                    threads = [threading.Thread(target=w.run, name=f"loadtest-{w.username}") for w in workers]
+
+                    started = time.perf_counter()
+                    for t in threads:
+                        t.start()
+                    for t in threads:
+                        t.join()
+                    elapsed = time.perf_counter() - started
+                finally:
+                    market_data.set_provider(None)
+        finally:
+            teardown_test_environment()
+
+        results = {}
+        total = 0
+        self.stdout.write(f"{'step':<22} {'requests':>8} {'errors':>6} {'p50 ms':>8} {'p95 ms':>8} "
+                          f"{'p99 ms':>8} {'queries/req':>11}")
+        for step, entry in samples.items():
+            results[step] = {**summarize(entry["times"]), "errors": entry["errors"],
+                             "queries_per_request": sum(entry["queries"]) / len(entry["queries"])}
+            r = results[step]
+            total += r["count"]
+            self.stdout.write(f"{step:<22} {r['count']:>8} {r['errors']:>6} {r['p50_ms']:>8.1f} {r['p95_ms']:>8.1f} "
+                              f"{r['p99_ms']:>8.1f} {r['queries_per_request']:>11.1f}")
+        self.stdout.write(f"{total} requests in {elapsed:.1f}s ({total / elapsed:.1f} req/s) "
+                          f"with {options['concurrency']} virtual users.")
+
+        if options["save"]:
+            save_results(options["save"], results)
+        if options["compare"]:
+            regressions = compare_results(options["compare"], results, "p95_ms", options["tolerance"])
+            for name, old, new in regressions:
+                self.stdout.write(self.style.ERROR(f"{name}: p95 {old:.1f} ms → {new:.1f} ms"))
+            if regressions:
+                raise CommandError(f"{len(regressions)} step(s) regressed beyond {options['tolerance']}x.")
+            self.stdout.write(self.style.SUCCESS("No regressions against the baseline."))
+        if any(r["errors"] for r in results.values()):
+            raise CommandError("Some requests failed; see the errors column.")
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+from coach.services.ledger_service import rebuild_ledger_summaries, check_ledger_summaries
+
+
+class Command(BaseCommand):
+    help = "Recompute LedgerSummary rows from the Transaction table, or report drift with --check."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--user", type=int, action="append", dest="user_ids",
+                            help="Limit to this user id (repeatable).")
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument("--check", action="store_true",
+                            help="Only report buckets that disagree with the transactions.")
+
+    def handle(self, *args, **options):
+        user_ids = options["user_ids"]
+
+        if options["check"]:
+            drift = check_ledger_summaries(user_ids)
+            for d in drift:
+                self.stdout.write(
+                    f"user={d['user_id']} type={d['type']} category={d['category_id']} "
+                    f"month={d['month']:%Y-%m}: expected {d['expected_total']} ({d['expected_count']} rows), "
+                    f"found {d['actual_total']} ({d['actual_count']} rows)"
+                )
+            if drift:
+                self.stdout.write(self.style.WARNING(f"{len(drift)} drifted bucket(s)."))
+            else:
+                self.stdout.write(self.style.SUCCESS("Ledger summaries are consistent."))
+            return
+
+        written = rebuild_ledger_summaries(user_ids, batch_size=options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {written} ledger bucket(s)."))
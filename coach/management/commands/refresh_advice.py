@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from coach.services import advice_service
+
+
+class Command(BaseCommand):
+    help = ("Precompute every user's dashboard advice into UserAdvice (nightly), or with --incremental only "
+            "for users whose data changed since their last refresh.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--incremental", action="store_true",
+                            help="Only users whose advice is stale or missing.")
+        parser.add_argument("--chunk-size", type=int, default=advice_service.CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        stats = advice_service.run(incremental=options["incremental"], chunk_size=options["chunk_size"])
+        self.stdout.write(self.style.SUCCESS(
+            f"Refreshed advice for {stats['users']:,} user(s) in {stats['chunks']} chunk(s), "
+            f"{stats['seconds']:.2f}s."))
@@ -0,0 +1,37 @@
+import time
+from django.core.management.base import BaseCommand
+from coach.recommendations import RISK_MAPPING, store_usd_to_inr
+from coach.services.market_data import fetch_market_data, FX_TICKER
+
+
+class Command(BaseCommand):
+    help = ("Pre-warm the market-data cache for every ticker in RISK_MAPPING plus USDINR=X and the USD→INR rate. "
+            "Runs forever on --interval unless --once is given.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--interval", type=float, default=240,
+                            help="Seconds between refresh rounds (keep below the 5 minute history TTL).")
+        parser.add_argument("--once", action="store_true", help="Run a single refresh round and exit.")
+        parser.add_argument("--timeout", type=float, default=60,
+                            help="Time budget in seconds for one refresh round.")
+
+    def handle(self, *args, **options):
+        tickers = sorted({t for group in RISK_MAPPING.values() for t in group})
+
+        while True:
+            started = time.monotonic()
+            market = fetch_market_data(tickers + [FX_TICKER], info_tickers=tickers,
+                                       timeout=options["timeout"], force=True)
+            # The rate is cached apart from the series: replace it (and any fallback) every round
+            store_usd_to_inr(market[FX_TICKER]["history"])
+            failed = [t for t, data in market.items() if data["history"] is None]
+            elapsed = time.monotonic() - started
+            msg = f"Refreshed {len(market) - len(failed)}/{len(market)} tickers in {elapsed:.1f}s"
+            if failed:
+                self.stdout.write(self.style.WARNING(f"{msg}; failed: {', '.join(failed)}"))
+            else:
+                self.stdout.write(self.style.SUCCESS(msg))
+
+            if options["once"]:
+                return
+            time.sleep(max(0.0, options["interval"] - elapsed))
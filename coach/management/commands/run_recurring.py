@@ -0,0 +1,30 @@
+from datetime import date
+from django.core.management.base import BaseCommand, CommandError
+from coach.services.recurring import materialize_due, BATCH_SIZE
+
+
+class Command(BaseCommand):
+    help = ("Materialize every due occurrence of the recurring transaction rules, for all users. "
+            "Safe to re-run (e.g. daily from cron): occurrences are only ever created once.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--date", help="Materialize up to this day (YYYY-MM-DD, default: today).")
+        parser.add_argument("--user", type=int, action="append", dest="user_ids",
+                            help="Limit to this user id (repeatable).")
+        parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="Rules per database transaction.")
+
+    def handle(self, *args, **options):
+        try:
+            today = date.fromisoformat(options["date"]) if options["date"] else None
+        except ValueError:
+            raise CommandError(f"Invalid date '{options['date']}'")
+        stats = materialize_due(today, options["user_ids"], batch_size=options["batch_size"])
+
+        for error in stats["errors"]:
+            self.stdout.write(self.style.WARNING(error))
+        rate = stats["created"] / stats["seconds"] if stats["seconds"] else 0
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {stats['created']} transaction(s) from {stats['rules']} rule(s) for {stats['users']} user(s) "
+            f"in {stats['batches']} batch(es), {stats['blocked']} blocked, in {stats['seconds']:.2f}s "
+            f"({rate:,.0f} rows/s)."
+        ))
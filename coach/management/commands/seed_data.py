@@ -0,0 +1,28 @@
+import time
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from coach.models import Transaction
+from coach.services.demo_data import seed_users, DEMO_PASSWORD
+
+
+class Command(BaseCommand):
+    help = "Seed the configured database with demo users and realistic transaction histories."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=10)
+        parser.add_argument("--months", type=int, default=12, help="Months of history per user.")
+        parser.add_argument("--prefix", default="demo", help="Usernames are <prefix>0001, <prefix>0002, …")
+        parser.add_argument("--seed", type=int, default=0, help="Random seed (same seed, same data).")
+
+    def handle(self, *args, **options):
+        prefix = options["prefix"]
+        if User.objects.filter(username__startswith=prefix).exists():
+            raise CommandError(f"Users starting with '{prefix}' already exist; pick another --prefix.")
+
+        started = time.perf_counter()
+        users = seed_users(options["users"], months=options["months"], prefix=prefix, seed=options["seed"])
+        rows = Transaction.objects.filter(user__in=users).count()
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {len(users)} user(s) with {rows:,} transactions in {time.perf_counter() - started:.1f}s. "
+            f"Password for all of them: {DEMO_PASSWORD}"
+        ))
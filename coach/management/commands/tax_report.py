@@ -0,0 +1,43 @@
+import csv
+import sys
+import time
+from datetime import date
+from django.core.management.base import BaseCommand, CommandError
+from coach.services import tax
+
+
+class Command(BaseCommand):
+    help = ("Year-end tax report: every user's income, deductions and tax under the old and the new regime "
+            "for one financial year, as CSV.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--fy", help="Financial year, e.g. 2024-25 (default: the last completed one).")
+        parser.add_argument("--output", "-o", help="Output file (default: stdout).")
+
+    def handle(self, *args, **options):
+        try:
+            year = tax.parse_financial_year(options["fy"]) if options["fy"] else tax.financial_year(date.today()) - 1
+        except ValueError:
+            raise CommandError(f"Invalid financial year '{options['fy']}' (expected e.g. 2024-25)")
+
+        started = time.perf_counter()
+        totals, taxes = tax.evaluate_all(year)
+        elapsed = time.perf_counter() - started
+
+        out = open(options["output"], "w", newline="", encoding="utf-8") if options["output"] else sys.stdout
+        try:
+            writer = csv.writer(out)
+            writer.writerow(["user_id", "username", "income", "savings", "new_regime_tax", "old_regime_tax",
+                             "best_regime", "saving"])
+            best_old = 0
+            for (user_id, username, income, savings), new, old in zip(totals, taxes["new"], taxes["old"]):
+                best_old += old < new
+                writer.writerow([user_id, username, income, savings, f"{new:.2f}", f"{old:.2f}",
+                                 "old" if old < new else "new", f"{abs(new - old):.2f}"])
+        finally:
+            if options["output"]:
+                out.close()
+
+        summary = (f"FY {tax.fy_label(year)}: {len(totals):,} users evaluated in {elapsed:.2f}s; "
+                   f"{best_old:,} pay less under the old regime.")
+        (self.stdout if options["output"] else self.stderr).write(self.style.SUCCESS(summary))
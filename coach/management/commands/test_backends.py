@@ -0,0 +1,79 @@
+import importlib.util
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+from contextlib import contextmanager
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def postgres_available():
+    """initdb/pg_ctl on PATH and a PostgreSQL driver installed."""
+    has_driver = any(importlib.util.find_spec(name) for name in ("psycopg", "psycopg2"))
+    return has_driver and bool(shutil.which("initdb") and shutil.which("pg_ctl"))
+
+
+@contextmanager
+def temp_postgres_cluster(user="financecoach"):
+    """
+    Start a throwaway PostgreSQL cluster in a temporary directory, listening
+    only on a Unix socket there, and yield the environment that points
+    COACH_DB_ENGINE=postgresql at it. The cluster is stopped and removed on exit.
+    """
+    with tempfile.TemporaryDirectory(prefix="coach-pg-") as root:
+        data = os.path.join(root, "data")
+        port = str(_free_port())
+        subprocess.run(["initdb", "-D", data, "-U", user, "--auth=trust", "-E", "UTF8"],
+                       check=True, capture_output=True)
+        subprocess.run(["pg_ctl", "-D", data, "-l", os.path.join(root, "server.log"), "-w",
+                        "-o", f"-p {port} -k {root} -c listen_addresses=''", "start"],
+                       check=True, capture_output=True)
+        try:
+            yield {"COACH_DB_ENGINE": "postgresql", "POSTGRES_HOST": root, "POSTGRES_PORT": port,
+                   "POSTGRES_USER": user, "POSTGRES_DB": "postgres"}
+        finally:
+            subprocess.run(["pg_ctl", "-D", data, "-m", "fast", "-w", "stop"], capture_output=True)
+
+
+class Command(BaseCommand):
+    help = ("Run the test suite on SQLite and, where initdb/pg_ctl and a PostgreSQL driver are available, "
+            "on a temporary PostgreSQL cluster.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("labels", nargs="*", help="Test labels passed on to `manage.py test`.")
+        parser.add_argument("--backends", default="sqlite,postgresql",
+                            help="Comma-separated subset of: sqlite, postgresql.")
+
+    def _run_tests(self, backend, env, labels):
+        self.stdout.write(f"--- {backend} ---")
+        result = subprocess.run([sys.executable, "manage.py", "test", *labels],
+                                cwd=settings.BASE_DIR, env={**os.environ, **env})
+        return result.returncode == 0
+
+    def handle(self, *args, **options):
+        backends = [b.strip() for b in options["backends"].split(",") if b.strip()]
+        results = {}
+        if "sqlite" in backends:
+            results["sqlite"] = self._run_tests("sqlite", {"COACH_DB_ENGINE": "sqlite"}, options["labels"])
+        if "postgresql" in backends:
+            if postgres_available():
+                with temp_postgres_cluster() as env:
+                    results["postgresql"] = self._run_tests("postgresql", env, options["labels"])
+            else:
+                self.stdout.write(self.style.WARNING(
+                    "postgresql: skipped (needs initdb and pg_ctl on PATH and psycopg installed)"))
+
+        for backend, ok in results.items():
+            style = self.style.SUCCESS if ok else self.style.ERROR
+            self.stdout.write(style(f"{backend}: {'passed' if ok else 'FAILED'}"))
+        if not all(results.values()):
+            raise CommandError("Tests failed on: " + ", ".join(b for b, ok in results.items() if not ok))
@@ -0,0 +1,62 @@
+import random
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from .services import profiling
+
+
+class ProfilingMiddleware:
+    """
+    Opt-in request profiling (see coach.services.profiling). Enabled by
+    setting COACH_PROFILING_SAMPLE_RATE above 0; only that fraction of
+    requests pays for the instrumentation. Works in both sync and async
+    mode, so async views such as the dashboard are not pushed through a
+    sync adapter.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.sample_rate = getattr(settings, "COACH_PROFILING_SAMPLE_RATE", 0.0)
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+        if self.sample_rate > 0:
+            profiling.instrument_connections()
+
+    def _sampled(self):
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        if not self._sampled():
+            return self.get_response(request)
+
+        profile, token = profiling.start()
+        try:
+            response = self.get_response(request)
+        finally:
+            profiling.stop(token)
+        return self._finish(request, response, profile)
+
+    async def __acall__(self, request):
+        if not self._sampled():
+            return await self.get_response(request)
+
+        # The view's database calls run in the thread-sensitive executor, whose open
+        # connections may predate this middleware
+        await sync_to_async(profiling.instrument_connections)()
+        profile, token = profiling.start()
+        try:
+            response = await self.get_response(request)
+        finally:
+            profiling.stop(token)
+        return self._finish(request, response, profile)
+
+    def _finish(self, request, response, profile):
+        duration = profile.elapsed()
+        response["Server-Timing"] = profile.server_timing(duration)
+        match = getattr(request, "resolver_match", None)
+        profiling.metrics.observe(match.view_name if match else "unmatched", response.status_code, profile, duration)
+        return response
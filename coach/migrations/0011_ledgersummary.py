@@ -0,0 +1,47 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:42
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncMonth
+
+
+def backfill_ledger_summaries(apps, schema_editor):
+    Transaction = apps.get_model('coach', 'Transaction')
+    LedgerSummary = apps.get_model('coach', 'LedgerSummary')
+    rows = (Transaction.objects.annotate(month=TruncMonth('date'))
+            .values('user_id', 'type', 'category_id', 'month')
+            .annotate(total=Sum('amount'), count=Count('id'))
+            .order_by())
+    LedgerSummary.objects.bulk_create(
+        [LedgerSummary(**row) for row in rows],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('coach', '0010_alter_goal_user_alter_transaction_user'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LedgerSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('type', models.CharField(choices=[('income', 'Income'), ('expense', 'Expense'), ('savings', 'Savings')], max_length=20)),
+                ('month', models.DateField()),
+                ('total', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('count', models.IntegerField(default=0)),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ledger_summaries', to='coach.category')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ledger_summaries', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('user', 'type', 'category', 'month'), name='unique_ledger_bucket')],
+            },
+        ),
+        migrations.RunPython(backfill_ledger_summaries, migrations.RunPython.noop),
+    ]
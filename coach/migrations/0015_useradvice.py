@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:00
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('coach', '0014_recurringrule'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserAdvice',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='advice', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('savings_msg', models.TextField(default='')),
+                ('expense_msg', models.TextField(default='')),
+                ('tax_msg', models.TextField(default='')),
+                ('category_msgs', models.JSONField(default=list)),
+                ('adaptive_msg', models.TextField(blank=True, default='')),
+                ('computed_at', models.DateTimeField(null=True)),
+                ('stale', models.BooleanField(default=True)),
+            ],
+            options={
+                'indexes': [models.Index(condition=models.Q(('stale', True)), fields=['user'], name='advice_stale')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('coach', '0015_useradvice'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='useradvice',
+            name='rules_version',
+            field=models.CharField(blank=True, default='', max_length=16),
+        ),
+    ]
@@ -1,8 +1,11 @@
-from django.db import models
+from django.core.exceptions import ValidationError
+from django.db import models, transaction, IntegrityError
+from django.db.models import F
 from django.utils import timezone
 from django.contrib.auth.models import User
-from django.db.models.signals import post_save, pre_save, post_delete
+from django.db.models.signals import post_init, post_save, pre_save, post_delete
 from django.dispatch import receiver
+from .services import schedule
 
 class UserProfile(models.Model):
     RISK_TYPES=[
@@ -34,6 +37,33 @@ class Transaction(models.Model):
     description = models.TextField(blank=True)
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     goal = models.ForeignKey('Goal', on_delete=models.SET_NULL, null=True, blank=True)  
+    # Set on the occurrences materialized from a RecurringRule
+    rule = models.ForeignKey('RecurringRule', on_delete=models.SET_NULL, null=True, blank=True,
+                             related_name='occurrences')
+
+    class Meta:
+        indexes = [
+            # Dashboard / recommendation queries: user + type, then date range or category.
+            # The trailing amount makes them covering for the Sum('amount') aggregates.
+            models.Index(fields=['user', 'type', 'date', 'amount'], name='tx_user_type_date'),
+            models.Index(fields=['user', 'type', 'category', 'amount'], name='tx_user_type_category'),
+            # view_transactions keyset pagination ordered by (date, id)
+            models.Index(fields=['user', 'date', 'id'], name='tx_user_date_id'),
+        ]
+        constraints = [
+            # A rule's occurrence is materialized at most once, even if two scheduler runs race
+            models.UniqueConstraint(fields=['rule', 'date'], name='unique_rule_occurrence'),
+        ]
+
+    def save(self, *args, **kwargs):
+        # The row write and the goal / ledger updates made by the signal
+        # handlers below commit or roll back together.
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            return super().delete(*args, **kwargs)
             
     def __str__(self):
         return f"{self.type} - {self.category} - {self.amount} on {self.date}"
@@ -57,23 +87,244 @@ class Goal(models.Model):
             raise ValueError("Current amount cannot exceed target amount")
         super().save(*args, **kwargs)
 
+    @classmethod
+    def adjust_progress(cls, goal_id, amount):
+        """
+        Add `amount` (negative to subtract) to a goal's current_amount with a
+        single UPDATE, so concurrent transaction saves can't lose updates.
+        Increases keep save()'s rule of never exceeding the target.
+        """
+        goals = cls.objects.filter(pk=goal_id)
+        if amount > 0:
+            goals = goals.filter(current_amount__lte=F('target_amount') - amount)
+        if not goals.update(current_amount=F('current_amount') + amount) and amount > 0:
+            if cls.objects.filter(pk=goal_id).exists():
+                raise ValueError("Current amount cannot exceed target amount")
+
     def __str__(self):
         return self.name
 
+class LedgerSummary(models.Model):
+    """
+    Running totals of a user's transactions per type, category and month.
+    Maintained by the Transaction signals below so the dashboard never has
+    to re-aggregate the full transaction history.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='ledger_summaries')
+    type = models.CharField(max_length=20, choices=Transaction.TYPE_CHOICES)
+    category = models.ForeignKey('Category', on_delete=models.CASCADE, related_name='ledger_summaries')
+    month = models.DateField()
+    total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'type', 'category', 'month'], name='unique_ledger_bucket'),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} {self.type} {self.category_id} {self.month:%Y-%m}: {self.total}"
+
+    @staticmethod
+    def month_start(value):
+        """Normalise a date/datetime/ISO string to the first day of its month."""
+        value = Transaction._meta.get_field('date').to_python(value)
+        return value.replace(day=1)
+
+    @classmethod
+    def apply(cls, user_id, type, category_id, date, amount, count):
+        """
+        Atomically add `amount`/`count` to one bucket. Negative deltas never
+        create rows: a missing bucket means it was already deleted (e.g. by
+        a cascading user or category delete).
+        """
+        bucket = cls.objects.filter(
+            user_id=user_id, type=type, category_id=category_id, month=cls.month_start(date)
+        )
+        with transaction.atomic():
+            updated = bucket.update(total=F('total') + amount, count=F('count') + count)
+            if updated or count <= 0:
+                return
+            try:
+                with transaction.atomic():
+                    cls.objects.create(
+                        user_id=user_id, type=type, category_id=category_id,
+                        month=cls.month_start(date), total=amount, count=count,
+                    )
+            except IntegrityError:
+                # Lost the race against a concurrent insert of the same bucket.
+                bucket.update(total=F('total') + amount, count=F('count') + count)
+
+class PriceBar(models.Model):
+    """
+    One OHLC bar of market history. The local store behind the investment
+    suggestions: refreshes append only the bars newer than the last one kept.
+    """
+    ticker = models.CharField(max_length=20)
+    interval = models.CharField(max_length=10, default='1d')
+    timestamp = models.DateTimeField()
+    open = models.FloatField(null=True)
+    high = models.FloatField(null=True)
+    low = models.FloatField(null=True)
+    close = models.FloatField()
+    volume = models.BigIntegerField(null=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['ticker', 'interval', 'timestamp'], name='unique_price_bar'),
+        ]
+
+    def __str__(self):
+        return f"{self.ticker} {self.interval} {self.timestamp:%Y-%m-%d %H:%M} close={self.close}"
+
+class RecurringRule(models.Model):
+    """
+    A transaction that repeats on a cron-like schedule (see
+    ``services.schedule``), e.g. a salary, rent or a monthly SIP.
+
+    ``next_run`` is the first occurrence not materialized yet (None once the
+    rule has run past ``end_date``). The scheduler
+    (``services.recurring``) inserts the due occurrences and advances it in
+    the same database transaction.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='recurring_rules')
+    type = models.CharField(max_length=20, choices=Transaction.TYPE_CHOICES, default='expense')
+    category = models.ForeignKey('Category', on_delete=models.CASCADE, related_name='recurring_rules')
+    amount = models.DecimalField(max_digits=10, decimal_places=2)
+    description = models.TextField(blank=True)
+    goal = models.ForeignKey('Goal', on_delete=models.SET_NULL, null=True, blank=True)
+    schedule = models.CharField(
+        max_length=100,
+        help_text='Day of month, month, day of week, as in cron: "1 * *" is the 1st of every month, '
+                  '"L * *" the last day, "* * 1" every Monday, "15 1,7 *" January and July 15th.')
+    start_date = models.DateField(default=timezone.now)
+    end_date = models.DateField(null=True, blank=True)
+    next_run = models.DateField(null=True, blank=True)
+    active = models.BooleanField(default=True)
+
+    class Meta:
+        indexes = [
+            # The scheduler's scan for due rules, walked in pk order
+            models.Index(fields=['active', 'next_run', 'id'], name='rule_due'),
+        ]
+
+    def __str__(self):
+        return f"{self.type} {self.amount} on '{self.schedule}'"
+
+    def first_occurrence(self):
+        """First scheduled date on or after start_date, or None if there's none before end_date."""
+        start = Transaction._meta.get_field('date').to_python(self.start_date)
+        first = schedule.parse(self.schedule).next_on_or_after(start)
+        return None if first is None or (self.end_date and first > self.end_date) else first
+
+    def clean(self):
+        try:
+            first = self.first_occurrence()
+        except ValueError as e:
+            raise ValidationError({'schedule': str(e)})
+        if first is None:
+            raise ValidationError({'schedule': "The schedule has no date between the start and end dates."})
+
+    def save(self, *args, **kwargs):
+        if self._state.adding and self.next_run is None:
+            self.next_run = self.first_occurrence()
+        super().save(*args, **kwargs)
+
+
+class UserAdvice(models.Model):
+    """
+    A user's dashboard advice, precomputed by the batch job in
+    ``services.advice_service``. ``stale`` is set whenever the user's ledger
+    changes. Stale rows, rows from another version of the advice rules and
+    missing rows are recomputed by the next incremental run (and by the
+    dashboard on the fly until then).
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='advice')
+    savings_msg = models.TextField(default='')
+    expense_msg = models.TextField(default='')
+    tax_msg = models.TextField(default='')
+    category_msgs = models.JSONField(default=list)
+    # Empty when the advice depends on the market suggestions, decided per request
+    adaptive_msg = models.TextField(default='', blank=True)
+    computed_at = models.DateTimeField(null=True)
+    rules_version = models.CharField(max_length=16, default='', blank=True)  # digest of the advice rules file
+    stale = models.BooleanField(default=True)
+
+    class Meta:
+        indexes = [
+            # The incremental run's scan
+            models.Index(fields=['user'], condition=models.Q(stale=True), name='advice_stale'),
+        ]
+
+    def __str__(self):
+        return f"advice for {self.user_id}{' (stale)' if self.stale else ''}"
+
+    @classmethod
+    def mark_stale(cls, user_ids):
+        cls.objects.filter(user_id__in=user_ids, stale=False).update(stale=True)
+
+
+class DataVersion(models.Model):
+    """
+    Per-user counter bumped with every change to the user's transactions,
+    goals or profile (see ``services.data_version``). It lives in the database,
+    so every worker sees a bump as soon as the write commits.
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='data_version')
+    version = models.PositiveBigIntegerField(default=0)
+
+    def __str__(self):
+        return f"data version {self.version} for {self.user_id}"
+
+    @classmethod
+    def bump(cls, user_ids, create=True):
+        """
+        Increment the users' counters. Without `create`, missing rows stay
+        missing: deletes pass it, as a missing row then means the user is
+        being deleted too (every existing user got a row in the migration).
+        """
+        user_ids = list(user_ids)
+        updated = cls.objects.filter(user_id__in=user_ids).update(version=F('version') + 1)
+        if create and updated < len(user_ids):
+            # First write for some of them: create the rows, then bump again (a
+            # second bump for the others is harmless, versions only need to change)
+            cls.objects.bulk_create([cls(user_id=u) for u in user_ids], ignore_conflicts=True)
+            cls.objects.filter(user_id__in=user_ids).update(version=F('version') + 1)
+
+
+# Fields the signal handlers diff on (attnames, so FKs are read without a query)
+TRACKED_TRANSACTION_FIELDS = ('type', 'amount', 'goal_id', 'category_id', 'date')
+
+
+def _tracked_state(instance):
+    """
+    Current values of the tracked fields, or None if any of them is deferred
+    (reading a deferred field here would cost a query per instance).
+    """
+    values = instance.__dict__
+    if any(field not in values for field in TRACKED_TRANSACTION_FIELDS):
+        return None
+    return {field: values[field] for field in TRACKED_TRANSACTION_FIELDS}
+
+
+@receiver(post_init, sender=Transaction)
+def track_loaded_transaction(sender, instance, **kwargs):
+    """
+    Remember the state a Transaction was loaded with, so an update can be
+    diffed against it without re-fetching the row.
+    """
+    instance._old_state = _tracked_state(instance) if instance.pk else None
+
+
 @receiver(pre_save, sender=Transaction)
 def track_old_transaction(sender, instance, **kwargs):
     """
-    Before updating a Transaction, keep track of its old state.
+    Fallback for updates whose loaded state is unknown (deferred fields, or a
+    pk assigned by hand): fetch just the tracked columns.
     """
-    if instance.pk:  # Only for updates
-        old_instance = Transaction.objects.get(pk=instance.pk)
-        instance._old_amount = old_instance.amount
-        instance._old_type = old_instance.type
-        instance._old_goal = old_instance.goal
-    else:
-        instance._old_amount = None
-        instance._old_type = None
-        instance._old_goal = None
+    if instance.pk and getattr(instance, '_old_state', None) is None:
+        instance._old_state = (Transaction.objects.filter(pk=instance.pk)
+                               .values(*TRACKED_TRANSACTION_FIELDS).first())
 
 
 @receiver(post_save, sender=Transaction)
@@ -81,26 +332,38 @@ def update_goal_progress_on_save(sender, instance, created, **kwargs):
     """
     Adjust goal amounts on transaction create/update.
     """
-    # Case 1: New savings transaction
-    if created and instance.type == 'savings' and instance.goal:
-        instance.goal.current_amount += instance.amount
-        instance.goal.save()
-
-    # Case 2: Updating an existing transaction
-    elif not created:
-        old_amount = instance._old_amount
-        old_type = instance._old_type
-        old_goal = instance._old_goal
-
+    old = None if created else instance._old_state
+    with transaction.atomic():
         # If it was savings and linked to a goal before → revert the old value
-        if old_type == 'savings' and old_goal:
-            old_goal.current_amount -= old_amount
-            old_goal.save()
+        if old and old['type'] == 'savings' and old['goal_id']:
+            Goal.adjust_progress(old['goal_id'], -old['amount'])
 
         # If it is savings now → add the new value
-        if instance.type == 'savings' and instance.goal:
-            instance.goal.current_amount += instance.amount
-            instance.goal.save()
+        if instance.type == 'savings' and instance.goal_id:
+            Goal.adjust_progress(instance.goal_id, instance.amount)
+
+
+@receiver(post_save, sender=Transaction)
+def update_ledger_summary_on_save(sender, instance, created, **kwargs):
+    """
+    Move the transaction's amount between LedgerSummary buckets.
+    """
+    old = None if created else instance._old_state
+    with transaction.atomic():
+        if old:
+            LedgerSummary.apply(instance.user_id, old['type'], old['category_id'],
+                                old['date'], -old['amount'], -1)
+        LedgerSummary.apply(instance.user_id, instance.type, instance.category_id,
+                            instance.date, instance.amount, 1)
+
+
+@receiver(post_save, sender=Transaction)
+def reset_tracked_transaction(sender, instance, **kwargs):
+    """
+    The saved values are the new baseline for the next save of this instance.
+    Connected last so the handlers above still see the previous state.
+    """
+    instance._old_state = _tracked_state(instance)
 
 
 @receiver(post_delete, sender=Transaction)
@@ -108,6 +371,37 @@ def update_goal_progress_on_delete(sender, instance, **kwargs):
     """
     Adjust goal when a savings transaction is deleted.
     """
-    if instance.type == 'savings' and instance.goal:
-        instance.goal.current_amount -= instance.amount
-        instance.goal.save()
\ No newline at end of file
+    state = getattr(instance, '_old_state', None) or _tracked_state(instance)
+    if state and state['type'] == 'savings' and state['goal_id']:
+        Goal.adjust_progress(state['goal_id'], -state['amount'])
+
+
+@receiver(post_delete, sender=Transaction)
+def update_ledger_summary_on_delete(sender, instance, **kwargs):
+    """
+    Remove a deleted transaction from its LedgerSummary bucket.
+    """
+    state = getattr(instance, '_old_state', None) or _tracked_state(instance)
+    if state:
+        LedgerSummary.apply(instance.user_id, state['type'], state['category_id'],
+                            state['date'], -state['amount'], -1)
+
+
+@receiver(post_save, sender=Transaction)
+@receiver(post_delete, sender=Transaction)
+def mark_advice_stale(sender, instance, **kwargs):
+    """The precomputed advice is derived from the ledger totals."""
+    UserAdvice.mark_stale([instance.user_id])
+
+
+@receiver(post_save, sender=Transaction)
+@receiver(post_delete, sender=Transaction)
+@receiver(post_save, sender=Goal)
+@receiver(post_delete, sender=Goal)
+@receiver(post_save, sender=UserProfile)
+def bump_data_version(sender, instance, signal, **kwargs):
+    """
+    Anything derived from the user's data (API ETags, cached fragments) is
+    keyed by this version, so one bump invalidates all of it.
+    """
+    DataVersion.bump([instance.user_id], create=signal is post_save)
@@ -3,130 +3,58 @@ from .models import Transaction, UserProfile
 from decimal import Decimal
 from django.db.models import Sum
 from django.contrib.auth.models import User
+from datetime import date
+from .services import rule_engine, tax
 
 
-def generate_savings_recommendation(user):
-    income_total=Transaction.objects.filter(
-        user=user, type='income'
-    ).aggregate(total=models.Sum('amount'))['total'] or Decimal('0.00')
-
-    savings_total=Transaction.objects.filter(
-        user=user, type='savings'
-    ).aggregate(total=models.Sum('amount'))['total'] or Decimal('0.00')
-
-
-    if income_total ==0:
-        return "You have no income recorded. Please add your income to get savings recommendations."
-    
-    saving_ratio= (savings_total / income_total) * 100 if income_total > 0 else 0
-
-    if saving_ratio < 10:
-        return "Your savings ratio is below 10%. Consider increasing your savings to improve your financial health."
-    elif saving_ratio < 20:
-        return "Your savings ratio is between 10% and 20%. This is a good start, but you can aim for a higher savings rate."
-    elif saving_ratio < 30:
-        return "Your savings ratio is between 20% and 30%. You're doing well, but there's room for improvement."
-    else:
-        return "Great job! Your savings ratio is above 30%. Keep up the good work!"
-
-def generate_expense_recommendation(user):
-    income_total = Transaction.objects.filter(
-        user=user, type='income'
-    ).aggregate(total=models.Sum('amount'))['total'] or Decimal('0.00')
-
-    expenses_total = Transaction.objects.filter(
-        user=user, type='expense'
-    ).aggregate(total=models.Sum('amount'))['total'] or Decimal('0.00')
-    
-
-    if income_total == 0:
-        return "You have no income recorded. Please add your income to get expense recommendations."
-    
-    expense_ratio = (expenses_total / income_total) * 100 if income_total > 0 else 0
-    if expense_ratio > 90:
-        return "⚠️ Your expenses are above 90% of your income. Try reducing discretionary spending."
-    elif expense_ratio > 70:
-        return "Your expenses are a bit high (70–90% of income). Consider saving more aggressively."
-    elif expense_ratio > 50:
-        return "Balanced spending. Aim to keep expenses under 50% for better savings."
-    else:
-        return "Great job! Your expenses are well under control."
-
-def calculate_tax_recommendation(user):
-    income_total = Transaction.objects.filter(
-        user=user, type='income'
-    ).aggregate(total=models.Sum('amount'))['total'] or Decimal('0.00')
-
-    if income_total == 0:
+def _advice(snapshot, output):
+    """One output of the advice rules (services.rule_engine) for a single snapshot."""
+    metrics, rows = rule_engine.user_metrics([
+        (snapshot.income, snapshot.expenses, snapshot.savings,
+         [(c['category__name'], c['total']) for c in snapshot.category_expenses]),
+    ])
+    return rule_engine.get_rules().evaluate(metrics, rows, outputs=(output,))[output][0]
+
+
+def generate_savings_recommendation(snapshot):
+    return _advice(snapshot, "savings_msg")
+
+
+def generate_expense_recommendation(snapshot):
+    return _advice(snapshot, "expense_msg")
+
+
+def calculate_tax_recommendation(snapshot):
+    """Tax on the current financial year's income so far, under both regimes (see services.tax)."""
+    if snapshot.income == 0:
         return "You have no income recorded. Please add your income to get tax recommendations."
+    year = snapshot.financial_year or tax.financial_year(date.today())
+    label = tax.fy_label(year)
+    if snapshot.fy_income == 0:
+        return f"No income recorded for FY {label} yet."
 
-    # Example tax brackets (these should be updated based on actual tax laws)
-    
-    if income_total <= 400000:
-        return "No tax liability (Income ≤ ₹4L)."
-    elif income_total <= 800000:
-        tax = (income_total - 400000) * Decimal('0.05')
-    elif income_total <= 1200000:
-        tax = Decimal('20000') + (income_total - 800000) * Decimal('0.10')
-    elif income_total <= 1600000:
-        tax = Decimal('60000') + (income_total - 1200000) * Decimal('0.15')
-    elif income_total <= 2000000:
-        tax = Decimal('120000') + (income_total - 1600000) * Decimal('0.20')
-    elif income_total <= 2400000:
-        tax = Decimal('200000') + (income_total - 2000000) * Decimal('0.25')
-    else:
-        tax = Decimal('300000') + (income_total - 2400000) * Decimal('0.30')
-
-    # Apply Section 87A rebate if eligible
-    if income_total <= 1200000:
-        rebate = min(tax, Decimal('60000'))
-        tax -= rebate
-        return f"Estimated Tax: ₹{tax:.2f} (Rebate applied under Section 87A)."
-    else:
-        return f"Estimated Tax: ₹{tax:.2f} (No rebate)."
-
-
-def generate_category_expense_recommendation(user):
-    income_total = Transaction.objects.filter(
-        user=user, type='income'
-    ).aggregate(total=Sum('amount'))['total'] or Decimal('0.00')
-
-    if income_total == 0:
-        return ["You have no income recorded. Please add your income to get expense recommendations."]
-
-    category_expenses = Transaction.objects.filter(
-        user=user, type='expense'
-    ).values('category__name').annotate(total=Sum('amount'))
-
-    recommendations = []
-    for ce in category_expenses:
-        category_name = ce['category__name'] or "Uncategorized"
-        category_total = ce['total'] or Decimal('0')
-        category_ratio = (category_total / income_total) * 100
-
-        if category_ratio > 25:
-            recommendations.append(
-                f"⚠️ You spend {category_ratio:.0f}% of your income on {category_name}. Consider reducing to ≤25%."
-            )
-        elif category_ratio > 15:
-            recommendations.append(
-                f"Your spending on {category_name} is {category_ratio:.0f}% of income. Monitor it closely."
-            )
-        else:
-            recommendations.append(
-                f"✅ Good! Spending on {category_name} is {category_ratio:.0f}% of your income."
-            )
+    result = tax.compare_regimes(snapshot.fy_income, snapshot.fy_savings, year)
+    new, old = result["new"], result["old"]
+    message = f"FY {label} estimated tax: ₹{new['total']:.2f} (new regime), ₹{old['total']:.2f} (old regime)."
+    if result["best"] == "old":
+        message += f" The old regime saves ₹{new['total'] - old['total']:.2f} with your savings as deductions."
+    if result[result["best"]]["rebate"]:
+        message += " Rebate applied under Section 87A."
+    return message
 
-    if not recommendations:
-        recommendations.append("No expenses recorded yet.")
 
-    return recommendations
+def generate_category_expense_recommendation(snapshot):
+    return _advice(snapshot, "category_msgs")
 
 
 from django.core.cache import cache
-import yfinance as yf
+import hashlib
 import logging
-from typing import Optional
+import pickle
+from functools import partial
+from .services.market_data import fetch_market_data, FX_TICKER
+from .services.metrics_engine import compute_ticker_metrics
+from .services import swr_cache, profiling
 
 logger = logging.getLogger(__name__)
 
@@ -140,145 +68,84 @@ RISK_MAPPING = {
 }
 
 # --- Currency Conversion ---
-def get_usd_to_inr() -> float:
-    """Fetch USD → INR rate, cached for 1 hour, fallback to 83.0."""
-    cache_key = "fx_usd_inr"
-    cached = cache.get(cache_key)
+FX_FALLBACK_RATE = 83.0
+FX_FALLBACK_TTL = 60  # retry soon rather than pin the fallback for the full hour
+
+
+def store_usd_to_inr(fx_history):
+    """Cache the last close of a USDINR=X series for 1 hour and return it (None for a missing series)."""
+    if fx_history is None or fx_history.empty:
+        return None
+    rate = float(fx_history.close[-1])
+    cache.set("fx_usd_inr", rate, 3600)
+    return rate
+
+
+def get_usd_to_inr(fx_history=None) -> float:
+    """USD → INR rate from the cached 1y USDINR=X series, cached for 1 hour, fallback to 83.0."""
+    cached = cache.get("fx_usd_inr")
+    profiling.record_cache(bool(cached))
     if cached:
         return cached
 
-    try:
-        fx = yf.Ticker("USDINR=X")
-        data = fx.history(period="1d")
-        if not data.empty:
-            rate = float(data["Close"].iloc[-1])
-            cache.set(cache_key, rate, 3600)
-            return rate
-    except Exception as e:
-        logger.warning("USD→INR fetch failed: %s", e)
-
-    fallback = 83.0
-    cache.set(cache_key, fallback, 3600)
-    return fallback
-
-# --- Cached yfinance wrapper ---
-def _cached_history(ticker: str, period: str = "1y", interval: Optional[str] = None):
-    """Cache yfinance history to reduce API calls."""
-    key = f"yf_hist:{ticker}:{period}:{interval or '1d'}"
-    cached = cache.get(key)
-    if cached is not None:
-        return cached
-    try:
-        t = yf.Ticker(ticker)
-        hist = t.history(period=period, interval=interval) if interval else t.history(period=period)
-        cache.set(key, hist, 300)  # Cache 5 minutes
-        return hist
-    except Exception as e:
-        logger.warning("YFinance history fetch failed for %s: %s", ticker, e)
-        return None
+    if fx_history is None:
+        fx_history = _cached_history(FX_TICKER)
+    rate = store_usd_to_inr(fx_history)
+    if rate is not None:
+        return rate
+    logger.warning("USD→INR fetch failed, using fallback rate")
+    cache.set("fx_usd_inr", FX_FALLBACK_RATE, FX_FALLBACK_TTL)
+    return FX_FALLBACK_RATE
+
+# --- Cached market data wrapper ---
+def _cached_history(ticker: str):
+    """Daily close series for `ticker` from the local price store, refreshed every 5 minutes."""
+    return fetch_market_data([ticker])[ticker]["history"]
 
 # --- Compute metrics ---
-def _compute_metrics(ticker: str, usd_to_inr: float) -> dict:
-    """Compute metrics like last price, returns, volatility, trend, dividend yield."""
-    tkr = yf.Ticker(ticker)
+def _compute_metrics(ticker: str, usd_to_inr: float, history=None, info=None) -> dict:
+    """
+    Last price, 1M/1Y returns, 1M volatility, 5-day trend, dividend yield plus
+    drawdown/Sharpe/rolling volatility for one ticker (see metrics_engine).
+    """
+    return compute_ticker_metrics([ticker], [history], usd_to_inr, {ticker: info})[0]
 
-    # Name
-    try:
-        name = tkr.info.get("shortName") or ticker
-    except Exception:
-        name = ticker
+# --- Shared, risk-level keyed opportunity store ---
+INVEST_OPS_TTL = 300            # fresh for 5 mins
+INVEST_OPS_STALE_TTL = 60 * 60  # then served stale while refreshing
+INVEST_OPS_STATS_PREFIX = "invest_ops_stats"
 
-    # Last close price USD
-    price_usd = None
-    try:
-        h1d = _cached_history(ticker, period="1d")
-        if h1d is not None and not h1d.empty:
-            price_usd = round(float(h1d["Close"].iloc[-1]), 2)
-    except Exception:
-        pass
 
-    price_inr = round(price_usd * usd_to_inr, 2) if isinstance(price_usd, (int, float)) else "N/A"
+def _invest_ops_version(risk_level, usd_to_inr):
+    """Version tag that changes whenever the tickers for `risk_level` or the FX rate change."""
+    payload = repr((RISK_MAPPING[risk_level], round(usd_to_inr, 2)))
+    return hashlib.sha1(payload.encode()).hexdigest()[:10]
 
-    # 1M return
-    ret_1m = None
-    try:
-        h1m = _cached_history(ticker, period="1mo")
-        if h1m is not None and len(h1m) >= 2:
-            ret_1m = float(h1m["Close"].iloc[-1] / h1m["Close"].iloc[0] - 1.0)
-    except Exception:
-        pass
-
-    # 1Y return
-    ret_1y = None
-    try:
-        h1y = _cached_history(ticker, period="1y")
-        if h1y is not None and len(h1y) >= 2:
-            ret_1y = float(h1y["Close"].iloc[-1] / h1y["Close"].iloc[0] - 1.0)
-    except Exception:
-        pass
-
-    # 1M volatility
-    vol_1m = None
-    try:
-        if h1m is not None and len(h1m) > 5:
-            vol_1m = float(h1m["Close"].pct_change().dropna().std())
-    except Exception:
-        pass
-
-    # Intraday trend (5d/1h)
-    trend = None
-    try:
-        h5d = _cached_history(ticker, period="5d", interval="1h")
-        if h5d is not None and not h5d.empty:
-            trend = "📈 Uptrend" if h5d["Close"].iloc[-1] > h5d["Close"].mean() else "📉 Downtrend"
-    except Exception:
-        pass
-
-    # Dividend yield
-    div_yield = None
-    try:
-        dy = tkr.info.get("dividendYield")
-        if dy is not None:
-            div_yield = float(dy)
-    except Exception:
-        pass
 
-    return {
-        "ticker": ticker,
-        "name": name,
-        "price_usd": price_usd or "N/A",
-        "price_inr": price_inr,
-        "return_1m": ret_1m,
-        "return_1y": ret_1y,
-        "volatility_1m": vol_1m,
-        "trend": trend,
-        "dividend_yield": div_yield,
-    }
+def invest_ops_cache_key(risk_level, usd_to_inr):
+    return f"invest_ops:{_invest_ops_version(risk_level, usd_to_inr)}:{risk_level}"
 
-# --- Get investment opportunities ---
-def get_investment_opportunities(user):
-    """Fetch investments based on user risk profile, cached for 5 mins."""
-    from .models import UserProfile  # local import to avoid circular issues
 
+def _incr_stat(name, delta=1):
+    key = f"{INVEST_OPS_STATS_PREFIX}:{name}"
+    cache.add(key, 0, None)
     try:
-        profile = UserProfile.objects.get(user=user)
-        risk_level = profile.risk_tolerance
-    except UserProfile.DoesNotExist:
-        return [{"error": "No profile found. Please update your risk tolerance."}]
+        cache.incr(key, delta)
+    except ValueError:  # evicted between add and incr
+        cache.set(key, delta, None)
 
-    if risk_level not in RISK_MAPPING:
-        return [{"error": f"Unknown risk level '{risk_level}'. Please update your profile."}]
 
-    cache_key = f"invest_ops:{user.id}:{risk_level}"
-    cached = cache.get(cache_key)
-    if cached is not None:
-        return cached
-
-    usd_to_inr = get_usd_to_inr()
+def _build_risk_opportunities(risk_level, usd_to_inr):
+    """Compute the opportunity list for one risk level; returns (results, complete)."""
+    # One concurrent batch for every ticker
+    tickers = RISK_MAPPING[risk_level]
+    market = fetch_market_data(tickers, info_tickers=tickers)
     results = []
 
-    for ticker in RISK_MAPPING[risk_level]:
-        metrics = _compute_metrics(ticker, usd_to_inr)
+    all_metrics = compute_ticker_metrics(
+        tickers, [market[t]["history"] for t in tickers], usd_to_inr, {t: market[t]["info"] for t in tickers},
+    )
+    for metrics in all_metrics:
 
         # Simple horizon suggestion based on volatility
         vol = metrics.get("volatility_1m")
@@ -303,14 +170,90 @@ def get_investment_opportunities(user):
             "return_1y": metrics["return_1y"],
             "volatility_1m": metrics["volatility_1m"],
             "dividend_yield": metrics["dividend_yield"],
+            "max_drawdown_1y": metrics["max_drawdown_1y"],
+            "sharpe_1y": metrics["sharpe_1y"],
+            "rolling_volatility_20d": metrics["rolling_volatility_20d"],
             "horizon": horizon,
         })
 
-    cache.set(cache_key, results, 300)  # Cache 5 mins
+    complete = all(market[t]["history"] is not None for t in tickers)
+    return results, complete
+
+
+def _store_risk_opportunities(key, risk_level, results):
+    swr_cache.store(key, results, INVEST_OPS_TTL, INVEST_OPS_STALE_TTL)
+    cache.set(f"{INVEST_OPS_STATS_PREFIX}:bytes:{risk_level}", len(pickle.dumps(results)), None)
+
+
+def _refresh_risk_opportunities(key, risk_level, usd_to_inr):
+    results, complete = _build_risk_opportunities(risk_level, usd_to_inr)
+    if complete:
+        _store_risk_opportunities(key, risk_level, results)
+    return None  # stored above; keeps swr_cache from storing it without the size stat
+
+
+def get_risk_opportunities(risk_level):
+    """
+    Investment suggestions for a risk level. The result depends only on the
+    risk level and the FX rate, so it's shared by every user with that risk
+    tolerance under a versioned key.
+    """
+    usd_to_inr = get_usd_to_inr()
+    key = invest_ops_cache_key(risk_level, usd_to_inr)
+
+    cached, fresh = swr_cache.peek(key)
+    if cached is not None:
+        _incr_stat("hits")
+        if not fresh:
+            swr_cache.refresh_in_background(
+                key, partial(_refresh_risk_opportunities, key, risk_level, usd_to_inr),
+                INVEST_OPS_TTL, INVEST_OPS_STALE_TTL,
+            )
+        return cached
+
+    _incr_stat("misses")
+    results, complete = _build_risk_opportunities(risk_level, usd_to_inr)
+    # Don't pin partial results (timed-out tickers) for the full 5 minutes
+    if complete:
+        _store_risk_opportunities(key, risk_level, results)
     return results
 
 
+def peek_risk_opportunities(risk_level):
+    """The shared suggestions for a risk level if they're cached (fresh or stale), else None. Never fetches."""
+    usd_to_inr = cache.get("fx_usd_inr")
+    if not usd_to_inr or risk_level not in RISK_MAPPING:
+        return None
+    return swr_cache.peek(invest_ops_cache_key(risk_level, usd_to_inr))[0]
+
+
+def get_invest_ops_stats():
+    """Hit/miss counters and cached payload size per risk level for the shared store."""
+    hits = cache.get(f"{INVEST_OPS_STATS_PREFIX}:hits") or 0
+    misses = cache.get(f"{INVEST_OPS_STATS_PREFIX}:misses") or 0
+    sizes = cache.get_many([f"{INVEST_OPS_STATS_PREFIX}:bytes:{r}" for r in RISK_MAPPING])
+    entries = {key.rsplit(":", 1)[1]: size for key, size in sizes.items()}
+    return {
+        "hits": hits,
+        "misses": misses,
+        "hit_rate": hits / (hits + misses) if hits + misses else None,
+        "entries": entries,
+        "total_bytes": sum(entries.values()),
+    }
+
+
+# --- Get investment opportunities ---
+def get_investment_opportunities(user):
+    """Fetch investments based on user risk profile from the shared risk-level store."""
+    from .models import UserProfile  # local import to avoid circular issues
 
+    try:
+        profile = UserProfile.objects.get(user=user)
+        risk_level = profile.risk_tolerance
+    except UserProfile.DoesNotExist:
+        return [{"error": "No profile found. Please update your risk tolerance."}]
 
-       
+    if risk_level not in RISK_MAPPING:
+        return [{"error": f"Unknown risk level '{risk_level}'. Please update your profile."}]
 
+    return get_risk_opportunities(risk_level)
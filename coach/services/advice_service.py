@@ -1,20 +1,175 @@
-def adaptive_advice(income, expenses, savings, investments):
-    try:
-        income_f, expenses_f, savings_f = float(income), float(expenses), float(savings)
-    except Exception:
-        return "Add at least one income entry to unlock advice."
-
-    high_vol = any(
-        isinstance(inv.get("volatility_1m"), (int, float)) and inv["volatility_1m"] >= 0.02
-        for inv in (investments or [])
-    )
-
-    if income_f == 0:
-        return "Add at least one income entry to unlock personalized investing advice."
-    if expenses_f > income_f * 0.9:
-        return "⚠️ Expenses are ~90% of income. Reduce spending before high-risk investments."
-    if savings_f < income_f * 0.1:
-        return "💡 Save ≥10% of income before taking market risk."
-    if high_vol:
-        return "⚠️ Several suggestions are volatile. Balance with ETFs or bonds."
-    return "✅ Good balance! Explore more opportunities fitting your horizon."
+"""
+Dashboard advice: the recommendation messages and the adaptive investing
+advice, precomputed for every user into ``UserAdvice``.
+
+The batch job walks users in chunks of ``CHUNK_SIZE``. Each chunk is one
+database transaction:
+
+* the chunk's advice rows are created or marked fresh;
+* one query reads the LedgerSummary totals grouped by user, type and
+  category (with the current financial year's share as a FILTER sum);
+* the advice rules (``services.rule_engine``) are evaluated for the whole
+  chunk in one call;
+* the messages are written back with one upsert, tagged with the version of
+  the rules that produced them.
+
+A ledger write marks the user's row stale (``UserAdvice.mark_stale``),
+including one made while a chunk is being computed. A row from another
+version of the rules, or computed before the current financial year started
+(its tax advice is for the previous year), counts as stale too, so the
+incremental mode only has to revisit those and the missing rows. The dashboard reads a user's row with one
+lookup, and computes the advice itself (without storing it) while the row is
+stale or missing.
+"""
+import time
+from collections import defaultdict
+from datetime import datetime, timezone as dt_timezone
+from decimal import Decimal
+import numpy as np
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import Q, Sum
+from django.utils import timezone
+from ..models import LedgerSummary, UserAdvice
+from .. import recommendations
+from . import rule_engine, tax
+from .dashboard_service import FinancialSnapshot
+
+CHUNK_SIZE = 2000
+ADVICE_FIELDS = ("savings_msg", "expense_msg", "tax_msg", "category_msgs", "adaptive_msg")
+RULE_OUTPUTS = ("savings_msg", "expense_msg", "category_msgs", "adaptive_msg")
+
+
+def current_year():
+    """The financial year the advice is computed for."""
+    return tax.financial_year(timezone.now().date())
+
+
+def year_start(year):
+    """Advice computed before this (UTC, like `current_year`) belongs to an earlier financial year."""
+    return datetime.combine(tax.fy_bounds(year)[0], datetime.min.time(), tzinfo=dt_timezone.utc)
+
+
+def market_advice(investments, rules=None):
+    """The adaptive advice decided by the market suggestions (their highest volatility_1m)."""
+    vols = [inv["volatility_1m"] for inv in investments or ()
+            if isinstance(inv.get("volatility_1m"), (int, float))]
+    metrics = {"max_volatility": np.array([max(vols, default=0.0)])}
+    return (rules or rule_engine.get_rules()).evaluate(metrics, outputs=("market_msg",))["market_msg"][0]
+
+
+def adaptive_advice(snapshot, investments):
+    metrics, _ = rule_engine.user_metrics([(snapshot.income, snapshot.expenses, snapshot.savings, [])])
+    rules = rule_engine.get_rules()
+    return (rules.evaluate(metrics, outputs=("adaptive_msg",))["adaptive_msg"][0]
+            or market_advice(investments, rules))
+
+
+def evaluate(user_ids, rows, year, rules=None):
+    """
+    {user id: advice fields} for `user_ids` from the grouped ledger `rows`
+    ``(user_id, type, category name, total, financial-year total)``.
+    """
+    rules = rules or rule_engine.get_rules()
+    zero = Decimal("0.00")
+    totals = {user_id: {"income": zero, "expense": zero, "savings": zero, "fy_income": zero, "fy_savings": zero}
+              for user_id in user_ids}
+    categories = defaultdict(list)
+    for user_id, type_, name, total, fy_total in rows:
+        user = totals[user_id]
+        user[type_] += total or zero
+        if type_ in ("income", "savings"):
+            user[f"fy_{type_}"] += fy_total or zero
+        elif total is not None:
+            categories[user_id].append({"category__name": name, "total": total})
+
+    metrics, category_rows = rule_engine.user_metrics(
+        (u["income"], u["expense"], u["savings"], [(c["category__name"], c["total"]) for c in categories[user_id]])
+        for user_id, u in totals.items())
+    messages = rules.evaluate(metrics, category_rows, outputs=RULE_OUTPUTS)
+
+    advice = {}
+    for i, (user_id, u) in enumerate(totals.items()):
+        snapshot = FinancialSnapshot(u["income"], u["expense"], u["savings"], categories[user_id], None,
+                                     year, u["fy_income"], u["fy_savings"])
+        advice[user_id] = {output: messages[output][i] or "" for output in RULE_OUTPUTS}
+        advice[user_id]["tax_msg"] = recommendations.calculate_tax_recommendation(snapshot)
+    return advice
+
+
+def _ledger_rows(user_ids, year):
+    start, end = tax.fy_bounds(year)
+    return (LedgerSummary.objects.filter(user_id__in=user_ids).exclude(count=0)
+            .values_list("user_id", "type", "category__name")
+            .annotate(sum=Sum("total"), fy_sum=Sum("total", filter=Q(month__gte=start, month__lt=end)))
+            .order_by("user_id", "category__name"))
+
+
+def refresh_advice(user_ids, rules=None):
+    """Recompute and store the advice of `user_ids` (one chunk, one transaction). Returns {user id: fields}."""
+    now = timezone.now()
+    rules = rules or rule_engine.get_rules()
+    with transaction.atomic():
+        # Fresh from here on: a ledger write from now marks the row stale again,
+        # and the upsert below leaves that flag alone
+        UserAdvice.objects.bulk_create([UserAdvice(user_id=u, stale=False) for u in user_ids],
+                                       update_conflicts=True, unique_fields=["user"], update_fields=["stale"])
+        advice = compute_advice(user_ids, rules)
+        UserAdvice.objects.bulk_create(
+            [UserAdvice(user_id=u, computed_at=now, stale=False, rules_version=rules.digest, **fields)
+             for u, fields in advice.items()],
+            update_conflicts=True, unique_fields=["user"],
+            update_fields=[*ADVICE_FIELDS, "computed_at", "rules_version"])
+    return advice
+
+
+def users_to_refresh(incremental=False, rules_version="", year=None):
+    """
+    Ids of every user, or with `incremental` only those whose advice is
+    stale, missing, from other rules or from before financial year `year`
+    (default: the current one).
+    """
+    users = User.objects.all()
+    if incremental:
+        since = year_start(current_year() if year is None else year)
+        users = users.filter(Q(advice__isnull=True) | Q(advice__stale=True) | Q(advice__computed_at__lt=since)
+                             | ~Q(advice__rules_version=rules_version))
+    return users.order_by("pk").values_list("pk", flat=True)
+
+
+def run(incremental=False, chunk_size=CHUNK_SIZE):
+    """Refresh the advice of every user (or only the stale ones). Returns users, chunks and seconds."""
+    started = time.perf_counter()
+    rules, year = rule_engine.get_rules(), current_year()  # one version and year for the whole run
+    stats = {"users": 0, "chunks": 0}
+    last_pk = 0
+    while True:
+        chunk = list(users_to_refresh(incremental, rules.digest, year).filter(pk__gt=last_pk)[:chunk_size])
+        if not chunk:
+            break
+        last_pk = chunk[-1]
+        refresh_advice(chunk, rules)
+        stats["users"] += len(chunk)
+        stats["chunks"] += 1
+    stats["seconds"] = time.perf_counter() - started
+    return stats
+
+
+def compute_advice(user_ids, rules=None):
+    """{user id: advice fields} straight from the ledger, without storing them."""
+    year = current_year()
+    return evaluate(user_ids, _ledger_rows(user_ids, year), year, rules)
+
+
+def get_advice(user):
+    """
+    The user's advice fields: one lookup. A stale or missing row (or one from
+    an earlier financial year) is computed here instead (one more query) and
+    left for the next run to store, so requests never write.
+    """
+    rules = rule_engine.get_rules()
+    row = UserAdvice.objects.filter(user=user, stale=False, computed_at__gte=year_start(current_year()),
+                                    rules_version=rules.digest).first()
+    if row is None:
+        return compute_advice([user.pk], rules)[user.pk]
+    return {field: getattr(row, field) for field in ADVICE_FIELDS}
@@ -0,0 +1,169 @@
+"""
+Historical spending analytics: monthly or weekly series per transaction
+type, a per-category breakdown, rolling averages and year-over-year deltas
+for a selectable date range.
+
+The grouping happens in the database. Monthly series come from the
+LedgerSummary rollup, which is already bucketed by month. Weekly series
+(ranges up to about a year) group the raw transactions with TruncWeek and
+use the covering (user, type, date, amount) index. Only the zero-filling of
+empty periods, the rolling averages and the YoY comparisons run in Python,
+over at most a few hundred points.
+"""
+from datetime import date, timedelta
+from decimal import Decimal
+from django.db.models import F, Q, Sum
+from django.db.models.functions import TruncWeek
+from ..models import Transaction, LedgerSummary
+from .ledger_service import CENT
+
+TYPES = ("income", "expense", "savings")
+GRANULARITIES = ("month", "week")
+# Preset ranges for the dashboard selector, in months (None = all history)
+RANGES = {"3m": 3, "6m": 6, "1y": 12, "3y": 36, "10y": 120, "all": None}
+DEFAULT_RANGE = "1y"
+ROLLING_WINDOW = {"month": 3, "week": 4}
+# Periods per year, i.e. how far back the YoY comparison looks
+YEAR_LAG = {"month": 12, "week": 52}
+# Longer ranges fall back to monthly: weekly bars get unreadable, and grouping
+# years of raw rows by week is what would blow the latency budget
+WEEKLY_MAX_DAYS = 371
+ZERO = Decimal("0.00")
+# Explicit dates outside [EARLIEST_DATE, today + MAX_DAYS_AHEAD] are rejected: the
+# year of lookback would leave date's range, and the zero-filling is per period
+EARLIEST_DATE = date(1900, 1, 1)
+MAX_DAYS_AHEAD = 366
+
+
+def _add_months(day, months):
+    month = day.month - 1 + months
+    return day.replace(year=day.year + month // 12, month=month % 12 + 1, day=1)
+
+
+def _period_start(day, granularity):
+    if granularity == "month":
+        return day.replace(day=1)
+    return day - timedelta(days=day.weekday())  # Monday, like TruncWeek
+
+
+def _step(period, granularity, n=1):
+    return _add_months(period, n) if granularity == "month" else period + timedelta(weeks=n)
+
+
+def resolve_range(range_key=None, start=None, end=None, today=None):
+    """
+    Turn a preset (``RANGES``) or explicit ISO ``start``/``end`` dates into a
+    ``(start, end)`` pair. Returns None for an unknown preset or an
+    unparsable, inverted or out-of-bounds range. A None start means "from
+    the first data".
+    """
+    today = today or date.today()
+    if start or end:
+        try:
+            start = date.fromisoformat(start) if start else None
+            end = date.fromisoformat(end) if end else today
+        except ValueError:
+            return None
+        if start and start > end:
+            return None
+        if (start or end) < EARLIEST_DATE or end > today + timedelta(days=MAX_DAYS_AHEAD):
+            return None
+        return start, end
+    range_key = range_key or DEFAULT_RANGE
+    if range_key not in RANGES:
+        return None
+    months = RANGES[range_key]
+    return (_add_months(today, 1 - months) if months else None), today
+
+
+def _first_activity(user):
+    return (LedgerSummary.objects.filter(user=user).exclude(count=0)
+            .order_by("month").values_list("month", flat=True).first())
+
+
+def _grouped_totals(user, since, end, granularity):
+    """{period: {type: total}} for every period with data in [since, end], in one grouped query."""
+    if granularity == "month":
+        rows = (LedgerSummary.objects.filter(user=user, month__gte=since, month__lte=end).exclude(count=0)
+                .values(period=F("month"))
+                .annotate(**{t: Sum("total", filter=Q(type=t)) for t in TYPES}))
+    else:
+        rows = (Transaction.objects.filter(user=user, date__gte=since, date__lte=end)
+                .values(period=TruncWeek("date"))
+                .annotate(**{t: Sum("amount", filter=Q(type=t)) for t in TYPES}))
+    return {row["period"]: {t: row[t] or ZERO for t in TYPES} for row in rows.order_by()}
+
+
+def _category_totals(user, start, end, granularity, type_="expense"):
+    if granularity == "month":
+        qs = LedgerSummary.objects.filter(user=user, type=type_, month__gte=start, month__lte=end).exclude(count=0)
+        amount = "total"
+    else:
+        qs = Transaction.objects.filter(user=user, type=type_, date__gte=start, date__lte=end)
+        amount = "amount"
+    return list(qs.values("category__name").annotate(total=Sum(amount)).order_by("-total", "category__name"))
+
+
+def _average(values):
+    return (sum(values, ZERO) / len(values)).quantize(CENT)
+
+
+def _yoy(current, previous):
+    delta = current - previous
+    pct = round(float(delta / previous * 100), 1) if previous else None
+    return {"previous": previous, "delta": delta, "pct": pct}
+
+
+def get_analytics(user, start, end, granularity="month"):
+    """
+    Series for the periods overlapping [start, end] (start None = first
+    activity): per-type totals, a rolling average over ``ROLLING_WINDOW``
+    periods, and the change against the same period a year earlier. Also
+    returns the range totals and the expense breakdown by category.
+    Monthly ranges are widened to whole months; weekly ranges longer than
+    ``WEEKLY_MAX_DAYS`` are served monthly (see "granularity" in the result).
+    """
+    if granularity not in GRANULARITIES:
+        raise ValueError(f"Unknown granularity {granularity!r}")
+    # Imported history can predate EARLIEST_DATE; "all" starts there at the latest
+    start = start or max(_first_activity(user) or end, EARLIEST_DATE)
+    if granularity == "week" and (end - start).days > WEEKLY_MAX_DAYS:
+        granularity = "month"
+    first, last = _period_start(start, granularity), _period_start(end, granularity)
+    lag, window = YEAR_LAG[granularity], ROLLING_WINDOW[granularity]
+
+    # One query covers the range plus the year before it (YoY and the rolling window's lead-in)
+    lookback = _step(first, granularity, -lag)
+    totals = _grouped_totals(user, lookback, end, granularity)
+    periods, period = [], lookback
+    while period <= last:
+        periods.append(period)
+        period = _step(period, granularity)
+    filled = [totals.get(p) or dict.fromkeys(TYPES, ZERO) for p in periods]
+
+    series = []
+    for i in range(lag, len(periods)):
+        row = filled[i]
+        recent = filled[i - window + 1:i + 1]
+        series.append({
+            "period": periods[i],
+            **{t: row[t].quantize(CENT) for t in TYPES},
+            "rolling": {t: _average([r[t] for r in recent]) for t in TYPES},
+            "yoy": {t: _yoy(row[t].quantize(CENT), filled[i - lag][t].quantize(CENT)) for t in TYPES},
+        })
+
+    range_totals = {t: sum((s[t] for s in series), ZERO) for t in TYPES}
+    categories = _category_totals(user, first, end, granularity)
+    return {
+        "granularity": granularity,
+        "start": first,
+        "end": end,
+        "rolling_window": window,
+        "totals": range_totals,
+        "series": series,
+        "categories": [{
+            "category": c["category__name"],
+            "total": c["total"].quantize(CENT),
+            "share": round(float(c["total"] / range_totals["expense"] * 100), 1) if range_totals["expense"] else None,
+        } for c in categories],
+    }
@@ -0,0 +1,87 @@
+"""
+Shared plumbing for the bench_* and loadtest management commands: a
+throwaway database to run against, latency percentiles, and saving /
+comparing results so a regression fails the run.
+"""
+import json
+import math
+import os
+import tempfile
+from contextlib import contextmanager
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import override_settings
+
+
+@contextmanager
+def throwaway_database(on_disk=False):
+    """
+    Create a fresh test database (migrated, empty) for the duration of the
+    block, so benchmarks never touch real data. `on_disk` puts a SQLite test
+    database in a temporary file instead of memory, for multi-threaded runs.
+    """
+    old_name = connection.settings_dict["NAME"]
+    test_settings = connection.settings_dict.setdefault("TEST", {})
+    old_test_name = test_settings.get("NAME")
+    if on_disk and connection.vendor == "sqlite":
+        fd, path = tempfile.mkstemp(suffix=".sqlite3")
+        os.close(fd)
+        test_settings["NAME"] = path
+    try:
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        test_settings["NAME"] = old_test_name
+
+
+@contextmanager
+def isolated_cache():
+    """
+    Swap the default cache for an empty process-local one, so benchmarks can
+    clear it freely without touching a shared production cache.
+    """
+    with override_settings(CACHES={"default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "coach-benchmark",
+    }}):
+        cache.clear()
+        yield
+
+
+def percentile(values, q):
+    """Nearest-rank percentile (q in 0..100) of a non-empty list."""
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(q / 100 * len(ordered)) - 1)]
+
+
+def summarize(samples):
+    """Latency summary in milliseconds for a list of durations in seconds."""
+    ms = [s * 1000 for s in samples]
+    return {
+        "count": len(ms),
+        "mean_ms": sum(ms) / len(ms),
+        "p50_ms": percentile(ms, 50),
+        "p95_ms": percentile(ms, 95),
+        "p99_ms": percentile(ms, 99),
+    }
+
+
+def save_results(path, results):
+    with open(path, "w") as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+
+
+def compare_results(path, results, metric, tolerance):
+    """
+    Compare `metric` of every entry in `results` ({name: summary}) against a
+    baseline saved with save_results. Returns the list of regressions as
+    ``(name, baseline, current)`` where current exceeds baseline * tolerance.
+    """
+    with open(path) as f:
+        baseline = json.load(f)
+    regressions = []
+    for name, summary in results.items():
+        old = baseline.get(name, {}).get(metric)
+        if old is not None and summary[metric] > old * tolerance:
+            regressions.append((name, old, summary[metric]))
+    return regressions
@@ -1,26 +1,77 @@
-from django.db.models import Sum
+from decimal import Decimal
+from django.db.models import Sum, Q
 from django.utils import timezone
 from datetime import timedelta
-from ..models import Transaction, Goal, UserProfile
+from ..models import Transaction, Goal, UserProfile, LedgerSummary
+from . import ledger_service, tax
+
+
+class FinancialSnapshot:
+    """
+    Every aggregate the dashboard and the recommendation rules need, computed
+    once per request. Build it with `get_financial_snapshot(user)` and pass it
+    around instead of re-querying by user.
+    """
+
+    def __init__(self, income, expenses, savings, category_expenses, expenses_last_30_days,
+                 financial_year=None, fy_income=Decimal("0.00"), fy_savings=Decimal("0.00")):
+        self.income = income
+        self.expenses = expenses
+        self.savings = savings
+        self.net_income = income - (expenses + savings)
+        self.category_expenses = category_expenses
+        self.expenses_last_30_days = expenses_last_30_days
+        # Income and savings of the current financial year, for the tax estimate
+        self.financial_year = financial_year
+        self.fy_income = fy_income
+        self.fy_savings = fy_savings
+
+
+def get_financial_snapshot(user):
+    """
+    Build a FinancialSnapshot with one conditional aggregate over the
+    LedgerSummary rollup (type totals, per-category expenses and the current
+    financial year's income and savings) and one grouped query for the 30-day
+    daily expense series.
+    """
+    zero = Decimal("0.00")
+    year = tax.financial_year(timezone.now().date())
+    rows = (LedgerSummary.objects.filter(user=user).exclude(count=0)
+            .values("category__name")
+            .annotate(income=Sum("total", filter=Q(type="income")),
+                      expense=Sum("total", filter=Q(type="expense")),
+                      savings=Sum("total", filter=Q(type="savings")),
+                      **tax.fy_filters(year))
+            .order_by("category__name"))
+
+    income = expenses = savings = fy_income = fy_savings = zero
+    category_expenses = []
+    for row in rows:
+        income += row["income"] or zero
+        savings += row["savings"] or zero
+        fy_income += row["fy_income"] or zero
+        fy_savings += row["fy_savings"] or zero
+        if row["expense"] is not None:
+            expenses += row["expense"]
+            category_expenses.append({"category__name": row["category__name"], "total": row["expense"]})
+
+    return FinancialSnapshot(income, expenses, savings, category_expenses, get_expenses_last_30_days(user),
+                             year, fy_income, fy_savings)
+
 
 def get_income_expenses_savings(user):
-    totals = (Transaction.objects
-              .filter(user=user)
-              .values("type")
-              .annotate(total=Sum("amount")))
+    totals = ledger_service.get_type_totals(user)
 
-    income = next((x["total"] for x in totals if x["type"] == "income"), 0) or 0
-    expenses = next((x["total"] for x in totals if x["type"] == "expense"), 0) or 0
-    savings = next((x["total"] for x in totals if x["type"] == "savings"), 0) or 0
+    income = totals["income"]
+    expenses = totals["expense"]
+    savings = totals["savings"]
 
     net_income = income - (expenses + savings)
     return income, expenses, savings, net_income
 
 
 def get_category_expenses(user):
-    return (Transaction.objects.filter(user=user, type="expense")
-            .values("category__name")
-            .annotate(total=Sum("amount")))
+    return ledger_service.get_category_totals(user, "expense")
 
 
 def get_goal_progress(user):
@@ -42,7 +93,7 @@ def get_expenses_last_30_days(user):
     today = timezone.now().date()
     start = today - timedelta(days=29)
     expenses = (Transaction.objects.filter(user=user, type="expense", date__range=[start, today])
-                .values("date").annotate(total=Sum("amount")))
+                .values("date").annotate(total=Sum("amount")).order_by())
 
     expenses_dict = {item["date"]: item["total"] for item in expenses}
     result = []
@@ -0,0 +1,30 @@
+"""
+Per-user data version counter.
+
+Bumped whenever a user's transactions, goals or profile change, so anything
+derived from that data can be validated or cached under ``(user, version)``
+without re-running the aggregates.
+
+The counter is a ``DataVersion`` row rather than a cache entry: the cache may
+be per process, and a bump that only one worker sees would leave the others
+serving stale fragments and answering 304 for changed data. The bump runs
+inside the writing transaction, so the new version becomes visible together
+with the data.
+"""
+from ..models import DataVersion
+
+
+def get_version(user_id):
+    """Current version for the user (0 until their first write): one indexed lookup."""
+    return DataVersion.objects.filter(user_id=user_id).values_list("version", flat=True).first() or 0
+
+
+def bump(user_id):
+    """Invalidate everything derived from the user's data."""
+    DataVersion.bump([user_id])
+
+
+def bump_many(user_ids):
+    """`bump` for several users with one UPDATE (bulk writers: once per batch)."""
+    if user_ids:
+        DataVersion.bump(user_ids)
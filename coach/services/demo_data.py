@@ -0,0 +1,129 @@
+"""
+Synthetic users with realistic transaction histories, for local
+development, benchmarks and load tests.
+
+Each user gets a monthly salary, rent and utility bills, a savings transfer
+towards one of their goals, and a random stream of day-to-day spending.
+Rows go in with bulk_create, so the LedgerSummary rollup and goal progress
+are rebuilt from the inserted rows at the end instead of through signals.
+"""
+import random
+from datetime import date, timedelta
+from decimal import Decimal
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import Sum
+from ..models import Transaction, Category, Goal, UserProfile
+from .ledger_service import rebuild_ledger_summaries
+
+DEMO_PASSWORD = "demo-pass-123"
+BATCH_SIZE = 5000
+
+# category → (min, max) amount for everyday spending, with relative frequency
+EVERYDAY_SPENDING = {
+    "Groceries": ((200, 3000), 6),
+    "Food": ((100, 1500), 8),
+    "Transport": ((50, 800), 6),
+    "Shopping": ((300, 8000), 2),
+    "Entertainment": ((200, 2500), 2),
+    "Health": ((150, 5000), 1),
+    "Travel": ((2000, 40000), 0.2),
+}
+MONTHLY_BILLS = {"Rent": (8000, 35000), "Utilities": (1000, 4000)}
+INCOME_CATEGORY = "Salary"
+SAVINGS_CATEGORY = "Savings"
+GOAL_NAMES = ["Emergency Fund", "New Car", "Vacation", "House Down Payment", "Retirement"]
+
+
+def _month_starts(months, today):
+    first = today.replace(day=1)
+    starts = []
+    for _ in range(months):
+        starts.append(first)
+        first = (first - timedelta(days=1)).replace(day=1)
+    return starts[::-1]
+
+
+def _money(rng, low, high):
+    return Decimal(str(round(rng.uniform(low, high), 2)))
+
+
+def _user_history(rng, user_id, goal_ids, categories, months, today):
+    """Yield unsaved Transactions for one user, oldest month first."""
+    salary = Decimal(rng.randrange(30_000, 250_000, 1000))
+    everyday = list(EVERYDAY_SPENDING)
+    weights = [w for _, w in EVERYDAY_SPENDING.values()]
+    per_month = rng.randint(20, 45)
+
+    for start in _month_starts(months, today):
+        days_in_month = ((start + timedelta(days=32)).replace(day=1) - start).days
+        last_day = min(days_in_month, (today - start).days + 1)
+
+        def day(n):
+            return start + timedelta(days=min(n, last_day) - 1)
+
+        yield Transaction(user_id=user_id, type="income", category_id=categories[INCOME_CATEGORY],
+                          amount=salary, date=day(1), description="Monthly salary")
+        for name, (low, high) in MONTHLY_BILLS.items():
+            yield Transaction(user_id=user_id, type="expense", category_id=categories[name],
+                              amount=_money(rng, low, high), date=day(rng.randint(1, 7)), description=f"{name} bill")
+        yield Transaction(user_id=user_id, type="savings", category_id=categories[SAVINGS_CATEGORY],
+                          goal_id=rng.choice(goal_ids), amount=(salary * Decimal("0.1")).quantize(Decimal("1")),
+                          date=day(2), description="Savings transfer")
+        for _ in range(int(per_month * last_day / days_in_month)):
+            name = rng.choices(everyday, weights)[0]
+            low, high = EVERYDAY_SPENDING[name][0]
+            yield Transaction(user_id=user_id, type="expense", category_id=categories[name],
+                              amount=_money(rng, low, high), date=day(rng.randint(1, last_day)), description=name)
+
+
+def seed_users(count, months=12, prefix="demo", seed=0, batch_size=BATCH_SIZE):
+    """
+    Create `count` users named ``<prefix>0001``… (password ``DEMO_PASSWORD``)
+    with `months` of history each. Returns the list of created users.
+    """
+    rng = random.Random(seed)
+    today = date.today()
+    names = [f"{prefix}{i:04d}" for i in range(1, count + 1)]
+    password = make_password(DEMO_PASSWORD)  # hash once, not once per user
+
+    with transaction.atomic():
+        categories = {}
+        for name in [INCOME_CATEGORY, SAVINGS_CATEGORY, *MONTHLY_BILLS, *EVERYDAY_SPENDING]:
+            category = Category.objects.filter(name=name).order_by("id").first() or Category.objects.create(name=name)
+            categories[name] = category.pk
+
+        User.objects.bulk_create([User(username=n, password=password) for n in names])
+        users = list(User.objects.filter(username__in=names).order_by("id"))
+        risk_levels = [r for r, _ in UserProfile.RISK_TYPES]
+        UserProfile.objects.bulk_create([UserProfile(user=u, risk_tolerance=rng.choice(risk_levels)) for u in users])
+
+        # Targets are generous so the seeded savings never overshoot them
+        Goal.objects.bulk_create([
+            Goal(user=u, name=name, target_amount=Decimal("50000000"),
+                 target_date=today + timedelta(days=rng.randint(180, 3650)))
+            for u in users for name in rng.sample(GOAL_NAMES, rng.randint(1, 3))
+        ])
+        goals = {}
+        for goal_id, user_id in Goal.objects.filter(user__in=users).values_list("id", "user_id"):
+            goals.setdefault(user_id, []).append(goal_id)
+
+        batch = []
+        for user in users:
+            for tx in _user_history(rng, user.pk, goals[user.pk], categories, months, today):
+                batch.append(tx)
+                if len(batch) >= batch_size:
+                    Transaction.objects.bulk_create(batch)
+                    batch = []
+        Transaction.objects.bulk_create(batch)
+
+        user_ids = [u.pk for u in users]
+        rebuild_ledger_summaries(user_ids)
+        progress = (Transaction.objects.filter(user_id__in=user_ids, type="savings", goal__isnull=False)
+                    .values("goal_id").annotate(total=Sum("amount")).order_by())
+        Goal.objects.bulk_update(
+            [Goal(pk=row["goal_id"], current_amount=row["total"]) for row in progress], ["current_amount"],
+            batch_size=500,
+        )
+    return users
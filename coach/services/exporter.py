@@ -0,0 +1,134 @@
+"""
+Streaming export of a user's transactions as CSV, JSON Lines or Parquet.
+
+Rows come from a server-side iterator over one joined query (category and
+goal names included) and are encoded chunk by chunk, so memory use stays
+flat no matter how long the history is. Parquet needs pyarrow, which is
+optional: without it that format is simply not offered.
+"""
+import csv
+import io
+import json
+from .transaction_service import filtered_transactions
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # optional dependency
+    pa = pq = None
+
+CHUNK_SIZE = 2000
+COLUMNS = ("id", "date", "type", "category", "goal", "amount", "description")
+CONTENT_TYPES = {
+    "csv": "text/csv; charset=utf-8",
+    "jsonl": "application/x-ndjson",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+
+class ExportUnavailable(Exception):
+    """The requested format isn't supported (or its optional dependency is missing)."""
+
+
+def available_formats():
+    return [fmt for fmt in CONTENT_TYPES if fmt != "parquet" or pa is not None]
+
+
+def export_rows(user, tx_type=None, category_id=None, chunk_size=CHUNK_SIZE):
+    """
+    Yield ``COLUMNS`` tuples for the user's transactions, newest first. The
+    category and goal names come from the same query (what select_related
+    would join), read through a server-side cursor.
+    """
+    transactions = filtered_transactions(user, tx_type, category_id)
+    yield from transactions.values_list(
+        "id", "date", "type", "category__name", "goal__name", "amount", "description",
+    ).iterator(chunk_size=chunk_size)
+
+
+def _chunks(rows, chunk_size):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _stream_csv(rows, chunk_size):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(COLUMNS)
+    for chunk in _chunks(rows, chunk_size):
+        writer.writerows(chunk)
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():  # header only, no rows
+        yield buffer.getvalue().encode("utf-8")
+
+
+def _stream_jsonl(rows, chunk_size):
+    for chunk in _chunks(rows, chunk_size):
+        yield "".join(
+            json.dumps({
+                "id": pk, "date": day.isoformat(), "type": tx_type, "category": category,
+                "goal": goal, "amount": str(amount), "description": description,
+            }, ensure_ascii=False) + "\n"
+            for pk, day, tx_type, category, goal, amount, description in chunk
+        ).encode("utf-8")
+
+
+class _DrainableSink(io.RawIOBase):
+    """Write-only file object whose contents are handed out (and dropped) after every row group."""
+
+    def __init__(self):
+        self.parts = []
+        self.position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.parts.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def drain(self):
+        data = b"".join(self.parts)
+        self.parts = []
+        return data
+
+
+def _stream_parquet(rows, chunk_size):
+    schema = pa.schema([
+        ("id", pa.int64()), ("date", pa.date32()), ("type", pa.string()), ("category", pa.string()),
+        ("goal", pa.string()), ("amount", pa.decimal128(10, 2)), ("description", pa.string()),
+    ])
+    sink = _DrainableSink()
+    writer = pq.ParquetWriter(sink, schema)
+    try:
+        for chunk in _chunks(rows, chunk_size):
+            columns = list(zip(*chunk))
+            writer.write_table(pa.Table.from_arrays(
+                [pa.array(col, type=field.type) for col, field in zip(columns, schema)], schema=schema,
+            ))
+            yield sink.drain()
+    finally:
+        writer.close()
+    yield sink.drain()  # footer
+
+
+_ENCODERS = {"csv": _stream_csv, "jsonl": _stream_jsonl, "parquet": _stream_parquet}
+
+
+def stream_export(user, fmt="csv", tx_type=None, category_id=None, chunk_size=CHUNK_SIZE):
+    """Yield the encoded export of the user's transactions as a sequence of byte chunks."""
+    if fmt not in available_formats():
+        raise ExportUnavailable(f"Unsupported export format '{fmt}'")
+    return _ENCODERS[fmt](export_rows(user, tx_type, category_id, chunk_size), chunk_size)
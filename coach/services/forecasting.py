@@ -0,0 +1,186 @@
+"""
+Goal forecasts: when each goal is likely to be reached, and how likely it is
+to be reached by its target date.
+
+Two projections per goal:
+
+* a cadence projection: the remaining amount divided by the average monthly
+  savings linked to the goal over the last ``CADENCE_MONTHS`` months;
+* a Monte Carlo simulation of ``COACH_FORECAST_PATHS`` monthly paths. Each
+  path resamples the goal's historical monthly contributions (zero months
+  included). The balance compounds with log-normal returns for the user's
+  risk tolerance: the drift comes from ``EXPECTED_RETURNS``, and the
+  volatility is the average ``volatility_1m`` of the investment suggestions
+  for that risk level, falling back to ``DEFAULT_DAILY_VOLATILITY``.
+
+All paths of a goal are a single NumPy batch (a cumulative sum of log returns
+and one of discounted contributions) drawn as antithetic pairs, so a goal
+costs a few milliseconds.
+The generator is seeded with the goal and the day, so a goal's forecast is
+reproducible for a given day and data version.
+"""
+import math
+from datetime import date
+from decimal import Decimal
+import numpy as np
+from django.conf import settings
+from ..models import Transaction
+from .ledger_service import CENT
+
+CADENCE_MONTHS = 12
+MAX_MONTHS = 240  # simulation horizon cap (20 years)
+TRADING_DAYS_PER_MONTH = 21
+# Assumed long-run annual return per risk tolerance
+EXPECTED_RETURNS = {"no_risk": 0.04, "low": 0.06, "medium": 0.09, "high": 0.11, "very_high": 0.13}
+# Daily volatility when no market data is cached. no_risk is a T-bill rate,
+# so it is treated as cash whatever its quote does.
+DEFAULT_DAILY_VOLATILITY = {"no_risk": 0.0, "low": 0.005, "medium": 0.015, "high": 0.025, "very_high": 0.035}
+# Probability of reaching the target by its date from which a goal counts as on track / at risk
+ON_TRACK, AT_RISK = 0.8, 0.5
+PERCENTILES = (10, 50, 90)
+
+
+def _month_index(day):
+    return day.year * 12 + day.month - 1
+
+
+def _from_month_index(index):
+    year, month = divmod(index, 12)
+    return date(year, month + 1, 1)
+
+
+def _months_until(today, target):
+    """Whole months from today to the target date (0 if it has passed)."""
+    return max(0, _month_index(target) - _month_index(today) - (target.day < today.day))
+
+
+def _add_months(today, months):
+    return _from_month_index(_month_index(today) + months).replace(day=min(today.day, 28))
+
+
+def market_volatility(risk_level, opportunities=None):
+    """Daily volatility for the risk level: the mean volatility_1m of the suggestions, else the default."""
+    if risk_level == "no_risk":
+        return DEFAULT_DAILY_VOLATILITY["no_risk"]
+    vols = [o["volatility_1m"] for o in opportunities or ()
+            if isinstance(o.get("volatility_1m"), (int, float)) and math.isfinite(o["volatility_1m"])]
+    return float(np.mean(vols)) if vols else DEFAULT_DAILY_VOLATILITY.get(risk_level, 0.0)
+
+
+def monthly_contributions(user, goals, today):
+    """
+    {goal id: array of monthly savings linked to the goal}, from the first
+    month with a contribution in the last ``CADENCE_MONTHS`` up to the
+    current month, with empty months as zeros. One query for every goal.
+    """
+    current = _month_index(today)
+    since = _from_month_index(current - CADENCE_MONTHS + 1)
+    rows = (Transaction.objects.filter(user=user, type="savings", goal__in=goals, date__gte=since, date__lte=today)
+            .values_list("goal_id", "date", "amount"))
+    buckets = {}
+    for goal_id, day, amount in rows:
+        months = buckets.setdefault(goal_id, {})
+        months[_month_index(day)] = months.get(_month_index(day), 0.0) + float(amount)
+    result = {}
+    for goal_id, months in buckets.items():
+        first = min(months)
+        result[goal_id] = np.array([months.get(m, 0.0) for m in range(first, current + 1)])
+    return result
+
+
+def simulate(current, contributions, months, annual_return, daily_volatility, paths, rng):
+    """
+    Balance paths, as an array of shape ``(months, paths)``. Each month the
+    balance grows by a log-normal return, then receives a contribution drawn
+    from ``contributions``.
+
+    Paths come in antithetic pairs (mirrored returns, same contributions), so
+    only half of them need random draws, and the pairs also cut the variance.
+    Months are the leading axis so the cumulative sums run over contiguous rows.
+    """
+    half = (paths + 1) // 2
+    sigma = daily_volatility * math.sqrt(TRADING_DAYS_PER_MONTH)
+    mu = math.log1p(annual_return) / 12 - sigma ** 2 / 2
+    log_growth = np.empty((months, 2 * half))
+    if sigma:
+        shocks = rng.standard_normal((months, half))
+        np.multiply(shocks, sigma, out=log_growth[:, :half])
+        np.negative(log_growth[:, :half], out=log_growth[:, half:])
+        log_growth += mu
+    else:
+        log_growth.fill(mu)
+    growth = np.exp(np.cumsum(log_growth, axis=0, out=log_growth), out=log_growth)
+    deposits = np.zeros((months, 2 * half))
+    if len(contributions):
+        deposits[:, :half] = contributions[rng.integers(0, len(contributions), (months, half), dtype=np.int16)]
+        deposits[:, half:] = deposits[:, :half]
+    # balance_t = G_t * (B_0 + sum_{k<=t} c_k / G_k), with G the cumulative growth
+    deposits /= growth
+    np.cumsum(deposits, axis=0, out=deposits)
+    deposits += current
+    deposits *= growth
+    return deposits[:, :paths]
+
+
+def forecast_goal(goal, contributions, risk_level, daily_volatility, today, paths):
+    """
+    Forecast for one goal: status, probability of reaching the target by its
+    date, the cadence projection, and p10/p50/p90 completion dates and
+    balances at the target date (None where the horizon is too short).
+    """
+    current, target = float(goal.current_amount), float(goal.target_amount)
+    remaining = max(target - current, 0.0)
+    months_left = _months_until(today, goal.target_date)
+    average = float(contributions.mean()) if len(contributions) else 0.0
+    forecast = {
+        "monthly_contribution": Decimal(average).quantize(CENT),
+        "required_monthly": Decimal(remaining / max(months_left, 1)).quantize(CENT),
+        "months_left": months_left,
+    }
+    if remaining == 0:
+        return {**forecast, "status": "reached", "probability": 1.0, "projected_date": None,
+                "completion": None, "balance_at_target": None}
+
+    cadence_months = math.ceil(remaining / average) if average > 0 else None
+    forecast["projected_date"] = (_add_months(today, cadence_months)
+                                  if cadence_months is not None and cadence_months <= MAX_MONTHS else None)
+
+    # Long enough to see the slow paths finish too; out-of-reach goals only need the target date
+    reachable = forecast["projected_date"] is not None
+    horizon = min(MAX_MONTHS, max(months_left, math.ceil(1.5 * cadence_months) if reachable else 0, 12))
+    rng = np.random.default_rng([goal.pk, today.toordinal()])
+    balances = simulate(current, contributions, horizon, EXPECTED_RETURNS.get(risk_level, 0.0),
+                        daily_volatility, paths, rng)
+
+    reached = balances >= target
+    # First month each path reaches the target (horizon + 1 where it never does)
+    first = np.where(reached.any(axis=0), reached.argmax(axis=0) + 1, horizon + 1)
+    probability = float((first <= months_left).mean()) if months_left else 0.0
+    completion = {
+        f"p{p}": _add_months(today, int(m)) if m <= horizon else None
+        for p, m in zip(PERCENTILES, np.percentile(first, PERCENTILES, method="higher"))
+    }
+    at_target = balances[min(months_left, horizon) - 1] if months_left else np.full(paths, current)
+    forecast.update({
+        "status": "on_track" if probability >= ON_TRACK else "at_risk" if probability >= AT_RISK else "off_track",
+        "probability": round(probability, 3),
+        "completion": completion,
+        "balance_at_target": {f"p{p}": Decimal(v).quantize(CENT)
+                              for p, v in zip(PERCENTILES, np.percentile(at_target, PERCENTILES))},
+    })
+    return forecast
+
+
+def forecast_goals(user, goals, risk_level, opportunities=None, today=None):
+    """
+    {goal id: forecast} for the user's goals. ``opportunities`` are the
+    investment suggestions for ``risk_level`` (for their volatility), if known.
+    """
+    today = today or date.today()
+    paths = getattr(settings, "COACH_FORECAST_PATHS", 2000)
+    goals = list(goals)
+    contributions = monthly_contributions(user, goals, today)
+    volatility = market_volatility(risk_level, opportunities)
+    empty = np.zeros(0)
+    return {g.pk: forecast_goal(g, contributions.get(g.pk, empty), risk_level, volatility, today, paths)
+            for g in goals}
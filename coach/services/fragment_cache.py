@@ -0,0 +1,62 @@
+"""
+Per-user cache for computed dashboard fragments (recommendation messages,
+goal progress, chart series).
+
+Keys embed the user's data version, so the model receivers that bump it
+invalidate every fragment at once and nothing is ever deleted explicitly;
+superseded entries simply expire.
+"""
+from django.core.cache import cache
+from . import data_version, profiling
+
+FRAGMENT_TTL = 60 * 60 * 24
+STATS_PREFIX = "fragment_stats"
+# Fragment names in use, so the stats can be read with one get_many
+FRAGMENTS = ("dashboard", "summary", "category_expenses", "expenses_30d", "goals", "trends")
+
+
+def fragment_key(user_id, name, version, variant=""):
+    return f"frag:{user_id}:{version}:{name}:{variant}"
+
+
+def _incr_stat(name):
+    key = f"{STATS_PREFIX}:{name}"
+    cache.add(key, 0, None)
+    try:
+        cache.incr(key)
+    except ValueError:  # evicted between add and incr
+        cache.set(key, 1, None)
+
+
+def get_fragment(user_id, name, compute, variant="", timeout=FRAGMENT_TTL, version=None):
+    """
+    Return the cached `name` fragment for the user's current data version,
+    calling `compute()` and storing its result on a miss. `variant` covers
+    inputs other than the user's data (e.g. today's date for a rolling window).
+    Pass `version` if the caller already read it.
+    """
+    if version is None:
+        version = data_version.get_version(user_id)
+    key = fragment_key(user_id, name, version, variant)
+    value = cache.get(key)
+    profiling.record_cache(value is not None)
+    if value is not None:
+        _incr_stat(f"hits:{name}")
+        return value
+    _incr_stat(f"misses:{name}")
+    value = compute()
+    cache.set(key, value, timeout)
+    return value
+
+
+def get_fragment_stats():
+    """Hit/miss counters per fragment name (names that were never requested are absent)."""
+    stats = {}
+    for key, count in cache.get_many(_stat_keys()).items():
+        _, kind, name = key.split(":", 2)
+        stats.setdefault(name, {"hits": 0, "misses": 0})[kind] = count
+    return stats
+
+
+def _stat_keys():
+    return [f"{STATS_PREFIX}:{kind}:{name}" for name in FRAGMENTS for kind in ("hits", "misses")]
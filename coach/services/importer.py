@@ -0,0 +1,208 @@
+"""
+Bulk transaction import from CSV or OFX bank statements.
+
+Files are parsed as a stream and inserted with ``bulk_create`` in batches.
+Because ``bulk_create`` skips the per-row Transaction signals, the goal
+progress and LedgerSummary deltas are accumulated while importing and
+applied once per goal / bucket at the end, all inside one database
+transaction.
+"""
+import csv
+import re
+import time
+from collections import defaultdict
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from ..models import Transaction, Category, Goal
+from . import data_version, ledger_service
+
+BATCH_SIZE = 5000
+MAX_REPORTED_ERRORS = 50
+DEFAULT_CATEGORY = "Uncategorized"
+TYPES = {"income", "expense", "savings"}
+DATE_FORMATS = ("%Y-%m-%d", "%d/%m/%Y", "%d-%m-%Y", "%m/%d/%Y", "%Y%m%d")
+AMOUNT_FIELD = Transaction._meta.get_field("amount")
+
+
+class ImportFailed(Exception):
+    """The import was rolled back; nothing was written."""
+
+
+def _parse_date(value):
+    day = value.strip().split("T")[0].split(" ")[0]  # drop any time part
+    try:
+        return date.fromisoformat(day)  # fast path for the common YYYY-MM-DD
+    except ValueError:
+        pass
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(day, fmt).date()
+        except ValueError:
+            continue
+    raise ValueError(f"unrecognised date '{value}'")
+
+
+def _parse_amount(value):
+    try:
+        amount = Decimal(value.strip().replace(",", ""))
+    except (InvalidOperation, AttributeError):
+        raise ValueError(f"invalid amount '{value}'")
+    # NaN, infinities and values the column can't hold (max_digits/decimal_places)
+    # fail the row here, not the bulk insert. Trailing zeros don't count as places.
+    try:
+        AMOUNT_FIELD.run_validators(amount.normalize())
+    except ValidationError as e:
+        raise ValueError(f"invalid amount '{value}': {e.messages[0]}")
+    return amount
+
+
+def _normalise(raw):
+    """
+    Turn a parsed record into Transaction field values. Without an explicit
+    type, the sign of the amount decides between income and expense.
+    """
+    amount = _parse_amount(raw.get("amount") or "")
+    tx_type = (raw.get("type") or "").strip().lower()
+    if not tx_type:
+        tx_type = "expense" if amount < 0 else "income"
+    if tx_type not in TYPES:
+        raise ValueError(f"unknown type '{tx_type}'")
+    return {
+        "date": _parse_date(raw.get("date") or ""),
+        "type": tx_type,
+        "amount": abs(amount),
+        "category": (raw.get("category") or "").strip() or DEFAULT_CATEGORY,
+        "description": (raw.get("description") or "").strip(),
+        "goal": (raw.get("goal") or "").strip(),
+    }
+
+
+def parse_csv(stream):
+    """
+    Yield (line number, record) from a CSV with a header row. Recognised
+    columns: date, amount, type, category, description, goal (case-insensitive).
+    """
+    reader = csv.DictReader(stream)
+    if reader.fieldnames:
+        reader.fieldnames = [name.strip().lower() for name in reader.fieldnames]
+    for row in reader:
+        yield reader.line_num, row
+
+
+_OFX_TAG = re.compile(r"<(/?)([A-Za-z0-9.]+)>([^<\r\n]*)")
+
+
+def parse_ofx(stream):
+    """
+    Yield (line number, record) for every <STMTTRN> in an OFX/QFX statement
+    (SGML or XML flavour), reading it line by line.
+    """
+    current = None
+    start_line = 0
+    for line_num, line in enumerate(stream, start=1):
+        for closing, tag, value in _OFX_TAG.findall(line):
+            tag = tag.upper()
+            if tag == "STMTTRN":
+                if closing and current is not None:
+                    yield start_line, current
+                    current = None
+                elif not closing:
+                    current, start_line = {}, line_num
+            elif current is not None and not closing:
+                value = value.strip()
+                if tag == "DTPOSTED":
+                    current["date"] = value[:8]
+                elif tag == "TRNAMT":
+                    current["amount"] = value
+                elif tag in ("NAME", "MEMO") and value:
+                    current["description"] = f"{current['description']} {value}" if current.get("description") else value
+    if current:
+        yield start_line, current
+
+
+PARSERS = {"csv": parse_csv, "ofx": parse_ofx}
+
+
+class _CategoryResolver:
+    """Category name → id from one in-memory map, creating unknown names as needed."""
+
+    def __init__(self):
+        self.ids = {}
+        for pk, name in Category.objects.values_list("id", "name").order_by("-id"):
+            self.ids[name.lower()] = pk  # lowest id wins for duplicate names
+
+    def resolve(self, names):
+        missing = {n.lower(): n for n in names if n.lower() not in self.ids}
+        if missing:
+            created = Category.objects.bulk_create([Category(name=n) for n in missing.values()])
+            if any(c.pk is None for c in created):  # backends that can't return ids from bulk inserts
+                created = Category.objects.filter(name__in=missing.values())
+            for c in created:
+                self.ids.setdefault(c.name.lower(), c.pk)
+        return self.ids
+
+
+def import_transactions(user, stream, fmt="csv", batch_size=BATCH_SIZE):
+    """
+    Import every record of `stream` (a text file object) for `user`.
+
+    Invalid rows are skipped and reported; a goal overshooting its target
+    aborts the whole import (ImportFailed). Returns a stats dict with row
+    counts, the first few errors and the elapsed time.
+    """
+    started = time.perf_counter()
+    parser = PARSERS[fmt]
+    goals = {g.name.lower(): g.pk for g in Goal.objects.filter(user=user)}
+    stats = {"rows": 0, "imported": 0, "skipped": 0, "errors": []}
+
+    ledger_deltas = defaultdict(lambda: [Decimal("0"), 0])  # (user_id, type, category_id, month) → [amount, count]
+    goal_deltas = defaultdict(Decimal)
+
+    def flush(batch):
+        categories = resolver.resolve({rec["category"] for rec in batch})
+        objs = []
+        for rec in batch:
+            category_id = categories[rec["category"].lower()]
+            goal_id = goals.get(rec["goal"].lower()) if rec["type"] == "savings" and rec["goal"] else None
+            objs.append(Transaction(user_id=user.pk, type=rec["type"], category_id=category_id, amount=rec["amount"],
+                                    date=rec["date"], description=rec["description"], goal_id=goal_id))
+            bucket = ledger_deltas[(user.pk, rec["type"], category_id, rec["date"].replace(day=1))]
+            bucket[0] += rec["amount"]
+            bucket[1] += 1
+            if goal_id:
+                goal_deltas[goal_id] += rec["amount"]
+        Transaction.objects.bulk_create(objs, batch_size=batch_size)
+        stats["imported"] += len(objs)
+
+    try:
+        with transaction.atomic():
+            resolver = _CategoryResolver()
+            batch = []
+            for line_num, raw in parser(stream):
+                stats["rows"] += 1
+                try:
+                    batch.append(_normalise(raw))
+                except ValueError as e:
+                    stats["skipped"] += 1
+                    if len(stats["errors"]) < MAX_REPORTED_ERRORS:
+                        stats["errors"].append(f"line {line_num}: {e}")
+                    continue
+                if len(batch) >= batch_size:
+                    flush(batch)
+                    batch = []
+            if batch:
+                flush(batch)
+
+            # One aggregated pass instead of per-row signals
+            ledger_service.apply_deltas(ledger_deltas)
+            for goal_id, amount in goal_deltas.items():
+                Goal.adjust_progress(goal_id, amount)
+            if stats["imported"]:
+                data_version.bump(user.pk)  # bulk_create skips the signal that does this
+    except ValueError as e:  # goal target exceeded
+        raise ImportFailed(str(e)) from e
+
+    stats["seconds"] = time.perf_counter() - started
+    return stats
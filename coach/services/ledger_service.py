@@ -0,0 +1,145 @@
+from collections import defaultdict
+from decimal import Decimal
+from django.db import transaction, IntegrityError
+from django.db.models import F, Sum, Count, Q
+from django.db.models.functions import TruncMonth
+from ..models import Transaction, LedgerSummary, UserAdvice
+
+CENT = Decimal("0.01")
+
+
+def _bucket_key(row):
+    return (row["user_id"], row["type"], row["category_id"], row["month"])
+
+
+def _expected_buckets(user_ids=None):
+    """Aggregate the raw Transaction table into LedgerSummary-shaped rows."""
+    qs = Transaction.objects.all()
+    if user_ids:
+        qs = qs.filter(user_id__in=user_ids)
+    return (qs.annotate(month=TruncMonth("date"))
+            .values("user_id", "type", "category_id", "month")
+            .annotate(total=Sum("amount"), count=Count("id"))
+            .order_by())
+
+
+def rebuild_ledger_summaries(user_ids=None, batch_size=1000):
+    """
+    Recompute LedgerSummary from scratch for the given users (all users if
+    omitted) in one grouped query, replacing the existing rows in bulk.
+    Returns the number of buckets written.
+    """
+    existing = LedgerSummary.objects.all()
+    advice = UserAdvice.objects.all()
+    if user_ids:
+        existing = existing.filter(user_id__in=user_ids)
+        advice = advice.filter(user_id__in=user_ids)
+
+    with transaction.atomic():
+        existing.delete()
+        advice.update(stale=True)
+        batch, written = [], 0
+        for row in _expected_buckets(user_ids).iterator(chunk_size=batch_size):
+            batch.append(LedgerSummary(
+                user_id=row["user_id"], type=row["type"], category_id=row["category_id"],
+                month=row["month"], total=row["total"], count=row["count"],
+            ))
+            if len(batch) >= batch_size:
+                LedgerSummary.objects.bulk_create(batch)
+                written += len(batch)
+                batch = []
+        if batch:
+            LedgerSummary.objects.bulk_create(batch)
+            written += len(batch)
+    return written
+
+
+def apply_deltas(deltas, batch_size=1000):
+    """
+    Add aggregated ``{(user_id, type, category_id, month): [amount, count]}``
+    deltas to LedgerSummary, for the bulk writers that bypass the per-row
+    signals. Existing buckets get one ``F()`` UPDATE per distinct delta
+    (recurring amounts repeat, so that is a handful of statements), and the
+    missing ones one bulk_create. Call it inside a transaction.
+    """
+    if not deltas:
+        return
+    user_ids = {key[0] for key in deltas}
+    UserAdvice.mark_stale(user_ids)
+    months = {key[3] for key in deltas}
+    existing = {}
+    for pk, *key in (LedgerSummary.objects.filter(user_id__in=user_ids, month__in=months)
+                     .values_list("pk", "user_id", "type", "category_id", "month").order_by()):
+        if tuple(key) in deltas:
+            existing[tuple(key)] = pk
+
+    by_delta = defaultdict(list)
+    for key, pk in existing.items():
+        by_delta[tuple(deltas[key])].append(pk)
+    for (amount, count), pks in by_delta.items():
+        for i in range(0, len(pks), batch_size):
+            LedgerSummary.objects.filter(pk__in=pks[i:i + batch_size]).update(
+                total=F("total") + amount, count=F("count") + count)
+
+    new = [LedgerSummary(user_id=u, type=t, category_id=c, month=m, total=amount, count=count)
+           for (u, t, c, m), (amount, count) in deltas.items() if (u, t, c, m) not in existing and count > 0]
+    try:
+        with transaction.atomic():
+            LedgerSummary.objects.bulk_create(new, batch_size=batch_size)
+    except IntegrityError:
+        # A concurrent save created one of the buckets; fall back to per-bucket upserts
+        for bucket in new:
+            LedgerSummary.apply(bucket.user_id, bucket.type, bucket.category_id, bucket.month,
+                                bucket.total, bucket.count)
+
+
+def check_ledger_summaries(user_ids=None):
+    """
+    Compare LedgerSummary against the raw transactions and return a list of
+    drifted buckets (empty when everything is consistent).
+    """
+    expected = {_bucket_key(r): r for r in _expected_buckets(user_ids)}
+
+    actual_qs = LedgerSummary.objects.exclude(count=0, total=0)
+    if user_ids:
+        actual_qs = actual_qs.filter(user_id__in=user_ids)
+    actual = {_bucket_key(r): r for r in actual_qs.values("user_id", "type", "category_id", "month", "total", "count")}
+
+    drift = []
+    for key in expected.keys() | actual.keys():
+        exp = expected.get(key, {})
+        act = actual.get(key, {})
+        # SQLite sums decimals as floats, so round the recomputed total back to cents
+        exp_total = (exp.get("total") or Decimal("0")).quantize(CENT)
+        act_total = act.get("total") or Decimal("0")
+        exp_count, act_count = exp.get("count") or 0, act.get("count") or 0
+        if exp_total != act_total or exp_count != act_count:
+            user_id, type_, category_id, month = key
+            drift.append({
+                "user_id": user_id,
+                "type": type_,
+                "category_id": category_id,
+                "month": month,
+                "expected_total": exp_total,
+                "actual_total": act_total,
+                "expected_count": exp_count,
+                "actual_count": act_count,
+            })
+    drift.sort(key=lambda d: (d["user_id"], d["month"], d["type"], d["category_id"]))
+    return drift
+
+
+def get_type_totals(user):
+    """Lifetime totals per transaction type, read from LedgerSummary in one FILTER aggregate row."""
+    totals = LedgerSummary.objects.filter(user=user).aggregate(
+        **{type_: Sum("total", filter=Q(type=type_)) for type_ in ("income", "expense", "savings")}
+    )
+    return {type_: total or Decimal("0.00") for type_, total in totals.items()}
+
+
+def get_category_totals(user, type="expense"):
+    """Lifetime totals per category name for one transaction type."""
+    return (LedgerSummary.objects.filter(user=user, type=type).exclude(count=0)
+            .values("category__name")
+            .annotate(total=Sum("total"))
+            .order_by("category__name"))
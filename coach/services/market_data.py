@@ -0,0 +1,251 @@
+"""
+Market-data access for the investment suggestions.
+
+All network I/O goes through a provider object (yfinance by default, see
+``COACH_MARKET_DATA_PROVIDER``) so tests and local development can swap in a
+stub. ``fetch_market_data`` fetches every ticker concurrently with a bounded
+pool and an overall timeout, returning whatever finished in time. Bars are
+kept in the local price store (``price_store``); the cache only tracks
+freshness, with stale-while-revalidate semantics (see ``swr_cache``).
+"""
+import logging
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor, wait
+from functools import partial
+from django.conf import settings
+from django.db import close_old_connections
+from django.utils.module_loading import import_string
+from . import swr_cache, price_store, profiling
+
+logger = logging.getLogger(__name__)
+
+FX_TICKER = "USDINR=X"
+HISTORY_PERIOD = "1y"
+HISTORY_TTL = 300                # 5 minutes fresh
+HISTORY_STALE_TTL = 60 * 60 * 24  # then served stale while refreshing
+INFO_TTL = 60 * 60 * 24          # names / dividend yields rarely change
+INFO_STALE_TTL = 60 * 60 * 24 * 7
+
+
+class YFinanceProvider:
+    """Default provider backed by yfinance (imported lazily)."""
+
+    def history(self, ticker, period=HISTORY_PERIOD, interval="1d", start=None):
+        import yfinance as yf
+        if start is not None:
+            return yf.Ticker(ticker).history(start=start, interval=interval)
+        return yf.Ticker(ticker).history(period=period, interval=interval)
+
+    def info(self, ticker):
+        import yfinance as yf
+        return yf.Ticker(ticker).info or {}
+
+
+class SyntheticProvider:
+    """
+    Offline provider with deterministic random-walk prices, for local
+    development, benchmarks and load tests (no network, no API limits).
+    """
+
+    def __init__(self, latency=0.0, days=260):
+        self.latency = latency
+        self.days = days
+
+    def history(self, ticker, period=HISTORY_PERIOD, interval="1d", start=None):
+        import numpy as np
+        import pandas as pd
+        time.sleep(self.latency)
+        rng = np.random.default_rng(zlib.crc32(ticker.encode()))
+        index = pd.bdate_range(end=pd.Timestamp.now(tz="UTC").normalize(), periods=self.days)
+        base = 83.0 if ticker == FX_TICKER else rng.uniform(20, 400)
+        close = base * np.exp(np.cumsum(rng.normal(0.0003, 0.015, len(index))))
+        frame = pd.DataFrame({"Open": close, "High": close * 1.01, "Low": close * 0.99, "Close": close,
+                              "Volume": rng.integers(10_000, 1_000_000, len(index))}, index=index)
+        if start is not None:
+            frame = frame[frame.index >= pd.Timestamp(start, tz="UTC")]
+        return frame
+
+    def info(self, ticker):
+        time.sleep(self.latency)
+        return {"shortName": f"{ticker} (synthetic)", "dividendYield": (zlib.crc32(ticker.encode()) % 400) / 10000}
+
+
+_provider = None
+
+
+def get_provider():
+    """Return the configured provider instance (built once per process)."""
+    global _provider
+    if _provider is None:
+        path = getattr(settings, "COACH_MARKET_DATA_PROVIDER", "coach.services.market_data.YFinanceProvider")
+        _provider = import_string(path)()
+    return _provider
+
+
+def set_provider(provider):
+    """Override the provider (e.g. with a stub in tests); None resets to the configured one."""
+    global _provider
+    _provider = provider
+
+
+def history_cache_key(ticker, period=HISTORY_PERIOD, interval="1d"):
+    return f"yf_hist:{ticker}:{period}:{interval}"
+
+
+def info_cache_key(ticker):
+    return f"yf_info:{ticker}"
+
+
+def _download_history(provider, ticker, start=None):
+    try:
+        if start is None:
+            return provider.history(ticker, period=HISTORY_PERIOD)
+        return provider.history(ticker, start=start)
+    except Exception as e:
+        logger.warning("History fetch failed for %s: %s", ticker, e)
+        return None
+
+
+def _download_info(provider, ticker, start=None):
+    try:
+        return provider.info(ticker)
+    except Exception as e:
+        logger.warning("Info fetch failed for %s: %s", ticker, e)
+        return None
+
+
+def _history_start(ticker):
+    """Date to resume downloading from: the last stored bar, or None for a full year."""
+    last = price_store.last_timestamp(ticker)
+    return last.date() if last else None
+
+
+def _persist(ticker, field, raw):
+    """Save a downloaded payload and return what goes in the cache (history → store marker)."""
+    if raw is None:
+        return None
+    if field == "history":
+        return price_store.append_history(ticker, raw)
+    return raw
+
+
+# field -> (cache key, downloader, ttl, stale ttl)
+_FIELDS = {
+    "history": (history_cache_key, _download_history, HISTORY_TTL, HISTORY_STALE_TTL),
+    "info": (info_cache_key, _download_info, INFO_TTL, INFO_STALE_TTL),
+}
+
+
+def _refresh_one(provider, ticker, field):
+    """Download and persist one field; the loader used for background refreshes."""
+    downloader = _FIELDS[field][1]
+    start = _history_start(ticker) if field == "history" else None
+    return _persist(ticker, field, downloader(provider, ticker, start))
+
+
+def _store_late(ticker, field, caller, future):
+    """
+    Done-callback for a download still running at the deadline: persist and
+    cache it when it lands, so the next request finds it. Runs in the pool
+    thread (or in `caller`, if it finished while the callback was being added).
+    """
+    key_fn, _, ttl, stale_ttl = _FIELDS[field]
+    try:
+        if not future.cancelled():  # queued jobs are cancelled at the deadline
+            value = _persist(ticker, field, future.result())
+            if value is not None:
+                swr_cache.store(key_fn(ticker), value, ttl, stale_ttl)
+    except Exception as e:
+        logger.warning("Late market data for %s not stored: %s", ticker, e)
+    finally:
+        swr_cache.release(key_fn(ticker))
+        if threading.current_thread() is not caller:
+            close_old_connections()
+
+
+def fetch_market_data(tickers, info_tickers=(), provider=None, max_workers=None, timeout=None, force=False):
+    """
+    Fetch one year of daily history for every ticker (plus the info dict for
+    those in ``info_tickers``), reading the cache first and downloading all
+    misses concurrently. Stale entries are returned as-is and refreshed in
+    the background; ``force`` re-downloads everything (used by the refresher
+    worker). History downloads only request bars newer than the ones already
+    in the local price store.
+
+    Only the network calls run in the pool; downloaded bars are written to
+    the store from the calling thread in one pass.
+
+    Returns ``{ticker: {"history": PriceSeries | None, "info": dict | None}}``.
+    Calls that fail or are still running when ``timeout`` seconds elapse are
+    reported as None so callers can render partial results; downloads that
+    finish after the deadline are still persisted and cached (`_store_late`).
+    """
+    provider = provider or get_provider()
+    max_workers = max_workers or getattr(settings, "COACH_MARKET_DATA_WORKERS", 8)
+    timeout = timeout if timeout is not None else getattr(settings, "COACH_MARKET_DATA_TIMEOUT", 5.0)
+    deadline = time.monotonic() + timeout
+    # The locks are held for the whole download: keep them past the budget (a refresher
+    # round may take longer than LOCK_TIMEOUT), plus the usual grace for late finishers
+    lock_timeout = timeout + swr_cache.LOCK_TIMEOUT
+
+    results = {}
+    jobs = []     # (ticker, field, start) we hold the refresh lock for
+    waiting = []  # (ticker, field) someone else is already refreshing
+    for ticker in dict.fromkeys(tickers):
+        results[ticker] = {"history": None, "info": None}
+        fields = ("history", "info") if ticker in info_tickers else ("history",)
+        for field in fields:
+            key_fn, _, ttl, stale_ttl = _FIELDS[field]
+            key = key_fn(ticker)
+            value, fresh = (None, False) if force else swr_cache.peek(key)
+            if value is None and field == "history" and not force:
+                # Cold cache but the store already has bars (e.g. after a restart): serve them stale
+                value = price_store.marker(ticker)
+            if value is not None:
+                results[ticker][field] = value
+                if not fresh:
+                    swr_cache.refresh_in_background(key, partial(_refresh_one, provider, ticker, field), ttl, stale_ttl)
+            elif swr_cache.acquire(key, lock_timeout):
+                jobs.append((ticker, field, _history_start(ticker) if field == "history" else None))
+            else:
+                waiting.append((ticker, field))
+
+    if jobs:
+        executor = ThreadPoolExecutor(max_workers=min(max_workers, len(jobs)), thread_name_prefix="market-data")
+        futures = {executor.submit(_FIELDS[field][1], provider, ticker, start): (ticker, field)
+                   for ticker, field, start in jobs}
+        with profiling.timed("fetch"):
+            done, pending = wait(futures, timeout=max(0.0, deadline - time.monotonic()))
+        # Don't block the request on stragglers; they only hold their lock until they finish.
+        executor.shutdown(wait=False, cancel_futures=True)
+
+        for future in done:
+            ticker, field = futures[future]
+            key_fn, _, ttl, stale_ttl = _FIELDS[field]
+            try:
+                value = _persist(ticker, field, future.result())
+                if value is not None:
+                    swr_cache.store(key_fn(ticker), value, ttl, stale_ttl)
+                results[ticker][field] = value
+            except Exception as e:  # e.g. a malformed frame: this ticker is missing, the others are fine
+                logger.warning("Market data for %s not stored: %s", ticker, e)
+            finally:
+                swr_cache.release(key_fn(ticker))
+        caller = threading.current_thread()
+        for future in pending:
+            ticker, field = futures[future]
+            future.add_done_callback(partial(_store_late, ticker, field, caller))
+        if pending:
+            logger.warning("Market data timed out after %.1fs for: %s", timeout,
+                           ", ".join(sorted({futures[f][0] for f in pending})))
+
+    with profiling.timed("fetch"):
+        for ticker, field in waiting:
+            results[ticker][field] = swr_cache.wait_for(_FIELDS[field][0](ticker),
+                                                        max(0.0, deadline - time.monotonic()))
+
+    for ticker, data in results.items():
+        data["history"] = price_store.load_series(ticker, data["history"])
+    return results
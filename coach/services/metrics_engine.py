@@ -0,0 +1,186 @@
+"""
+Batch metrics for many tickers at once.
+
+Prices are laid out as an ``N x T`` matrix (tickers x trading days, NaN where
+a ticker has no bar) and every metric is a handful of whole-matrix NumPy
+operations, so the cost per ticker stays flat as the universe grows.
+"""
+import calendar
+import warnings
+from datetime import date
+import numpy as np
+
+TRADING_DAYS = 252
+ROLLING_WINDOW = 20
+
+
+class PriceMatrix:
+    """Aligned closing prices: ``prices[i, j]`` is ticker i's close on ``dates[j]``."""
+
+    def __init__(self, tickers, dates, prices):
+        self.tickers = list(tickers)
+        self.dates = dates    # datetime64[D], ascending
+        self.prices = prices  # float64, shape (len(tickers), len(dates))
+
+    @classmethod
+    def from_series(cls, tickers, series):
+        """Build from per-ticker PriceSeries (None / empty entries become all-NaN rows)."""
+        days = [s.timestamps.astype("datetime64[D]") if s is not None and not s.empty else None for s in series]
+        present = [d for d in days if d is not None]
+        if present and len(present) == len(days) and all(np.array_equal(d, present[0]) for d in present):
+            # Common case: every ticker trades on the same calendar, no realignment needed
+            return cls(tickers, present[0], np.vstack([s.close for s in series]).astype(np.float64, copy=False))
+
+        dates = np.unique(np.concatenate(present)) if present else np.array([], dtype="datetime64[D]")
+        prices = np.full((len(tickers), len(dates)), np.nan)
+        for i, (s, d) in enumerate(zip(series, days)):
+            if d is not None:
+                prices[i, np.searchsorted(dates, d)] = s.close
+        return cls(tickers, dates, prices)
+
+
+def months_before(day, months):
+    """Same day `months` calendar months earlier, clamped to the month's length."""
+    year, month = divmod(day.year * 12 + day.month - 1 - months, 12)
+    month += 1
+    return day.replace(year=year, month=month, day=min(day.day, calendar.monthrange(year, month)[1]))
+
+
+def _ffill(prices):
+    """Forward-fill NaNs along each row."""
+    idx = np.where(np.isnan(prices), 0, np.arange(prices.shape[1]))
+    np.maximum.accumulate(idx, axis=1, out=idx)
+    return prices[np.arange(prices.shape[0])[:, None], idx]
+
+
+def _bfill(prices):
+    return _ffill(prices[:, ::-1])[:, ::-1]
+
+
+def _masked(values, mask):
+    """`values` where `mask` holds, NaN elsewhere."""
+    return np.where(mask, values, np.nan)
+
+
+_FLOAT_METRICS = ("price", "return_1m", "return_1y", "volatility_1m",
+                  "max_drawdown_1y", "sharpe_1y", "rolling_volatility_20d")
+
+
+def compute_metrics(matrix):
+    """
+    Compute per-ticker metrics from a PriceMatrix. Returns a dict of 1-D
+    arrays (one entry per ticker, NaN where there isn't enough data):
+
+    ``price``, ``return_1m``, ``return_1y``, ``volatility_1m``, ``uptrend``
+    (bool), ``max_drawdown_1y``, ``sharpe_1y`` and ``rolling_volatility_20d``.
+    """
+    prices = matrix.prices
+    n, t = prices.shape
+    if t == 0:
+        metrics = {name: np.full(n, np.nan) for name in _FLOAT_METRICS}
+        metrics["uptrend"] = np.zeros(n, dtype=bool)
+        return metrics
+
+    valid = ~np.isnan(prices)
+    filled = _ffill(prices)
+    backfilled = _bfill(prices)
+    last = filled[:, -1]
+
+    last_day = matrix.dates[-1].astype(date)
+    start_1m = np.searchsorted(matrix.dates, np.datetime64(months_before(last_day, 1)))
+    start_1y = np.searchsorted(matrix.dates, np.datetime64(months_before(last_day, 12)))
+
+    # Windowed returns: last close over the first close inside the window
+    count_1m = valid[:, start_1m:].sum(axis=1)
+    count_1y = valid[:, start_1y:].sum(axis=1)
+    ret_1m = _masked(last / backfilled[:, start_1m] - 1.0, count_1m >= 2)
+    ret_1y = _masked(last / backfilled[:, start_1y] - 1.0, count_1y >= 2)
+
+    # All-NaN rows (tickers without data) make the nan* reductions warn; they're masked anyway.
+    with np.errstate(invalid="ignore", divide="ignore"), warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)
+
+        # daily[:, k]: return from day k to day k+1 against the previous available close
+        daily = prices[:, 1:] / filled[:, :-1] - 1.0
+
+        vol_1m = _masked(np.nanstd(daily[:, start_1m:], axis=1, ddof=1), count_1m > 5)
+
+        rets_1y = daily[:, start_1y:]
+        mean_1y = np.nanmean(rets_1y, axis=1)
+        std_1y = np.nanstd(rets_1y, axis=1, ddof=1)
+        sharpe = _masked(mean_1y / std_1y * np.sqrt(TRADING_DAYS), (count_1y > 5) & (std_1y > 0))
+
+        # Max drawdown over the 1y window
+        window = filled[:, start_1y:]
+        running_max = np.fmax.accumulate(window, axis=1)
+        max_dd = _masked(np.nanmin(window / running_max - 1.0, axis=1), count_1y >= 2)
+
+        # Volatility of the most recent 20 daily returns
+        recent = daily[:, -ROLLING_WINDOW:]
+        rolling_vol = _masked(np.nanstd(recent, axis=1, ddof=1),
+                              (~np.isnan(recent)).sum(axis=1) >= ROLLING_WINDOW // 2)
+
+        # Short-term trend: last close against the mean of the last 5 sessions
+        uptrend = last > np.nanmean(prices[:, -5:], axis=1)
+
+    return {
+        "price": last,
+        "return_1m": ret_1m,
+        "return_1y": ret_1y,
+        "volatility_1m": vol_1m,
+        "uptrend": uptrend,
+        "max_drawdown_1y": max_dd,
+        "sharpe_1y": sharpe,
+        "rolling_volatility_20d": rolling_vol,
+    }
+
+
+def _scalar(value):
+    return None if value is None or np.isnan(value) else float(value)
+
+
+def metrics_to_dicts(matrix, metrics, usd_to_inr, infos=None):
+    """
+    Turn `compute_metrics` output into the per-ticker dicts the investment
+    suggestions use (the schema ``recommendations._compute_metrics`` returns).
+    """
+    infos = infos or {}
+    rows = []
+    for i, ticker in enumerate(matrix.tickers):
+        info = infos.get(ticker) or {}
+        price = _scalar(metrics["price"][i])
+        price_usd = round(price, 2) if price is not None else None
+
+        div_yield = None
+        try:
+            dy = info.get("dividendYield")
+            if dy is not None:
+                div_yield = float(dy)
+        except (TypeError, ValueError):
+            pass
+
+        trend = None
+        if price is not None:
+            trend = "📈 Uptrend" if metrics["uptrend"][i] else "📉 Downtrend"
+
+        rows.append({
+            "ticker": ticker,
+            "name": info.get("shortName") or ticker,
+            "price_usd": price_usd or "N/A",
+            "price_inr": round(price_usd * usd_to_inr, 2) if price_usd is not None else "N/A",
+            "return_1m": _scalar(metrics["return_1m"][i]),
+            "return_1y": _scalar(metrics["return_1y"][i]),
+            "volatility_1m": _scalar(metrics["volatility_1m"][i]),
+            "trend": trend,
+            "dividend_yield": div_yield,
+            "max_drawdown_1y": _scalar(metrics["max_drawdown_1y"][i]),
+            "sharpe_1y": _scalar(metrics["sharpe_1y"][i]),
+            "rolling_volatility_20d": _scalar(metrics["rolling_volatility_20d"][i]),
+        })
+    return rows
+
+
+def compute_ticker_metrics(tickers, series, usd_to_inr, infos=None):
+    """Convenience wrapper: PriceSeries per ticker in, metric dicts out."""
+    matrix = PriceMatrix.from_series(tickers, series)
+    return metrics_to_dicts(matrix, compute_metrics(matrix), usd_to_inr, infos)
@@ -0,0 +1,127 @@
+"""
+Persistent local store for market price history (the PriceBar table).
+
+Refreshes only append bars newer than the last stored one, and reads are
+served from a per-process NumPy copy of each series, so metric windows are
+zero-copy slices and a restarted worker can serve history straight from the
+database before its first refresh.
+"""
+import threading
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+import numpy as np
+from django.db import transaction
+from django.db.models import Max, Count
+from ..models import PriceBar
+
+RETENTION_DAYS = 400  # a little over the 1y window used by the metrics
+
+_memo = {}
+_memo_lock = threading.Lock()
+
+
+class PriceSeries:
+    """Closing prices of one ticker as NumPy arrays, oldest first."""
+
+    def __init__(self, ticker, timestamps, close):
+        self.ticker = ticker
+        self.timestamps = timestamps  # datetime64[s]
+        self.close = close            # float64
+
+    def __len__(self):
+        return len(self.close)
+
+    @property
+    def empty(self):
+        return len(self.close) == 0
+
+    def since(self, start):
+        """Closes at or after `start` (a date), as a view into the full series."""
+        i = np.searchsorted(self.timestamps, np.datetime64(start, "s"), side="left")
+        return self.close[i:]
+
+    def last_date(self):
+        return self.timestamps[-1].astype("datetime64[D]").astype(date)
+
+
+def marker(ticker, interval="1d"):
+    """
+    Small summary (last bar timestamp + bar count) identifying the stored
+    version of a series; None when nothing is stored.
+    """
+    info = PriceBar.objects.filter(ticker=ticker, interval=interval).aggregate(last=Max("timestamp"), count=Count("id"))
+    if not info["count"]:
+        return None
+    return {"last": info["last"].isoformat(), "count": info["count"]}
+
+
+def last_timestamp(ticker, interval="1d"):
+    return PriceBar.objects.filter(ticker=ticker, interval=interval).aggregate(last=Max("timestamp"))["last"]
+
+
+def _to_utc(ts):
+    ts = ts.to_pydatetime() if hasattr(ts, "to_pydatetime") else ts
+    if ts.tzinfo is None:
+        return ts.replace(tzinfo=dt_timezone.utc)
+    return ts.astimezone(dt_timezone.utc)
+
+
+def _value(row, column):
+    value = row.get(column)
+    if value is None or value != value:  # NaN
+        return None
+    return float(value) if column != "Volume" else int(value)
+
+
+def append_history(ticker, frame, interval="1d"):
+    """
+    Store the bars of a provider DataFrame (OHLCV columns, datetime index).
+    Bars newer than the last stored one are inserted; the last stored bar is
+    overwritten since it may have been an in-progress session. Returns the
+    new marker.
+    """
+    last = last_timestamp(ticker, interval)
+    bars = []
+    if frame is not None:
+        for ts, row in frame.iterrows():
+            row = row.to_dict()
+            if _value(row, "Close") is None:
+                continue
+            bars.append(PriceBar(
+                ticker=ticker, interval=interval, timestamp=_to_utc(ts),
+                open=_value(row, "Open"), high=_value(row, "High"), low=_value(row, "Low"),
+                close=_value(row, "Close"), volume=_value(row, "Volume"),
+            ))
+
+    with transaction.atomic():
+        if last is not None:
+            for bar in bars:
+                if bar.timestamp == last:
+                    PriceBar.objects.filter(ticker=ticker, interval=interval, timestamp=last).update(
+                        open=bar.open, high=bar.high, low=bar.low, close=bar.close, volume=bar.volume)
+            bars = [b for b in bars if b.timestamp > last]
+        PriceBar.objects.bulk_create(bars, batch_size=500, ignore_conflicts=True)
+        cutoff = datetime.now(dt_timezone.utc) - timedelta(days=RETENTION_DAYS)
+        PriceBar.objects.filter(ticker=ticker, interval=interval, timestamp__lt=cutoff).delete()
+    return marker(ticker, interval)
+
+
+def load_series(ticker, current_marker, interval="1d"):
+    """
+    Return the PriceSeries for `ticker`, reusing this process's copy unless
+    the stored data changed since it was loaded (per `current_marker`).
+    """
+    if current_marker is None:
+        return None
+    key = (ticker, interval)
+    with _memo_lock:
+        memo = _memo.get(key)
+    if memo is not None and memo[0] == current_marker:
+        return memo[1]
+
+    rows = PriceBar.objects.filter(ticker=ticker, interval=interval).order_by("timestamp").values_list("timestamp", "close")
+    timestamps = np.array([_to_utc(ts).replace(tzinfo=None) for ts, _ in rows], dtype="datetime64[s]")
+    close = np.array([c for _, c in rows], dtype=np.float64)
+    series = PriceSeries(ticker, timestamps, close)
+    with _memo_lock:
+        _memo[key] = (current_marker, series)
+    return series
@@ -0,0 +1,214 @@
+"""
+Per-request profiling: wall time, DB queries, cache hits/misses, market-data
+fetch time and template render time.
+
+The numbers are collected by ``coach.middleware.ProfilingMiddleware`` for a
+sample of requests (``COACH_PROFILING_SAMPLE_RATE``) into a RequestProfile
+held in a context variable; instrumented code calls ``timed`` /
+``record_cache``, which are no-ops when the current request isn't sampled.
+Sampled requests get a Server-Timing header and are folded into
+process-wide counters exported in the Prometheus text format.
+"""
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.template.backends.django import DjangoTemplates as _DjangoTemplates
+
+_current = ContextVar("coach_request_profile", default=None)
+
+# Upper bounds (seconds) of the request duration histogram
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class RequestProfile:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.db_queries = 0
+        self.db_time = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.timings = {"fetch": 0.0, "template": 0.0}
+
+    def db_wrapper(self, execute, sql, params, many, context):
+        """connection.execute_wrapper hook counting queries and their time."""
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - started
+            self.db_queries += 1
+
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    def server_timing(self, total):
+        """Server-Timing header value (durations in milliseconds)."""
+        parts = [
+            f"total;dur={total * 1000:.1f}",
+            f'db;dur={self.db_time * 1000:.1f};desc="{self.db_queries} queries"',
+            f"fetch;dur={self.timings['fetch'] * 1000:.1f}",
+            f"template;dur={self.timings['template'] * 1000:.1f}",
+            f'cache;desc="{self.cache_hits} hits, {self.cache_misses} misses"',
+        ]
+        return ", ".join(parts)
+
+
+def start():
+    profile = RequestProfile()
+    return profile, _current.set(profile)
+
+
+def stop(token):
+    _current.reset(token)
+
+
+def current():
+    return _current.get()
+
+
+def _db_wrapper(execute, sql, params, many, context):
+    profile = _current.get()
+    if profile is None:
+        return execute(sql, params, many, context)
+    return profile.db_wrapper(execute, sql, params, many, context)
+
+
+def _install(connection, **kwargs):
+    # First in the list (outermost), so connection.execute_wrapper() blocks, which pop
+    # the last entry on exit, never remove it
+    if _db_wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, _db_wrapper)
+
+
+def instrument_connections():
+    """
+    Count every connection's queries into the current request's profile:
+    the ones open in the calling thread now and, through connection_created,
+    any opened later in any thread. An async view's queries run in
+    sync_to_async threads, which see the profile through the context
+    variable.
+    """
+    connection_created.connect(_install, dispatch_uid="coach_profiling")
+    for conn in connections.all(initialized_only=True):
+        _install(conn)
+
+
+@contextmanager
+def timed(name):
+    """Add the block's wall time to `name` on the current request's profile, if any."""
+    profile = _current.get()
+    if profile is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        profile.timings[name] = profile.timings.get(name, 0.0) + time.perf_counter() - started
+
+
+def record_cache(hit):
+    profile = _current.get()
+    if profile is not None:
+        if hit:
+            profile.cache_hits += 1
+        else:
+            profile.cache_misses += 1
+
+
+class _ProfiledTemplate:
+    def __init__(self, template):
+        self.template = template
+
+    def __getattr__(self, name):
+        return getattr(self.template, name)
+
+    def render(self, context=None, request=None):
+        with timed("template"):
+            return self.template.render(context, request)
+
+
+class DjangoTemplates(_DjangoTemplates):
+    """The stock Django template backend, with render time reported to the request profile."""
+
+    def from_string(self, template_code):
+        return _ProfiledTemplate(super().from_string(template_code))
+
+    def get_template(self, template_name):
+        return _ProfiledTemplate(super().get_template(template_name))
+
+
+class Metrics:
+    """Process-wide counters and a latency histogram per view, in Prometheus text format."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._views = {}
+
+    def observe(self, view, status, profile, duration):
+        with self._lock:
+            m = self._views.setdefault(view, {
+                "requests": {}, "duration_sum": 0.0, "buckets": [0] * len(DURATION_BUCKETS),
+                "db_queries": 0, "db_seconds": 0.0, "cache_hits": 0, "cache_misses": 0,
+                "fetch_seconds": 0.0, "template_seconds": 0.0,
+            })
+            m["requests"][status] = m["requests"].get(status, 0) + 1
+            m["duration_sum"] += duration
+            for i, bound in enumerate(DURATION_BUCKETS):
+                if duration <= bound:
+                    m["buckets"][i] += 1
+            m["db_queries"] += profile.db_queries
+            m["db_seconds"] += profile.db_time
+            m["cache_hits"] += profile.cache_hits
+            m["cache_misses"] += profile.cache_misses
+            m["fetch_seconds"] += profile.timings.get("fetch", 0.0)
+            m["template_seconds"] += profile.timings.get("template", 0.0)
+
+    def reset(self):
+        with self._lock:
+            self._views.clear()
+
+    def render(self):
+        with self._lock:
+            views = {view: {**m, "requests": dict(m["requests"]), "buckets": list(m["buckets"])}
+                     for view, m in self._views.items()}
+
+        lines = []
+
+        def metric(name, kind, help_text, samples):
+            lines.append(f"# HELP coach_{name} {help_text}")
+            lines.append(f"# TYPE coach_{name} {kind}")
+            lines.extend(f"coach_{name}{labels} {value}" for labels, value in samples)
+
+        metric("requests_total", "counter", "Sampled requests by view and status.",
+               [(f'{{view="{v}",status="{s}"}}', n) for v, m in views.items() for s, n in sorted(m["requests"].items())])
+        histogram = []
+        for v, m in views.items():
+            for bound, n in zip(DURATION_BUCKETS, m["buckets"]):
+                histogram.append((f'_bucket{{view="{v}",le="{bound}"}}', n))
+            count = sum(m["requests"].values())
+            histogram += [(f'_bucket{{view="{v}",le="+Inf"}}', count),
+                          (f'_sum{{view="{v}"}}', round(m["duration_sum"], 6)),
+                          (f'_count{{view="{v}"}}', count)]
+        lines.append("# HELP coach_request_duration_seconds Wall time of sampled requests.")
+        lines.append("# TYPE coach_request_duration_seconds histogram")
+        lines.extend(f"coach_request_duration_seconds{labels} {value}" for labels, value in histogram)
+
+        for name, key, kind, help_text in (
+            ("db_queries_total", "db_queries", "counter", "Database queries run by sampled requests."),
+            ("db_seconds_total", "db_seconds", "counter", "Time spent in database queries."),
+            ("cache_hits_total", "cache_hits", "counter", "Cache hits (market data, fragments, FX rate)."),
+            ("cache_misses_total", "cache_misses", "counter", "Cache misses (market data, fragments, FX rate)."),
+            ("external_fetch_seconds_total", "fetch_seconds", "counter", "Time waiting on market-data downloads."),
+            ("template_render_seconds_total", "template_seconds", "counter", "Time spent rendering templates."),
+        ):
+            metric(name, kind, help_text,
+                   [(f'{{view="{v}"}}', round(m[key], 6) if isinstance(m[key], float) else m[key])
+                    for v, m in views.items()])
+        return "\n".join(lines) + "\n"
+
+
+metrics = Metrics()
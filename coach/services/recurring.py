@@ -0,0 +1,131 @@
+"""
+Scheduler for recurring transactions: materializes every due occurrence of
+every active RecurringRule.
+
+Rules are processed in batches of ``BATCH_SIZE``, walked in primary-key
+order. Each batch is one database transaction:
+
+* the due rules are locked (skipping rules another run holds);
+* their occurrences up to today are inserted with one ``bulk_create``;
+* the LedgerSummary and goal deltas are applied once, aggregated;
+* the rules' ``next_run`` is advanced, one UPDATE per distinct date.
+
+A crash rolls the batch back whole, so a re-run picks it up again. A run
+that finds nothing due writes nothing. Occurrences that already exist
+(a ``next_run`` moved back by hand) are skipped, and the unique
+(rule, date) constraint is the backstop.
+"""
+import time
+from collections import defaultdict
+from datetime import date
+from decimal import Decimal
+from django.db import connection, transaction
+from ..models import Transaction, RecurringRule, Goal
+from . import data_version, ledger_service, schedule
+
+BATCH_SIZE = 1000
+# Occurrences materialized per rule and run, so a daily rule started years
+# back can't produce one huge batch; the rest follow on the next runs
+MAX_OCCURRENCES = 400
+MAX_REPORTED_ERRORS = 50
+
+
+def due_rules(today, user_ids=None):
+    rules = RecurringRule.objects.filter(active=True, next_run__lte=today)
+    if user_ids is not None:
+        rules = rules.filter(user_id__in=user_ids)
+    return rules
+
+
+def _lock(rules):
+    if connection.features.has_select_for_update_skip_locked:
+        return rules.select_for_update(skip_locked=True)
+    return rules  # SQLite: the write transaction already serializes runs
+
+
+def _materialize_batch(rule_ids, today, stats):
+    with transaction.atomic():
+        rules = list(_lock(due_rules(today).filter(pk__in=rule_ids)).order_by("pk"))
+        if not rules:
+            return
+        occurrences = {}
+        for rule in rules:
+            end = min(today, rule.end_date) if rule.end_date else today
+            occurrences[rule.pk] = schedule.parse(rule.schedule).between(rule.next_run, end, MAX_OCCURRENCES)
+
+        # Occurrences already in the table are never inserted twice
+        existing = set(Transaction.objects.filter(rule__in=rules, date__gte=min(r.next_run for r in rules))
+                       .values_list("rule_id", "date"))
+        goal_room = {g["pk"]: g["target_amount"] - g["current_amount"]
+                     for g in Goal.objects.select_for_update().filter(pk__in={r.goal_id for r in rules if r.goal_id})
+                     .values("pk", "target_amount", "current_amount")}
+
+        objs, advanced, users = [], [], set()
+        ledger_deltas = defaultdict(lambda: [Decimal("0"), 0])  # (user_id, type, category_id, month) → [amount, count]
+        goal_deltas = defaultdict(Decimal)
+        for rule in rules:
+            days = [d for d in occurrences[rule.pk] if (rule.pk, d) not in existing]
+            goal_id = rule.goal_id if rule.type == "savings" else None
+            if goal_id and days:
+                total = rule.amount * len(days)
+                if total > goal_room.get(goal_id, Decimal("0")):
+                    # Left due (next_run unchanged) until the goal or the rule is edited
+                    stats["blocked"] += 1
+                    if len(stats["errors"]) < MAX_REPORTED_ERRORS:
+                        stats["errors"].append(f"rule {rule.pk}: goal {goal_id} would exceed its target")
+                    continue
+                goal_room[goal_id] -= total
+                goal_deltas[goal_id] += total
+            for day in days:
+                objs.append(Transaction(user_id=rule.user_id, type=rule.type, category_id=rule.category_id,
+                                        amount=rule.amount, date=day, description=rule.description,
+                                        goal_id=goal_id, rule_id=rule.pk))
+                bucket = ledger_deltas[(rule.user_id, rule.type, rule.category_id, day.replace(day=1))]
+                bucket[0] += rule.amount
+                bucket[1] += 1
+            if days:
+                users.add(rule.user_id)
+            last = occurrences[rule.pk][-1] if occurrences[rule.pk] else rule.next_run
+            following = schedule.parse(rule.schedule).next_after(last) if occurrences[rule.pk] else None
+            rule.next_run = following if following and not (rule.end_date and following > rule.end_date) else None
+            advanced.append(rule)
+
+        # bulk_create skips the per-row signals, so their work happens here, once per batch
+        Transaction.objects.bulk_create(objs, batch_size=BATCH_SIZE)
+        ledger_service.apply_deltas(ledger_deltas)
+        for goal_id, amount in goal_deltas.items():
+            Goal.adjust_progress(goal_id, amount)
+        # Rules on the same schedule share their next date: one UPDATE per distinct date
+        by_next_run = defaultdict(list)
+        for rule in advanced:
+            by_next_run[rule.next_run].append(rule.pk)
+        for next_run, pks in by_next_run.items():
+            RecurringRule.objects.filter(pk__in=pks).update(next_run=next_run)
+        data_version.bump_many(list(users))
+
+    stats["rules"] += len(advanced)
+    stats["created"] += len(objs)
+    stats["users"] += len(users)
+
+
+def materialize_due(today=None, user_ids=None, batch_size=BATCH_SIZE):
+    """
+    Insert every occurrence due up to `today` (all users, or only
+    `user_ids`). Returns a stats dict: rules advanced, transactions created,
+    users touched, rules blocked by a goal target (with the first few
+    errors), batches and elapsed seconds.
+    """
+    started = time.perf_counter()
+    today = today or date.today()
+    stats = {"rules": 0, "created": 0, "users": 0, "blocked": 0, "batches": 0, "errors": []}
+    last_pk = 0
+    while True:
+        rule_ids = list(due_rules(today, user_ids).filter(pk__gt=last_pk)
+                        .order_by("pk").values_list("pk", flat=True)[:batch_size])
+        if not rule_ids:
+            break
+        last_pk = rule_ids[-1]
+        _materialize_batch(rule_ids, today, stats)
+        stats["batches"] += 1
+    stats["seconds"] = time.perf_counter() - started
+    return stats
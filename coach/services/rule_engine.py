@@ -0,0 +1,220 @@
+"""
+Advice rules: the thresholds and messages of the dashboard advice, read from
+a JSON file (``COACH_ADVICE_RULES``, by default ``coach/advice_rules.json``)
+and compiled into a ``RuleSet``.
+
+The file maps each output (``savings_msg``, ``expense_msg``, ...) to an
+ordered list of cases. The first case whose conditions all hold gives the
+message; a case without ``when`` always matches, and a ``null`` message
+means "no advice from this output". A condition reads ``metric op value`` or
+``metric op value% base``, e.g. ``income == 0`` or ``savings < 10% income``
+(a percentage of a base that isn't positive counts as 0%).
+
+An output with ``"for_each": "category"`` gives a list: one message per
+category row, formatted with the row's ``{name}`` and ``{ratio}`` (its
+``ratio`` metrics as a percentage). Its ``guard`` cases are checked per user
+first and replace the whole list; ``empty`` stands in for a user with no rows.
+
+Metrics are NumPy arrays with one entry per user (or per row). Amounts are
+integer paise (thresholds in the file are rupees), so every comparison is
+exact integer arithmetic. Compiling turns each condition into a closure over
+those arrays; evaluating picks every output's first matching case for all
+users at once with ``np.select``.
+
+``get_rules()`` returns the compiled rules and re-reads the file when it
+changes (checked at most every ``COACH_ADVICE_RULES_RELOAD_SECONDS``), so an
+edit takes effect without restarting workers. A file that fails to compile
+is logged, and the previous rules stay in force.
+"""
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+from decimal import Decimal
+from fractions import Fraction
+import numpy as np
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+logger = logging.getLogger(__name__)
+
+AMOUNT_METRICS = {"income", "expenses", "savings", "category"}
+USER_METRICS = {"income", "expenses", "savings", "max_volatility"}
+ROW_METRICS = {"category": "category"}  # for_each kind → its per-row metric
+OUTPUTS = ("savings_msg", "expense_msg", "category_msgs", "adaptive_msg", "market_msg")
+OPS = {"<": np.less, "<=": np.less_equal, ">": np.greater, ">=": np.greater_equal,
+       "==": np.equal, "!=": np.not_equal}
+CONDITION = re.compile(r"^\s*(\w+)\s*(<=|>=|==|!=|<|>)\s*(-?\d+(?:\.\d+)?)\s*(?:%\s*(\w+))?\s*$")
+
+
+def _compile_condition(text, metrics):
+    match = CONDITION.match(text)
+    if not match:
+        raise ValueError(f"invalid condition {text!r} (expected e.g. 'savings < 10% income')")
+    metric, op, value, base = match.groups()
+    for name in (metric, base):
+        if name is not None and name not in metrics:
+            raise ValueError(f"unknown metric {name!r} in {text!r}")
+    op, value = OPS[op], Fraction(value)
+    num, den = value.numerator, value.denominator
+
+    if base is not None:
+        # metric / base * 100 op value, cross-multiplied to stay in integers
+        zero = bool(op(0, value))
+        return lambda m: np.where(m[base] > 0, op(m[metric] * (100 * den), m[base] * num), zero)
+    if metric in AMOUNT_METRICS:
+        return lambda m: op(m[metric] * den, num * 100)  # rupees → paise
+    return lambda m: op(m[metric], float(value))
+
+
+def _compile_cases(cases, metrics, output):
+    compiled = []
+    for case in cases:
+        when = case.get("when", [])
+        tests = [_compile_condition(c, metrics) for c in ([when] if isinstance(when, str) else when)]
+        message = case.get("message")
+        if message is not None:
+            try:
+                message.format(name="x", ratio=Decimal(0))
+            except (KeyError, IndexError, ValueError) as e:
+                raise ValueError(f"{output}: invalid message {message!r}: {e!r}") from None
+        compiled.append((tests, message))
+    return compiled
+
+
+class _Output:
+    def __init__(self, name, spec):
+        self.for_each = spec.get("for_each")
+        if self.for_each is not None and self.for_each not in ROW_METRICS:
+            raise ValueError(f"{name}: unknown for_each {self.for_each!r}")
+        row_metrics = USER_METRICS | ({ROW_METRICS[self.for_each]} if self.for_each else set())
+        if not spec.get("cases"):
+            raise ValueError(f"{name}: no cases")
+        self.cases = _compile_cases(spec["cases"], row_metrics, name)
+        self.guard = _compile_cases(spec.get("guard", []), USER_METRICS, name)
+        self.empty = spec.get("empty")
+        self.ratio = spec.get("ratio")
+        if self.ratio is not None and not (len(self.ratio) == 2 and set(self.ratio) <= row_metrics):
+            raise ValueError(f"{name}: ratio must name two metrics")
+
+    @staticmethod
+    def select(cases, metrics, size):
+        """Index of the first matching case per entry, -1 where none matches."""
+        if not cases:
+            return np.full(size, -1)
+        masks = [np.logical_and.reduce([t(metrics) for t in tests]) if tests else np.ones(size, dtype=bool)
+                 for tests, _ in cases]
+        return np.select([np.broadcast_to(m, size) for m in masks], np.arange(len(cases)), -1)
+
+
+class RuleSet:
+    """Compiled advice rules; use `get_rules` for the current ones."""
+
+    def __init__(self, definition, path="", digest=""):
+        missing = set(OUTPUTS) - set(definition)
+        if missing:
+            raise ValueError(f"missing outputs: {', '.join(sorted(missing))}")
+        self.outputs = {name: _Output(name, spec) for name, spec in definition.items()}
+        self.path, self.digest = path, digest
+        self.case_count = sum(len(o.cases) + len(o.guard) for o in self.outputs.values())
+
+    def evaluate(self, metrics, rows=None, outputs=None):
+        """
+        Messages for a batch of users: ``{output: [message per user]}``, a
+        list of messages per user for the for_each outputs. ``metrics`` holds
+        one array per metric with an entry per user; ``rows`` the for_each
+        rows: ``user`` (index of the row's user), ``name`` and the row metric.
+        """
+        size = len(next(iter(metrics.values())))
+        result = {}
+        for name in outputs or self.outputs:
+            out = self.outputs[name]
+            if out.for_each:
+                result[name] = self._each(out, metrics, rows, size)
+            else:
+                messages = [m for _, m in out.cases] + [None]
+                result[name] = [messages[i] for i in out.select(out.cases, metrics, size)]
+        return result
+
+    def _each(self, out, metrics, rows, size):
+        guard = out.select(out.guard, metrics, size).tolist()
+        users = rows["user"]
+        row_metrics = {k: v[users] for k, v in metrics.items()}
+        row_metrics[ROW_METRICS[out.for_each]] = rows[ROW_METRICS[out.for_each]]
+        chosen = out.select(out.cases, row_metrics, len(users)).tolist()
+        # Plain lists: the loop below formats one message per row
+        templates = [m for _, m in out.cases]
+        parts, bases = (row_metrics[m].tolist() for m in out.ratio) if out.ratio else ([0] * len(users),) * 2
+        names = rows["name"]
+        lists = [[] for _ in range(size)]
+        for r, u in enumerate(users.tolist()):
+            i = chosen[r]
+            if i < 0 or guard[u] >= 0 or templates[i] is None:
+                continue
+            ratio = (Decimal(parts[r]) / Decimal(bases[r])) * 100 if bases[r] > 0 else 0
+            lists[u].append(templates[i].format(name=names[r], ratio=ratio))
+        for u in range(size):
+            if guard[u] >= 0:
+                lists[u] = [out.guard[guard[u]][1]]
+            elif not lists[u] and out.empty is not None:
+                lists[u] = [out.empty]
+        return lists
+
+
+def paise(values):
+    return np.array([int((Decimal(v) * 100).to_integral_value()) for v in values], dtype=np.int64)
+
+
+def user_metrics(users):
+    """
+    ``(metrics, rows)`` for `RuleSet.evaluate` from per-user
+    ``(income, expenses, savings, [(category name, expense total), ...])``.
+    """
+    users = list(users)
+    metrics = {key: paise([u[i] for u in users]) for i, key in enumerate(("income", "expenses", "savings"))}
+    flat = [(i, name or "Uncategorized", total or 0) for i, u in enumerate(users) for name, total in u[3]]
+    rows = {"user": np.array([f[0] for f in flat], dtype=np.int64), "name": [f[1] for f in flat],
+            "category": paise([f[2] for f in flat])}
+    return metrics, rows
+
+
+def load(path):
+    """Read and compile a rules file (ValueError if it is invalid)."""
+    with open(path, "rb") as f:
+        raw = f.read()
+    return RuleSet(json.loads(raw), path=str(path), digest=hashlib.sha1(raw).hexdigest()[:12])
+
+
+_lock = threading.Lock()
+_current = {"rules": None, "stamp": None, "checked": 0.0}
+
+
+def get_rules():
+    """The current compiled rules, recompiled when the file has changed since the last check."""
+    path = str(settings.COACH_ADVICE_RULES)
+    now = time.monotonic()
+    rules = _current["rules"]
+    if (rules is not None and rules.path == path
+            and now - _current["checked"] < settings.COACH_ADVICE_RULES_RELOAD_SECONDS):
+        return rules
+    with _lock:
+        try:
+            st = os.stat(path)
+            stamp = (path, st.st_mtime_ns, st.st_size)
+            if stamp != _current["stamp"]:
+                _current["stamp"] = stamp  # a broken edit is reported once, not at every check
+                rules = load(path)
+                if _current["rules"] is not None:
+                    logger.info("Advice rules %s reloaded (version %s)", path, rules.digest)
+                _current["rules"] = rules
+        except (OSError, ValueError) as e:
+            current = _current["rules"]
+            if current is None or current.path != path:
+                _current["stamp"] = None
+                raise ImproperlyConfigured(f"Advice rules {path}: {e}") from e
+            logger.error("Advice rules %s not reloaded, keeping version %s: %s", path, current.digest, e)
+        _current["checked"] = now
+        return _current["rules"]
@@ -0,0 +1,127 @@
+"""
+Cron-like schedules for recurring transactions, at day resolution.
+
+An expression has the last three fields of a crontab line:
+``day-of-month month day-of-week``. Each field takes ``*``, numbers, ranges
+(``1-5``), lists (``1,15``) and steps (``*/2``, ``1-31/7``). Months and
+weekdays also take three-letter names (``jan``, ``mon``). Sunday is 0 or 7.
+The day of month also takes ``L`` for the last day. As in cron, when both the
+day of month and the day of week are restricted, a day matching either one
+counts.
+
+Shortcuts: ``@daily``, ``@weekly`` (Mondays), ``@monthly`` (the 1st) and
+``@yearly`` (January 1st).
+"""
+import calendar
+from datetime import date, timedelta
+from functools import lru_cache
+
+SHORTCUTS = {"@daily": "* * *", "@weekly": "* * 1", "@monthly": "1 * *", "@yearly": "1 1 *", "@annually": "1 1 *"}
+MONTH_NAMES = {name.lower(): i for i, name in enumerate(calendar.month_abbr) if name}
+DAY_NAMES = {"sun": 0, "mon": 1, "tue": 2, "wed": 3, "thu": 4, "fri": 5, "sat": 6}
+LAST = 32  # stands for "L" in the day-of-month set
+
+
+def _value(token, names, low, high):
+    token = token.lower()
+    value = names[token] if token in names else int(token)
+    if not low <= value <= high:
+        raise ValueError(f"{value} is outside {low}-{high}")
+    return value
+
+
+def _field(text, low, high, names=None, allow_last=False):
+    """Parse one field into (set of values, restricted?)."""
+    names = names or {}
+    values = set()
+    for part in text.split(","):
+        if allow_last and part.upper() == "L":
+            values.add(LAST)
+            continue
+        spec, _, step = part.partition("/")
+        step = int(step) if step else 1
+        if step < 1:
+            raise ValueError(f"invalid step in {part!r}")
+        if spec == "*":
+            start, end = low, high
+        elif "-" in spec:
+            first, last = spec.split("-", 1)
+            start, end = _value(first, names, low, high), _value(last, names, low, high)
+            if start > end:
+                raise ValueError(f"inverted range {spec!r}")
+        else:
+            start = _value(spec, names, low, high)
+            end = high if step > 1 else start
+        values.update(range(start, end + 1, step))
+    return values, text != "*"
+
+
+class Schedule:
+    """A parsed expression; use `parse` to get a cached instance."""
+
+    def __init__(self, expression):
+        self.expression = expression
+        fields = SHORTCUTS.get(expression.strip().lower(), expression).split()
+        if len(fields) != 3:
+            raise ValueError("expected three fields: day-of-month month day-of-week")
+        try:
+            self.days, days_restricted = _field(fields[0], 1, 31, allow_last=True)
+            self.months, _ = _field(fields[1], 1, 12, MONTH_NAMES)
+            weekdays, weekdays_restricted = _field(fields[2], 0, 7, DAY_NAMES)
+        except ValueError as e:
+            raise ValueError(f"invalid schedule {expression!r}: {e}") from None
+        # cron's Sunday is 0 or 7; date.weekday() has Monday = 0
+        self.weekdays = {(d - 1) % 7 for d in weekdays}
+        # Both restricted: either may match. Otherwise the restricted one decides.
+        self.either = days_restricted and weekdays_restricted
+        self.check_days, self.check_weekdays = days_restricted, weekdays_restricted
+        self._month_cache = {}
+
+    def _days_in_month(self, year, month):
+        """Matching days of one month, ascending (cached per month)."""
+        key = (year, month)
+        days = self._month_cache.get(key)
+        if days is None:
+            days = []
+            if month in self.months:
+                first_weekday, length = calendar.monthrange(year, month)
+                for day in range(1, length + 1):
+                    by_day = day in self.days or (day == length and LAST in self.days)
+                    by_weekday = (first_weekday + day - 1) % 7 in self.weekdays
+                    if self.either:
+                        match = by_day or by_weekday
+                    else:
+                        match = (by_day or not self.check_days) and (by_weekday or not self.check_weekdays)
+                    if match:
+                        days.append(day)
+            self._month_cache[key] = days
+        return days
+
+    def between(self, start, end, limit=None):
+        """Occurrences in [start, end], ascending, at most `limit` of them."""
+        result = []
+        year, month = start.year, start.month
+        while (year, month) <= (end.year, end.month):
+            for day in self._days_in_month(year, month):
+                current = date(year, month, day)
+                if current < start:
+                    continue
+                if current > end or (limit is not None and len(result) >= limit):
+                    return result
+                result.append(current)
+            year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+        return result
+
+    def next_on_or_after(self, day, horizon_years=8):
+        """First occurrence on or after `day`, or None if there is none within `horizon_years` (e.g. "31 2 *")."""
+        found = self.between(day, date(min(day.year + horizon_years, 9999), 12, 31), limit=1)
+        return found[0] if found else None
+
+    def next_after(self, day):
+        return self.next_on_or_after(day + timedelta(days=1))
+
+
+@lru_cache(maxsize=1024)
+def parse(expression):
+    """Parse an expression (ValueError if invalid). Instances are shared, so treat them as read-only."""
+    return Schedule(expression)
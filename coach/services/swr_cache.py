@@ -0,0 +1,109 @@
+"""
+Stale-while-revalidate helpers on top of the Django cache.
+
+Values are stored in an envelope with a "fresh until" timestamp and kept in
+the cache for an extra ``stale_ttl`` seconds. Readers get fresh values as-is,
+stale values immediately (while one background thread refreshes them), and
+only block on a true miss. Refreshes are single-flight: a ``lock:<key>``
+entry added with ``cache.add`` ensures one refresh per key at a time across
+threads and, with a shared cache backend, across processes.
+"""
+import logging
+import threading
+import time
+from django.core.cache import cache
+from django.db import close_old_connections
+from . import profiling
+
+logger = logging.getLogger(__name__)
+
+LOCK_TIMEOUT = 30  # seconds a refresh may hold the lock before it's considered dead
+WAIT_INTERVAL = 0.05
+
+
+def _lock_key(key):
+    return f"lock:{key}"
+
+
+def peek(key):
+    """Return ``(value, is_fresh)``; ``(None, False)`` when nothing is cached."""
+    entry = cache.get(key)
+    if not isinstance(entry, dict) or "fresh_until" not in entry:
+        profiling.record_cache(False)
+        return None, False
+    profiling.record_cache(True)
+    return entry["value"], entry["fresh_until"] > time.time()
+
+
+def store(key, value, ttl, stale_ttl=0):
+    """Cache `value` as fresh for `ttl` seconds and servable-stale for `stale_ttl` more."""
+    cache.set(key, {"value": value, "fresh_until": time.time() + ttl}, ttl + stale_ttl)
+
+
+def acquire(key, timeout=LOCK_TIMEOUT):
+    return cache.add(_lock_key(key), 1, timeout)
+
+
+def release(key):
+    cache.delete(_lock_key(key))
+
+
+def refresh(key, loader, ttl, stale_ttl=0, wait=True):
+    """
+    Run `loader()` and store its result, unless another worker already holds
+    the refresh lock for `key`. In that case wait (up to the lock timeout) for
+    that worker's value when `wait` is set, otherwise return None.
+    A loader returning None is treated as a failed fetch and not stored.
+    """
+    if acquire(key):
+        try:
+            value = loader()
+            if value is not None:
+                store(key, value, ttl, stale_ttl)
+            return value
+        finally:
+            release(key)
+
+    if not wait:
+        return None
+    return wait_for(key)
+
+
+def wait_for(key, timeout=LOCK_TIMEOUT):
+    """Wait for another worker's in-flight refresh of `key`; returns the cached value or None."""
+    deadline = time.time() + timeout
+    while True:
+        value, _ = peek(key)
+        if value is not None or cache.get(_lock_key(key)) is None or time.time() >= deadline:
+            return value
+        time.sleep(WAIT_INTERVAL)
+
+
+def _refresh_worker(key, loader, ttl, stale_ttl):
+    try:
+        refresh(key, loader, ttl, stale_ttl, wait=False)
+    except Exception as e:
+        logger.warning("Background refresh failed for %s: %s", key, e)
+    finally:
+        close_old_connections()
+
+
+def refresh_in_background(key, loader, ttl, stale_ttl=0):
+    """Start a daemon thread refreshing `key` unless a refresh is already running."""
+    if cache.get(_lock_key(key)) is not None:
+        return
+    threading.Thread(target=_refresh_worker, args=(key, loader, ttl, stale_ttl),
+                     name=f"swr-refresh:{key}", daemon=True).start()
+
+
+def get_or_refresh(key, loader, ttl, stale_ttl=0):
+    """
+    Stale-while-revalidate read: fresh → return, stale → return and refresh in
+    the background, missing → load now (single-flight).
+    """
+    value, fresh = peek(key)
+    if value is not None:
+        if not fresh:
+            refresh_in_background(key, loader, ttl, stale_ttl)
+        return value
+    return refresh(key, loader, ttl, stale_ttl)
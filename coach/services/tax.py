@@ -0,0 +1,176 @@
+"""
+Indian income tax per financial year (April to March), under the old and the
+new regime.
+
+Every (year, regime) pair is a ``TaxTable`` built once at import from
+``SLABS``: the slab lower bounds, their rates and the tax due at each bound
+(the cumulative base) are precomputed, so the slab tax of an income is a
+bisect plus one multiplication. Years after the last known table use the
+latest one.
+
+Income per financial year comes from the monthly LedgerSummary rollup,
+which the transaction signals keep up to date, so a year's totals are a
+dozen buckets per type rather than a scan of the user's transactions.
+Savings count as the old regime's Chapter VI-A deductions (section 80C and
+the like), capped at ``deduction_cap``. Surcharge (above ₹50L) is not
+modelled.
+"""
+from bisect import bisect_right
+from datetime import date
+from decimal import Decimal
+import numpy as np
+from django.db.models import Q, Sum
+from ..models import LedgerSummary
+from .ledger_service import CENT
+
+REGIMES = ("new", "old")
+CESS = Decimal("0.04")  # health and education cess, on the tax after rebate
+
+_OLD = {
+    "slabs": [(0, "0"), (250000, "0.05"), (500000, "0.20"), (1000000, "0.30")],
+    "standard_deduction": 50000, "rebate_limit": 500000, "rebate_max": 12500, "deduction_cap": 150000,
+}
+# Financial year (by its starting calendar year) → regime → rules
+SLABS = {
+    2023: {
+        "new": {"slabs": [(0, "0"), (300000, "0.05"), (600000, "0.10"), (900000, "0.15"),
+                          (1200000, "0.20"), (1500000, "0.30")],
+                "standard_deduction": 50000, "rebate_limit": 700000, "rebate_max": 25000, "marginal_relief": True},
+        "old": _OLD,
+    },
+    2024: {
+        "new": {"slabs": [(0, "0"), (300000, "0.05"), (700000, "0.10"), (1000000, "0.15"),
+                          (1200000, "0.20"), (1500000, "0.30")],
+                "standard_deduction": 75000, "rebate_limit": 700000, "rebate_max": 25000, "marginal_relief": True},
+        "old": _OLD,
+    },
+    2025: {
+        "new": {"slabs": [(0, "0"), (400000, "0.05"), (800000, "0.10"), (1200000, "0.15"),
+                          (1600000, "0.20"), (2000000, "0.25"), (2400000, "0.30")],
+                "standard_deduction": 75000, "rebate_limit": 1200000, "rebate_max": 60000, "marginal_relief": True},
+        "old": _OLD,
+    },
+}
+
+
+class TaxTable:
+    """The slabs, deductions and section 87A rebate of one regime in one financial year."""
+
+    def __init__(self, slabs, standard_deduction, rebate_limit, rebate_max, deduction_cap=0, marginal_relief=False):
+        self.bounds = [Decimal(lower) for lower, _ in slabs]
+        self.rates = [Decimal(rate) for _, rate in slabs]
+        # Tax due on an income exactly at each lower bound
+        self.base = [Decimal("0")]
+        for i in range(1, len(self.bounds)):
+            self.base.append(self.base[-1] + (self.bounds[i] - self.bounds[i - 1]) * self.rates[i - 1])
+        self.standard_deduction = Decimal(standard_deduction)
+        self.rebate_limit = Decimal(rebate_limit)
+        self.rebate_max = Decimal(rebate_max)
+        self.deduction_cap = Decimal(deduction_cap)
+        self.marginal_relief = marginal_relief
+        self._arrays = tuple(np.array(v, dtype=float) for v in (self.bounds, self.rates, self.base))
+
+    def slab_tax(self, taxable):
+        i = bisect_right(self.bounds, taxable) - 1
+        return self.base[i] + (taxable - self.bounds[i]) * self.rates[i]
+
+    def compute(self, income, deductions=Decimal("0")):
+        """Breakdown for one gross income: taxable income, slab tax, rebate, cess and total."""
+        taxable = max(Decimal("0"), income - self.standard_deduction - min(deductions, self.deduction_cap))
+        tax = self.slab_tax(taxable)
+        rebate = Decimal("0")
+        if taxable <= self.rebate_limit:
+            rebate = min(tax, self.rebate_max)
+        elif self.marginal_relief:
+            # Just above the limit, the tax can't exceed the income above it
+            rebate = max(Decimal("0"), tax - (taxable - self.rebate_limit))
+        cess = (tax - rebate) * CESS
+        return {"taxable": taxable.quantize(CENT), "slab_tax": tax.quantize(CENT), "rebate": rebate.quantize(CENT),
+                "cess": cess.quantize(CENT), "total": (tax - rebate + cess).quantize(CENT)}
+
+    def compute_many(self, incomes, deductions):
+        """Total tax for arrays of incomes and deductions, vectorized (float, rounded to paise)."""
+        bounds, rates, base = self._arrays
+        taxable = np.maximum(0.0, incomes - float(self.standard_deduction)
+                             - np.minimum(deductions, float(self.deduction_cap)))
+        i = np.searchsorted(bounds, taxable, side="right") - 1
+        tax = base[i] + (taxable - bounds[i]) * rates[i]
+        limit = float(self.rebate_limit)
+        rebate = np.where(taxable <= limit, np.minimum(tax, float(self.rebate_max)), 0.0)
+        if self.marginal_relief:
+            rebate = np.where(taxable > limit, np.maximum(0.0, tax - (taxable - limit)), rebate)
+        return np.round((tax - rebate) * (1 + float(CESS)), 2)
+
+
+TABLES = {(year, regime): TaxTable(**rules) for year, regimes in SLABS.items() for regime, rules in regimes.items()}
+
+
+def table_for(year, regime="new"):
+    """The table of a financial year, or of the closest known year."""
+    known = [y for y, r in TABLES if r == regime]
+    year = min(max(year, min(known)), max(known))
+    return TABLES[(year, regime)]
+
+
+def financial_year(day):
+    """Starting calendar year of the financial year containing `day`."""
+    return day.year if day.month >= 4 else day.year - 1
+
+
+def fy_label(year):
+    return f"{year}-{(year + 1) % 100:02d}"
+
+
+def parse_financial_year(text):
+    """'2024-25', 'FY2024-25' or '2024' → 2024 (ValueError otherwise)."""
+    text = text.strip().upper().removeprefix("FY").strip()
+    start, _, end = text.partition("-")
+    year = int(start)
+    if end and int(end) != (year + 1) % 100:
+        raise ValueError(f"{text!r} is not a financial year")
+    return year
+
+
+def fy_bounds(year):
+    """First month of the financial year and of the next one, for LedgerSummary.month filters."""
+    return date(year, 4, 1), date(year + 1, 4, 1)
+
+
+def fy_filters(year):
+    """FILTER clauses for one financial year's income and savings in a LedgerSummary aggregate."""
+    start, end = fy_bounds(year)
+    in_year = Q(month__gte=start, month__lt=end)
+    return {"fy_income": Sum("total", filter=in_year & Q(type="income")),
+            "fy_savings": Sum("total", filter=in_year & Q(type="savings"))}
+
+
+def compare_regimes(income, deductions, year):
+    """Both regimes' breakdowns for one income, and the cheaper regime ("new" on a tie)."""
+    result = {regime: table_for(year, regime).compute(income, deductions) for regime in REGIMES}
+    result["best"] = min(REGIMES, key=lambda regime: result[regime]["total"])
+    return result
+
+
+def year_totals(year, user_ids=None):
+    """[(user_id, username, income, savings)] for one financial year, one grouped query over the rollup."""
+    start, end = fy_bounds(year)
+    rows = LedgerSummary.objects.filter(month__gte=start, month__lt=end, type__in=("income", "savings"))
+    if user_ids is not None:
+        rows = rows.filter(user_id__in=user_ids)
+    zero = Decimal("0.00")
+    return [(r["user_id"], r["user__username"], r["income"] or zero, r["savings"] or zero)
+            for r in rows.values("user_id", "user__username")
+            .annotate(income=Sum("total", filter=Q(type="income")), savings=Sum("total", filter=Q(type="savings")))
+            .order_by("user_id")]
+
+
+def evaluate_all(year, user_ids=None):
+    """
+    Year-end evaluation of every user with income or savings in the financial
+    year: one query, then both regimes for all users at once with NumPy.
+    Returns (totals rows, {regime: array of total tax}).
+    """
+    totals = year_totals(year, user_ids)
+    incomes = np.array([float(t[2]) for t in totals])
+    savings = np.array([float(t[3]) for t in totals])
+    return totals, {regime: table_for(year, regime).compute_many(incomes, savings) for regime in REGIMES}
@@ -0,0 +1,300 @@
+"""
+Two-tier cache backend: a small per-process LRU in front of a shared cache
+(Redis, file or database based) configured as another alias in CACHES.
+
+Only namespaces listed in ``NAMESPACES`` with a ``local_timeout`` are kept
+in the local tier; that is where the read-mostly entries live (FX rate,
+market-data envelopes, investment suggestions, versioned dashboard
+fragments). Counters, locks and data versions always go to the shared tier,
+so ``add``/``incr`` stay atomic across workers. A local copy is trusted for
+at most ``local_timeout`` seconds, which bounds how stale another worker's
+write can look.
+
+The namespace of a key is the part before its first ":". A namespace
+``timeout`` caps the lifetime of its entries in the shared tier. Values whose
+pickle is at least ``COMPRESS_MIN_BYTES`` long are zlib-compressed before
+they reach the shared backend.
+
+Hit/miss counts and local memory per namespace are kept per process; see
+``get_stats`` and ``render_metrics`` (exported on /coach/metrics/).
+"""
+import pickle
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from django.core.cache import caches
+from django.core.cache.backends.base import BaseCache, DEFAULT_TIMEOUT
+
+_MISSING = object()
+
+# Local stores and stats per LOCATION, shared by the per-thread backend instances
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+class _Compressed:
+    """Marks a zlib-compressed pickle in the shared tier."""
+    __slots__ = ("data",)
+
+    def __init__(self, data):
+        self.data = data
+
+
+def namespace(key):
+    return key.split(":", 1)[0]
+
+
+class _NamespaceStats:
+    __slots__ = ("local_hits", "shared_hits", "misses", "sets", "raw_bytes", "stored_bytes")
+
+    def __init__(self):
+        for field in self.__slots__:
+            setattr(self, field, 0)
+
+    def as_dict(self):
+        return {field: getattr(self, field) for field in self.__slots__}
+
+
+class _LocalStore:
+    """Thread-safe LRU of pickled values with per-entry expiry and a byte budget."""
+
+    def __init__(self, max_entries, max_bytes):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()  # key -> (expires_at, namespace, pickled)
+        self.bytes = {}               # namespace -> bytes held
+        self.total_bytes = 0
+        self.stats = {}               # namespace -> _NamespaceStats
+
+    def count(self, ns, **deltas):
+        with self.lock:
+            stats = self.stats.get(ns)
+            if stats is None:
+                stats = self.stats[ns] = _NamespaceStats()
+            for field, delta in deltas.items():
+                setattr(stats, field, getattr(stats, field) + delta)
+
+    def _drop(self, key):
+        _, ns, pickled = self.entries.pop(key)
+        self.bytes[ns] -= len(pickled)
+        self.total_bytes -= len(pickled)
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return _MISSING
+            if entry[0] <= time.monotonic():
+                self._drop(key)
+                return _MISSING
+            self.entries.move_to_end(key)
+            return entry[2]
+
+    def set(self, key, ns, pickled, timeout):
+        with self.lock:
+            if key in self.entries:
+                self._drop(key)
+            if len(pickled) > self.max_bytes:
+                return
+            self.entries[key] = (time.monotonic() + timeout, ns, pickled)
+            self.bytes[ns] = self.bytes.get(ns, 0) + len(pickled)
+            self.total_bytes += len(pickled)
+            while len(self.entries) > self.max_entries or self.total_bytes > self.max_bytes:
+                self._drop(next(iter(self.entries)))
+
+    def delete(self, key):
+        with self.lock:
+            if key in self.entries:
+                self._drop(key)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.bytes.clear()
+            self.total_bytes = 0
+
+    def memory(self):
+        with self.lock:
+            entries = {}
+            for _, ns, _ in self.entries.values():
+                entries[ns] = entries.get(ns, 0) + 1
+            return entries, dict(self.bytes)
+
+
+class TieredCache(BaseCache):
+    """
+    LOCATION names the process-local store. OPTIONS:
+
+    * ``SHARED``: alias of the shared cache (required).
+    * ``LOCAL_MAX_ENTRIES`` / ``LOCAL_MAX_BYTES``: size of the per-process LRU.
+    * ``COMPRESS_MIN_BYTES``: pickled size from which values are compressed.
+    * ``NAMESPACES``: ``{namespace: {"timeout": cap, "local_timeout": seconds}}``.
+    """
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get("OPTIONS", {})
+        self.shared_alias = options["SHARED"]
+        self.compress_min_bytes = options.get("COMPRESS_MIN_BYTES", 1024)
+        self.namespaces = options.get("NAMESPACES", {})
+        with _stores_lock:
+            self._local = _stores.get(location)
+            if self._local is None:
+                self._local = _stores[location] = _LocalStore(
+                    options.get("LOCAL_MAX_ENTRIES", 1000), options.get("LOCAL_MAX_BYTES", 16 * 1024 * 1024))
+
+    @property
+    def _shared(self):
+        return caches[self.shared_alias]
+
+    def _local_timeout(self, ns, timeout=None):
+        local = self.namespaces.get(ns, {}).get("local_timeout", 0)
+        if timeout is not None and timeout is not DEFAULT_TIMEOUT:
+            local = min(local, timeout)
+        return local
+
+    def _shared_timeout(self, ns, timeout):
+        cap = self.namespaces.get(ns, {}).get("timeout")
+        if cap is None:
+            return timeout
+        if timeout is DEFAULT_TIMEOUT or timeout is None:
+            return cap
+        return min(timeout, cap)
+
+    def _encode(self, ns, value):
+        """(value for the shared tier, pickled bytes)"""
+        pickled = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        stored = value
+        stored_bytes = len(pickled)
+        if len(pickled) >= self.compress_min_bytes:
+            packed = zlib.compress(pickled)
+            if len(packed) < len(pickled):
+                stored, stored_bytes = _Compressed(packed), len(packed)
+        self._local.count(ns, sets=1, raw_bytes=len(pickled), stored_bytes=stored_bytes)
+        return stored, pickled
+
+    @staticmethod
+    def _decode(value):
+        if isinstance(value, _Compressed):
+            return pickle.loads(zlib.decompress(value.data))
+        return value
+
+    def get(self, key, default=None, version=None):
+        ns = namespace(key)
+        local_key = self.make_and_validate_key(key, version)
+        local_timeout = self._local_timeout(ns)
+        if local_timeout:
+            pickled = self._local.get(local_key)
+            if pickled is not _MISSING:
+                self._local.count(ns, local_hits=1)
+                return pickle.loads(pickled)
+
+        value = self._shared.get(key, _MISSING, version=version)
+        if value is _MISSING:
+            self._local.count(ns, misses=1)
+            return default
+        self._local.count(ns, shared_hits=1)
+        value = self._decode(value)
+        if local_timeout:
+            self._local.set(local_key, ns, pickle.dumps(value, pickle.HIGHEST_PROTOCOL), local_timeout)
+        return value
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        ns = namespace(key)
+        local_key = self.make_and_validate_key(key, version)
+        stored, pickled = self._encode(ns, value)
+        self._shared.set(key, stored, self._shared_timeout(ns, timeout), version=version)
+        local_timeout = self._local_timeout(ns, timeout)
+        if local_timeout:
+            self._local.set(local_key, ns, pickled, local_timeout)
+        else:
+            self._local.delete(local_key)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        ns = namespace(key)
+        stored, pickled = self._encode(ns, value)
+        added = self._shared.add(key, stored, self._shared_timeout(ns, timeout), version=version)
+        local_timeout = self._local_timeout(ns, timeout)
+        if added and local_timeout:
+            self._local.set(self.make_and_validate_key(key, version), ns, pickled, local_timeout)
+        return added
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        return self._shared.touch(key, self._shared_timeout(namespace(key), timeout), version=version)
+
+    def delete(self, key, version=None):
+        self._local.delete(self.make_and_validate_key(key, version))
+        return self._shared.delete(key, version=version)
+
+    def has_key(self, key, version=None):
+        return self.get(key, _MISSING, version=version) is not _MISSING
+
+    def incr(self, key, delta=1, version=None):
+        self._local.delete(self.make_and_validate_key(key, version))
+        return self._shared.incr(key, delta, version=version)
+
+    def decr(self, key, delta=1, version=None):
+        return self.incr(key, -delta, version=version)
+
+    def clear(self):
+        self._local.clear()
+        self._shared.clear()
+
+    def clear_local(self):
+        """Drop this process's local copies (the shared tier is untouched)."""
+        self._local.clear()
+
+    def get_stats(self):
+        return get_stats(self._local)
+
+    def reset_stats(self):
+        with self._local.lock:
+            self._local.stats.clear()
+
+
+def get_stats(store=None):
+    """
+    Per-namespace counters of one local store (or all of them, summed):
+    local/shared hits, misses, hit rate, sets, bytes before/after
+    compression, and entries/bytes currently held locally.
+    """
+    stores = [store] if store is not None else list(_stores.values())
+    result = {}
+    for s in stores:
+        entries, held = s.memory()
+        with s.lock:
+            counters = {ns: stats.as_dict() for ns, stats in s.stats.items()}
+        for ns in counters.keys() | entries.keys():
+            row = result.setdefault(ns, {**_NamespaceStats().as_dict(), "local_entries": 0, "local_bytes": 0})
+            for field, value in counters.get(ns, {}).items():
+                row[field] += value
+            row["local_entries"] += entries.get(ns, 0)
+            row["local_bytes"] += held.get(ns, 0)
+    for row in result.values():
+        lookups = row["local_hits"] + row["shared_hits"] + row["misses"]
+        row["hit_rate"] = (row["local_hits"] + row["shared_hits"]) / lookups if lookups else None
+    return result
+
+
+def render_metrics():
+    """The tiered cache stats of this process in Prometheus text format."""
+    stats = get_stats()
+    lines = [
+        "# HELP coach_cache_lookups_total Cache reads by namespace and outcome.",
+        "# TYPE coach_cache_lookups_total counter",
+    ]
+    for ns, row in sorted(stats.items()):
+        for result, field in (("local_hit", "local_hits"), ("shared_hit", "shared_hits"), ("miss", "misses")):
+            lines.append(f'coach_cache_lookups_total{{namespace="{ns}",result="{result}"}} {row[field]}')
+    for name, field, kind, help_text in (
+        ("cache_written_bytes_total", "raw_bytes", "counter", "Pickled bytes written, before compression."),
+        ("cache_stored_bytes_total", "stored_bytes", "counter", "Bytes sent to the shared tier, after compression."),
+        ("cache_local_entries", "local_entries", "gauge", "Entries held in the in-process tier."),
+        ("cache_local_bytes", "local_bytes", "gauge", "Bytes held in the in-process tier."),
+    ):
+        lines.append(f"# HELP coach_{name} {help_text}")
+        lines.append(f"# TYPE coach_{name} {kind}")
+        lines.extend(f'coach_{name}{{namespace="{ns}"}} {row[field]}' for ns, row in sorted(stats.items()))
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,89 @@
+import base64
+from datetime import date
+from decimal import Decimal
+from django.db.models import Sum, Q
+from ..models import Transaction
+
+PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+STREAM_CHUNK_SIZE = 500
+
+
+def filtered_transactions(user, tx_type=None, category_id=None):
+    """The user's transactions with the view_transactions filters applied, newest first."""
+    transactions = Transaction.objects.filter(user=user).select_related("category")
+    if tx_type in ["income", "expense", "savings"]:
+        transactions = transactions.filter(type=tx_type)
+    if category_id:
+        transactions = transactions.filter(category_id=category_id)
+    return transactions.order_by("-date", "-id")
+
+
+def get_totals(transactions):
+    """Income / expense / savings totals of a queryset in one conditional aggregate."""
+    totals = transactions.order_by().aggregate(
+        income=Sum("amount", filter=Q(type="income")),
+        expenses=Sum("amount", filter=Q(type="expense")),
+        savings=Sum("amount", filter=Q(type="savings")),
+    )
+    return {k: v or Decimal("0") for k, v in totals.items()}
+
+
+def encode_cursor(tx):
+    """Opaque, URL-safe cursor for the (date, id) position of a transaction."""
+    return base64.urlsafe_b64encode(f"{tx.date.isoformat()}:{tx.id}".encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    """Inverse of encode_cursor; returns (date, id) or None for a missing/garbled cursor."""
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        day, pk = raw.split(":")
+        return date.fromisoformat(day), int(pk)
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+
+def paginate(transactions, after=None, before=None, page_size=PAGE_SIZE):
+    """
+    Keyset pagination over a queryset ordered by (-date, -id).
+
+    `after` continues with older rows than the cursor, `before` goes back to
+    newer ones. Returns (rows, next_cursor, prev_cursor); cursors are None
+    at either end of the list.
+    """
+    after, before = decode_cursor(after), decode_cursor(before)
+
+    if before:
+        day, pk = before
+        rows = list(transactions.filter(Q(date__gt=day) | Q(date=day, id__gt=pk))
+                    .order_by("date", "id")[:page_size + 1])
+        has_more_newer = len(rows) > page_size
+        rows = rows[:page_size][::-1]
+        next_cursor = encode_cursor(rows[-1]) if rows else None
+        prev_cursor = encode_cursor(rows[0]) if rows and has_more_newer else None
+        return rows, next_cursor, prev_cursor
+
+    if after:
+        day, pk = after
+        transactions = transactions.filter(Q(date__lt=day) | Q(date=day, id__lt=pk))
+    rows = list(transactions[:page_size + 1])
+    has_more_older = len(rows) > page_size
+    rows = rows[:page_size]
+    next_cursor = encode_cursor(rows[-1]) if rows and has_more_older else None
+    prev_cursor = encode_cursor(rows[0]) if rows and after else None
+    return rows, next_cursor, prev_cursor
+
+
+def iter_chunks(transactions, chunk_size=STREAM_CHUNK_SIZE):
+    """Yield lists of rows from a server-side iterator without loading the whole queryset."""
+    chunk = []
+    for tx in transactions.iterator(chunk_size=chunk_size):
+        chunk.append(tx)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
@@ -1,5 +1,5 @@
 from django.urls import path
-from . import views
+from . import views, api
 urlpatterns=[
     path("", views.login_view, name="login"),
     path("signup/", views.signup, name="signup"),
@@ -8,7 +8,18 @@ urlpatterns=[
     path("add_transaction/", views.add_transaction, name="add_transaction"),
     path("add_goal/", views.add_goal, name="add_goal"),
     path("edit_goal/<int:goal_id>/", views.edit_goal, name="edit_goal"),
+    path("import_transactions/", views.import_transactions, name="import_transactions"),
+    path("recurring/", views.recurring_rules, name="recurring_rules"),
+    path("recurring/<int:rule_id>/delete/", views.delete_recurring_rule, name="delete_recurring_rule"),
+    path("export_transactions/", views.export_transactions, name="export_transactions"),
     path("view_transactions", views.view_transactions,name="view_transactions"),
     path("transaction/<int:transaction_id>/edit/", views.edit_transaction, name="edit_transaction"),
     path("transaction/<int:transaction_id>/delete/", views.delete_transaction, name="delete_transaction"),
+    path("api/summary", api.summary, name="api_summary"),
+    path("api/category-expenses", api.category_expenses, name="api_category_expenses"),
+    path("api/expenses-30d", api.expenses_30d, name="api_expenses_30d"),
+    path("api/goals", api.goals, name="api_goals"),
+    path("api/trends", api.spending_trends, name="api_trends"),
+    path("api/investments", api.investments, name="api_investments"),
+    path("metrics/", views.metrics, name="metrics"),
 ]
\ No newline at end of file
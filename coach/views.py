@@ -1,6 +1,6 @@
 from django.shortcuts import render, redirect, get_object_or_404
-from .models import Transaction, Category, UserProfile, Goal
-from .forms import TransactionForm, GoalForm, SignupForm
+from .models import Transaction, Category, UserProfile, Goal, RecurringRule
+from .forms import TransactionForm, GoalForm, SignupForm, RecurringRuleForm
 from django.contrib.auth import logout, authenticate, login as auth_login
 from django.contrib.auth.models import User
 from django.db.models import Sum
@@ -8,11 +8,29 @@ from django.utils import timezone
 from datetime import timedelta
 from django.contrib.auth.decorators import login_required
 from django.db.models.functions import TruncDate
-from .recommendations import generate_savings_recommendation, calculate_tax_recommendation
-from .recommendations import generate_expense_recommendation, generate_category_expense_recommendation 
 from .recommendations import get_investment_opportunities
 from django.core.cache import cache
-from .services import dashboard_service, advice_service
+from django.http import StreamingHttpResponse
+from django.template.loader import render_to_string
+from urllib.parse import urlencode
+from .services import dashboard_service, transaction_service, fragment_cache, advice_service, analytics
+from .services.importer import import_transactions as run_import, ImportFailed, PARSERS
+from .services import exporter, profiling, tiered_cache, recurring, rule_engine
+from django.http import HttpResponseBadRequest, HttpResponse, Http404
+from django.conf import settings
+from django.db import close_old_connections
+from asgiref.sync import sync_to_async
+import asyncio
+import hmac
+import io
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+# Own pool for the dashboard's market lookups: a fetch that outlives its request keeps
+# running (and warms the cache) without holding up the event loop's shutdown under WSGI.
+_market_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="dashboard-market")
 # Create your views here.
 def login_view(request):
     if request.method == 'POST':
@@ -39,57 +57,65 @@ def signup(request):
         form = SignupForm()
     return render(request, 'coach/signup.html', {'form': form})
 
+def _dashboard_context(user):
+    # Precomputed by the advice batch job; recomputed here only if the user's data changed since
+    advice = advice_service.get_advice(user)
+    return {
+        "profile": dashboard_service.get_profile(user),
+        "savings_msg": advice["savings_msg"],
+        "tax_msg": advice["tax_msg"],
+        "expense_msg": advice["expense_msg"],
+        "category_expense_msgs": advice["category_msgs"],
+        "adaptive_msg": advice["adaptive_msg"],
+    }
+
+
+def _market_insights(user):
+    """Investment suggestions for the dashboard; runs in a worker thread, off the request's connection."""
+    try:
+        return get_investment_opportunities(user)
+    except Exception as e:
+        logger.warning("Market insights failed for user %s: %s", user.pk, e)
+        return None
+    finally:
+        close_old_connections()
+
+
 @login_required
-def dashboard(request):
-    user = request.user
-    
-    # --- Business Logic via Services ---
-    income, expenses, savings, net_income = dashboard_service.get_income_expenses_savings(user)
-    category_expenses = dashboard_service.get_category_expenses(user)
-    goals, goal_progress = dashboard_service.get_goal_progress(user)
-    expenses_last_30_days = dashboard_service.get_expenses_last_30_days(user)
-    profile = dashboard_service.get_profile(user)
-
-    warning_msg = "⚠️ Expenses and savings exceed your income!" if net_income < 0 else ""
-
-    # --- Recommendations ---
-    savings_msg = generate_savings_recommendation(user)
-    tax_msg = calculate_tax_recommendation(user)
-    expense_msg = generate_expense_recommendation(user)
-    category_expense_msgs = generate_category_expense_recommendation(user)
-
-    # Cached investment opportunities
-    cache_key = f"dash_invest_ops:{user.id}"
-    investment_opportunities = cache.get(cache_key)
-    if investment_opportunities is None:
-        investment_opportunities = get_investment_opportunities(user)
-        cache.set(cache_key, investment_opportunities, 300)
-
-    adaptive_msg = advice_service.adaptive_advice(income, expenses, savings, investment_opportunities)
-
-   
+async def dashboard(request):
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + settings.COACH_DASHBOARD_MARKET_BUDGET
+    user = await request.auser()
+
+    # Market data (network, or the shared cache) and the user's aggregates are gathered concurrently.
+    fetch = sync_to_async(_market_insights, thread_sensitive=False, executor=_market_executor)
+    market = asyncio.ensure_future(fetch(user))
+
     # --- Context ---
-    context = {
-        "name": user.username,
-        "profile": profile,
-        "income": income,
-        "expenses": expenses,
-        "savings": savings,
-        "net_income": net_income,
-        "warning_msg": warning_msg,
-        "category_expenses": list(category_expenses),
-        "goals": goals,
-        "goal_progress": goal_progress,
-        "expenses_last_30_days": expenses_last_30_days,
-        "savings_msg": savings_msg,
-        "tax_msg": tax_msg,
-        "expense_msg": expense_msg,
-        "category_expense_msgs": category_expense_msgs,
-        "investment_opportunities": investment_opportunities,
-        "adaptive_msg": adaptive_msg,
-        
-    }
-    return render(request, "coach/dashboard.html", context)
+    # Charts and goals are fetched lazily from the JSON API (coach/api.py); the rest only
+    # changes with the user's data, the advice rules and the financial year (the tax advice), so it's
+    # cached per data version, rules version and year.
+    context = await sync_to_async(fragment_cache.get_fragment)(
+        user.id, "dashboard", lambda: _dashboard_context(user),
+        variant=f"{rule_engine.get_rules().digest}:{advice_service.current_year()}")
+
+    # Market insights are inlined if they arrive within the budget; otherwise the page shows a
+    # placeholder and its script loads /api/investments, which the still-running fetch warms.
+    investments = None
+    try:
+        opportunities = await asyncio.wait_for(asyncio.shield(market), max(0.0, deadline - loop.time()))
+    except asyncio.TimeoutError:
+        opportunities = None
+    if opportunities is not None:
+        investments = {
+            "adaptive_message": context["adaptive_msg"] or advice_service.market_advice(opportunities),
+            "opportunities": opportunities,
+        }
+
+    return await sync_to_async(render)(request, "coach/dashboard.html", {
+        **context, "name": user.username, "investments": investments,
+        "trend_ranges": list(analytics.RANGES), "default_trend_range": analytics.DEFAULT_RANGE,
+    })
 
 
 @login_required
@@ -110,40 +136,120 @@ def add_transaction(request):
         form = TransactionForm(user=request.user)
     return render(request, 'coach/add_transaction.html', {'form': form})
 
+@login_required
+def recurring_rules(request):
+    if request.method == 'POST':
+        form = RecurringRuleForm(request.POST, user=request.user)
+        form.instance.user = request.user
+        if form.is_valid():
+            form.save()
+            # Back-dated rules get their past occurrences right away instead of at the next scheduler run
+            stats = recurring.materialize_due(user_ids=[request.user.pk])
+            for error in stats['errors']:
+                logger.warning("Recurring rule for user %s: %s", request.user.pk, error)
+            return redirect('recurring_rules')
+    else:
+        form = RecurringRuleForm(user=request.user)
+    rules = RecurringRule.objects.filter(user=request.user).select_related('category').order_by('next_run', 'pk')
+    return render(request, 'coach/recurring_rules.html', {'form': form, 'rules': rules})
+
+@login_required
+def delete_recurring_rule(request, rule_id):
+    rule = get_object_or_404(RecurringRule, pk=rule_id, user=request.user)
+    if request.method == 'POST':
+        rule.delete()  # occurrences already created stay, unlinked
+    return redirect('recurring_rules')
+
+@login_required
+def import_transactions(request):
+    context = {'formats': sorted(PARSERS), 'format': request.POST.get('format', 'csv')}
+    if request.method == 'POST':
+        upload = request.FILES.get('file')
+        fmt = context['format']
+        if upload is None:
+            context['error'] = "Choose a file to import."
+        elif fmt not in PARSERS:
+            context['error'] = "Unsupported file format."
+        else:
+            stream = io.TextIOWrapper(upload.file, encoding='utf-8-sig', newline='')
+            try:
+                context['stats'] = run_import(request.user, stream, fmt=fmt)
+            except (ImportFailed, UnicodeDecodeError) as e:
+                context['error'] = f"Import failed, nothing was saved: {e}"
+            finally:
+                stream.detach()
+    return render(request, 'coach/import_transactions.html', context)
+
 @login_required
 def view_transactions(request):
     user = request.user
 
-    # Fetch all transactions for the user
-    transactions = Transaction.objects.filter(user=user).select_related("category").order_by("-date")
-
-    # Optional filtering by type (income / expense / savings)
+    # Optional filtering by type (income / expense / savings) and category
     tx_type = request.GET.get("type")
-    if tx_type in ["income", "expense", "savings"]:
-        transactions = transactions.filter(type=tx_type)
-
-    # Optional filtering by category
     category_id = request.GET.get("category")
-    if category_id:
-        transactions = transactions.filter(category_id=category_id)
+    transactions = transaction_service.filtered_transactions(user, tx_type, category_id)
 
-    # Aggregates for quick totals
-    total_income = transactions.filter(type="income").aggregate(total=Sum("amount"))["total"] or 0
-    total_expenses = transactions.filter(type="expense").aggregate(total=Sum("amount"))["total"] or 0
-    total_savings = transactions.filter(type="savings").aggregate(total=Sum("amount"))["total"] or 0
+    # Totals for quick overview, in one conditional aggregate
+    totals = transaction_service.get_totals(transactions)
 
+    filters = {k: v for k, v in (("type", tx_type), ("category", category_id)) if v}
     context = {
-        "transactions": transactions,
-        "total_income": total_income,
-        "total_expenses": total_expenses,
-        "total_savings": total_savings,
+        "total_income": totals["income"],
+        "total_expenses": totals["expenses"],
+        "total_savings": totals["savings"],
         "filter_type": tx_type,
         "filter_category": category_id,
         "categories": Category.objects.all()  # for dropdown filters
     }
 
+    # "Show all": stream the rows in chunks instead of building one huge page
+    if request.GET.get("all"):
+        return StreamingHttpResponse(_stream_transactions(request, transactions, context))
+
+    try:
+        page_size = min(int(request.GET.get("per_page", transaction_service.PAGE_SIZE)),
+                        transaction_service.MAX_PAGE_SIZE)
+    except ValueError:
+        page_size = transaction_service.PAGE_SIZE
+    rows, next_cursor, prev_cursor = transaction_service.paginate(
+        transactions, after=request.GET.get("after"), before=request.GET.get("before"), page_size=max(page_size, 1),
+    )
+
+    context.update({
+        "transactions": rows,
+        "next_query": urlencode({**filters, "after": next_cursor}) if next_cursor else "",
+        "prev_query": urlencode({**filters, "before": prev_cursor}) if prev_cursor else "",
+        "all_query": urlencode({**filters, "all": 1}),
+        "export_links": [(fmt, urlencode({**filters, "format": fmt})) for fmt in exporter.available_formats()],
+    })
     return render(request, "coach/view_transactions.html", context)
 
+
+@login_required
+def export_transactions(request):
+    fmt = request.GET.get("format", "csv")
+    try:
+        chunks = exporter.stream_export(request.user, fmt, request.GET.get("type"), request.GET.get("category"))
+    except exporter.ExportUnavailable as e:
+        return HttpResponseBadRequest(str(e))
+    response = StreamingHttpResponse(chunks, content_type=exporter.CONTENT_TYPES[fmt])
+    response["Content-Disposition"] = f'attachment; filename="transactions.{fmt}"'
+    return response
+
+
+def _stream_transactions(request, transactions, context):
+    """Render the page shell once, then the table rows chunk by chunk."""
+    page = render_to_string("coach/view_transactions.html", {**context, "streaming": True}, request=request)
+    head, tail = page.split("<!--transaction-rows-->", 1)
+    yield head
+    empty = True
+    for chunk in transaction_service.iter_chunks(transactions):
+        empty = False
+        yield render_to_string("coach/_transaction_rows.html", {"transactions": chunk}, request=request)
+    if empty:
+        yield render_to_string("coach/_transaction_rows.html", {"transactions": []}, request=request)
+    yield tail
+
 @login_required
 def add_goal(request):
     if request.method=='POST':
@@ -169,37 +275,6 @@ def edit_goal(request,goal_id):
         form = GoalForm(instance=goal)
     return render(request, 'coach/edit_goal.html', {'form': form, 'goal': goal})
 
-def _adaptive_advice(income, expenses, savings, investments):
-
-    """
-    Tiny rule-based adaptive coach message based on user's cashflows and current recs.
-    Non-invasive and requires no DB changes.
-    """
-    try:
-        income_f = float(income)
-        expenses_f = float(expenses)
-        savings_f = float(savings)
-    except Exception:
-        income_f = expenses_f = savings_f = 0.0
-
-    # Safely detect any high-vol items in current recs
-    high_vol = False
-    for inv in investments or []:
-        vol = inv.get("volatility_1m")
-        if isinstance(vol, (int, float)) and vol >= 0.02:
-            high_vol = True
-            break
-
-    if income_f == 0:
-        return "Add at least one income entry to unlock personalized investing advice."
-    if expenses_f > income_f * 0.9:
-        return "⚠️ Your expenses are ~90% of income. Reduce spending before adding higher-risk investments."
-    if savings_f < income_f * 0.1:
-        return "💡 Boost savings (≥10% of income) to create a safety buffer before taking market risk."
-    if high_vol:
-        return "⚠️ Several suggestions are volatile. Balance with ETFs or bonds for stability."
-    return "✅ Good balance! You can explore more opportunities that fit your horizon and risk."
-
 @login_required
 def edit_transaction(request, transaction_id):
     transaction = get_object_or_404(Transaction, id=transaction_id, user=request.user)
@@ -222,4 +297,22 @@ def delete_transaction(request, transaction_id):
     return render(request, "coach/delete_transaction.html", {"transaction": transaction})
 
 
+def _metrics_allowed(request):
+    token = settings.COACH_METRICS_TOKEN
+    if token:
+        return hmac.compare_digest(request.headers.get("Authorization", "").encode(), f"Bearer {token}".encode())
+    return request.META.get("REMOTE_ADDR") in settings.COACH_METRICS_ALLOWED_IPS
 
+
+def metrics(request):
+    """
+    Prometheus scrape endpoint for the request profiling and cache counters.
+    With COACH_METRICS_TOKEN set, scrapers must send it as a bearer token;
+    otherwise only COACH_METRICS_ALLOWED_IPS may scrape. The address check
+    alone is no protection behind a reverse proxy on the same host, where
+    every request arrives from 127.0.0.1.
+    """
+    if not _metrics_allowed(request):
+        raise Http404
+    return HttpResponse(profiling.metrics.render() + tiered_cache.render_metrics(),
+                        content_type="text/plain; version=0.0.4")